@@ -0,0 +1,52 @@
+"""dataset jobs
+
+Revision ID: 3b1f6c2d9a7e
+Revises: a4ce6c6325c4
+Create Date: 2026-10-17 10:12:41.208113
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3b1f6c2d9a7e"
+down_revision: Union[str, None] = "a4ce6c6325c4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "dataset_jobs",
+        sa.Column("job_id", sa.String(length=32), nullable=False),
+        sa.Column("job_type", sa.String(length=32), nullable=False),
+        sa.Column("state", sa.String(length=16), nullable=False),
+        sa.Column("progress", sa.Float(), nullable=False),
+        sa.Column("phase", sa.String(length=64), nullable=True),
+        sa.Column("params", sa.JSON(), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("timings", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("job_id"),
+    )
+    op.create_index(
+        op.f("ix_dataset_jobs_job_id"), "dataset_jobs", ["job_id"], unique=False
+    )
+    op.create_index(
+        op.f("ix_dataset_jobs_state"), "dataset_jobs", ["state"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_dataset_jobs_state"), table_name="dataset_jobs")
+    op.drop_index(op.f("ix_dataset_jobs_job_id"), table_name="dataset_jobs")
+    op.drop_table("dataset_jobs")
@@ -1,4 +1,3 @@
-import requests
 from sqlalchemy.orm import Session
 from utility.db import get_db
 from utility.redis import redis_pubsub, redis_client, redis_pubsub2
@@ -9,6 +8,7 @@ import os
 import uuid
 import json
 from datetime import datetime
+from utility.session_config_cache import aget_session_config
 from utility.federated_services import process_parquet_and_save_xy
 from api.model_training_routes import _run_script, process_store
 import subprocess
@@ -19,11 +19,15 @@ notification_router = APIRouter(tags=["Notification"])
 BASE_URL = os.getenv("REACT_APP_SERVER_BASE_URL")
 
 
-async def _run_script_async(process_id: str, session_id: int, client_token: str):
+async def _run_script_async(
+    process_id: str, session_id: int, client_token: str, last_round: bool = False
+):
     """Async wrapper for the synchronous _run_script function"""
     # Run the synchronous function in a thread pool
     loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, _run_script, process_id, session_id, client_token)
+    await loop.run_in_executor(
+        None, _run_script, process_id, session_id, client_token, last_round
+    )
 
 
 pubsub = redis_pubsub.pubsub()
@@ -64,19 +68,16 @@ async def redis_round_listener():
             round_number = message_data.get("round_number")
             client_token = await redis_client.get("client_token")
 
-            session = requests.get(
-                f"{BASE_URL}/v2/get-federated-session/{session_id}",
-                headers={"Authorization": f"Bearer {client_token}"},
-            )
-            session.raise_for_status()
-            session = session.json()
+            federated_info = await aget_session_config(session_id, client_token)
 
             if round_number == 1:
-                process_parquet_and_save_xy(
+                # download + extraction run off the event loop
+                await asyncio.to_thread(
+                    process_parquet_and_save_xy,
                     client_filename,
                     str(session_id),
-                    session["federated_info"]["input_columns"],
-                    session["federated_info"]["output_columns"],
+                    federated_info["input_columns"],
+                    federated_info["output_columns"],
                     client_token,
                 )
             process_id = str(uuid.uuid4())
@@ -86,6 +87,8 @@ async def redis_round_listener():
                     process_id=process_id,
                     session_id=session_id,
                     client_token=client_token,
+                    # the session's dataset files are released after its last round
+                    last_round=round_number == federated_info.get("no_of_rounds"),
                 )
             )
     except Exception as e:
@@ -50,7 +50,7 @@ async def upload_file_to_hdfs(file: UploadFile = File(...)):
                 print(f"File uploaded to HDFS: {hdfs_path}")
                 return {"message": "File uploaded successfully", "hdfs_path": hdfs_path}
 
-            result = hdfs_manager._with_hdfs_client(upload_to_hdfs)
+            result = await hdfs_manager.run(upload_to_hdfs, timeout=None)
 
             return JSONResponse(
                 status_code=200,
@@ -111,7 +111,7 @@ async def list_uploaded_files():
                 print(f"Error listing files in HDFS: {e}")
                 raise Exception(f"Error listing files in HDFS: {e}")
 
-        result = hdfs_manager._with_hdfs_client(list_files)
+        result = await hdfs_manager.run(list_files)
         return JSONResponse(status_code=200, content=result)
 
     except Exception as e:
@@ -4,17 +4,17 @@ from utility.db import get_db
 from crud.trainings_crud import create_training
 from schemas.trainings import InitiateModelRequest, AcceptClientFilenameTrainingRequest
 import requests
-import subprocess
-from subprocess import CalledProcessError
 import json
 import os
 import random
-import sys
 from typing import Dict
 import uuid
 from datetime import datetime
+from utility import federated_client
+from utility.session_config_cache import invalidate_session_config
 from utility.federated_services import process_parquet_and_save_xy
 from utility.redis import redis_client
+from utility.training_worker_pool import TrainingWorkerPool
 
 model_router = APIRouter(tags=["Model Training"])
 BASE_URL = os.getenv("REACT_APP_SERVER_BASE_URL")
@@ -24,6 +24,8 @@ post_params_url = f"{BASE_URL}/receive-client-parameters"
 
 # In-memory process store (replace with DB in production)
 process_store: Dict[str, dict] = {}
+# Long-lived training processes, started in the app lifespan
+training_pool = TrainingWorkerPool(process_store)
 
 
 @model_router.post("/initiate-model")
@@ -35,24 +37,29 @@ def initiate_model(request: InitiateModelRequest, db: Session = Depends(get_db))
         session_id = request.session_id
         client_token = request.client_token
 
-        headers = {
-            "Authorization": f"Bearer {client_token}",
-            "Content-Type": "application/json",
-        }
-
         get_url = f"{get_training_url}/{session_id}"
-        response = requests.get(get_url, headers=headers)
+        response = federated_client.get(
+            get_url, headers=federated_client.auth_headers(client_token)
+        )
         response.raise_for_status()  # Raises HTTPError if not 2xx
 
         result = response.json()
 
         # Read output column from it
-        federated_info = result.get("federated_info")
+        federated_info = result.get("federated_info") or {}
         dataset_info = federated_info.get("dataset_info")
+        if not isinstance(dataset_info, dict):
+            raise HTTPException(
+                status_code=502,
+                detail="Federated session has no dataset_info",
+            )
         client_filename = dataset_info.get("client_filename")
         output_columns = dataset_info.get("output_columns")
+        input_columns = federated_info.get(
+            "input_columns", dataset_info.get("input_columns", [])
+        )
         process_parquet_and_save_xy(
-            client_filename, session_id, output_columns, client_token
+            client_filename, session_id, input_columns, output_columns, client_token
         )
 
         training_details = {
@@ -65,65 +72,37 @@ def initiate_model(request: InitiateModelRequest, db: Session = Depends(get_db))
 
         if isinstance(db_training, dict) and "error" in db_training:
             raise HTTPException(status_code=400, detail=db_training["error"])
+        # readers fetch the (v2) session config again instead of a stale cached one
+        invalidate_session_config(session_id)
 
         return {"message": "Model initiation successful"}
 
+    except HTTPException:
+        raise
     except requests.exceptions.HTTPError as http_err:
-        raise HTTPException(status_code=response.status_code, detail=str(http_err))
+        raise HTTPException(
+            status_code=http_err.response.status_code, detail=str(http_err)
+        )
     except Exception as e:
         print(f"Error initiating model: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-def _run_script(process_id: str, session_id: int, client_token: str):
-    """Background task function that executes the script"""
-    env = os.environ.copy()
-    process_store[process_id] = {
-        "status": "running",
-        "start_time": datetime.now(),
-        "session_id": session_id,
-        "output": {"stdout": "", "stderr": ""},
-    }
-
+def _run_script(
+    process_id: str, session_id: int, client_token: str, last_round: bool = False
+):
+    """Queue a training round on the warm worker pool (status lands in process_store)"""
     try:
-        proc = subprocess.Popen(
-            [
-                sys.executable,
-                "-m",
-                "utility.training_script",
-                "--session_id",
-                str(session_id),
-                "--client_token",
-                client_token,
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            env=env,
-        )
-
-        # Stream output while process runs
-        stdout, stderr = proc.communicate()
-
-        print("STDOUT:", stdout)
-        print("STDERR:", stderr)
-
-        if proc.returncode != 0:
-            print("Process failed with return code", proc.returncode)
-
-        process_store[process_id].update(
-            {
-                "status": "completed" if proc.returncode == 0 else "failed",
-                "end_time": datetime.now(),
-                "return_code": proc.returncode,
-                "output": {"stdout": stdout, "stderr": stderr},
-            }
-        )
-
+        training_pool.submit(process_id, session_id, client_token, last_round)
     except Exception as e:
-        process_store[process_id].update(
-            {"status": "failed", "end_time": datetime.now(), "error": str(e)}
-        )
+        process_store[process_id] = {
+            "status": "failed",
+            "start_time": datetime.now(),
+            "end_time": datetime.now(),
+            "session_id": session_id,
+            "error": str(e),
+            "output": {"stdout": "", "stderr": ""},
+        }
 
 
 @model_router.get("/execute-round")
@@ -168,6 +147,8 @@ def get_process_status(process_id: str):
 
     if process_info["status"] in ("completed", "failed"):
         response.update({"output": process_info["output"]})
+        if "error" in process_info:
+            response["error"] = process_info["error"]
 
     return response
 
@@ -3,11 +3,9 @@ from fastapi.responses import JSONResponse
 from fastapi import Request
 from sqlalchemy.orm import Session
 from typing import List
-import asyncio
 import os
 import tempfile
 import shutil
-from concurrent.futures import ThreadPoolExecutor
 
 from schemas.dataset import (
     DatasetCreate,
@@ -37,17 +35,18 @@ from crud.datasets_crud import (
     handle_file_renaming_during_processing,
     update_column_description,
     update_column_description_in_dataset,
+    update_raw_dataset_stats,
 )
 
 from utility.db import get_db
 from utility.hdfs_services import HDFSServiceManager
 from utility.spark_services import SparkSessionManager
+from utility.dataset_jobs import job_queue, JobQueueFull
+from crud.jobs_crud import get_job, list_jobs
 from dotenv import load_dotenv
 
 load_dotenv()
 
-executor = ThreadPoolExecutor(max_workers=os.cpu_count())
-
 dataset_router = APIRouter(tags=["Dataset"])
 
 HDFS_RAW_DATASETS_DIR = os.getenv("HDFS_RAW_DATASETS_DIR")
@@ -63,41 +62,96 @@ spark_client = SparkSessionManager()
 
 
 ###################### Background processing tasks ######################
-async def process_create_dataset(filename: str, filetype: str):
+async def process_create_dataset(
+    filename: str, filetype: str, job_id: str = None, progress=None
+):
     db = next(get_db())
     print("Processing dataset: ", filename, filetype)
+    # quick overview the dataset was listed with before its full overview
+    listed = []
+    overview_done = False
+    overview_error = "The overview did not complete."
     try:
         source_path = f"{HDFS_TARGET_PATH}/{filename}"
         # processing_path = f"{source_path}__PROCESSING__"
         # await hdfs_client.rename_file_or_folder(source_path, processing_path)
+        description = f"Raw dataset created from {filename}"
+
+        async def list_with_footer_stats(quick_overview):
+            # the dataset is listed right after the write with the footer stats,
+            # the full overview replaces them when it is done
+            crud_result = create_raw_dataset(
+                db,
+                DatasetCreate(
+                    filename=quick_overview["filename"],
+                    description=description,
+                    datastats=quick_overview,
+                ),
+            )
+            if isinstance(crud_result, dict) and "error" in crud_result:
+                print(f"Could not list {filename} early: {crud_result['error']}")
+            else:
+                listed.append(quick_overview)
+
         dataset_overview = await spark_client.create_new_dataset(
-            f"{filename}", filetype
+            f"{filename}",
+            filetype,
+            job_id=job_id,
+            progress=progress,
+            on_written=list_with_footer_stats,
         )
-        description = f"Raw dataset created from {filename}"
         print(
             f"Overview of dataset: {dataset_overview['numRows']} rows, {dataset_overview['numColumns']} columns"
         )
 
-        dataset_obj = DatasetCreate(
-            filename=dataset_overview["filename"],
-            description=description,
-            datastats=dataset_overview,
-        )
-
-        # Create raw dataset entry
-        crud_result = create_raw_dataset(db, dataset_obj)
+        if listed:
+            crud_result = update_raw_dataset_stats(
+                db, dataset_overview["filename"], dataset_overview
+            )
+        else:
+            # Create raw dataset entry
+            crud_result = create_raw_dataset(
+                db,
+                DatasetCreate(
+                    filename=dataset_overview["filename"],
+                    description=description,
+                    datastats=dataset_overview,
+                ),
+            )
         if isinstance(crud_result, dict) and "error" in crud_result:
             raise HTTPException(status_code=400, detail=crud_result["error"])
-        return {"message": "Dataset created successfully"}
+        overview_done = True
+        return {
+            "message": "Dataset created successfully",
+            "filename": dataset_overview["filename"],
+        }
     except Exception as e:
         print("Error in processing the data is: ", str(e))
+        overview_error = str(e)
         return {"error": str(e)}
     finally:
+        if listed and not overview_done:
+            # failed, timed out or cancelled after the early listing: the footer stats
+            # stay, marked as never completed by the full overview
+            quick_overview = listed[0]
+            update_raw_dataset_stats(
+                db,
+                quick_overview["filename"],
+                {
+                    **quick_overview,
+                    "statsLevel": "failed",
+                    "statsError": overview_error,
+                },
+            )
         db.close()
 
 
 async def process_preprocessing(
-    directory: str, filename: str, operations: List[Operation]
+    directory: str,
+    filename: str,
+    operations: List[Operation],
+    job_id: str = None,
+    progress=None,
 ):
     db = next(get_db())
     try:
@@ -114,7 +168,11 @@ async def process_preprocessing(
 
         # Process data and get new filename
         processed_info = await spark_client.preprocess_data(
-            directory, f"{filename}__PROCESSING__", operations
+            directory,
+            f"{filename}__PROCESSING__",
+            operations,
+            job_id=job_id,
+            progress=progress,
         )
 
         # Create new dataset entry
@@ -136,7 +194,10 @@ async def process_preprocessing(
         )
         if isinstance(renaming_result, dict) and "error" in renaming_result:
             raise HTTPException(status_code=400, detail=renaming_result["error"])
-        return {"message": "Preprocessing completed successfully"}
+        return {
+            "message": "Preprocessing completed successfully",
+            "filename": processed_info["filename"],
+        }
 
     except Exception as e:
         await hdfs_client.rename_file_or_folder(
@@ -277,6 +338,12 @@ async def create_new_dataset(file: UploadFile = File(...)):
                 status_code=400,
                 detail="Invalid file type. Supported formats: CSV, Parquet",
             )
+        # Admission control before spending time on the upload
+        if not job_queue.has_capacity():
+            raise HTTPException(
+                status_code=429,
+                detail="Too many dataset jobs are queued or running, try again later.",
+            )
         # Create a temporary file to store the uploaded content
         with tempfile.NamedTemporaryFile(
             delete=False, suffix=os.path.splitext(file.filename)[1]
@@ -295,8 +362,14 @@ async def create_new_dataset(file: UploadFile = File(...)):
                 print(f"File uploaded to HDFS: {hdfs_path}")
                 return {"message": "File uploaded successfully", "hdfs_path": hdfs_path}
 
-            result = hdfs_client._with_hdfs_client(upload_to_hdfs)
-            executor.submit(asyncio.run, process_create_dataset(filename, filetype))
+            result = await hdfs_client.run(upload_to_hdfs, timeout=None)
+            job_id = job_queue.submit(
+                "create_dataset",
+                {"filename": filename, "filetype": filetype},
+                lambda job_id, progress: process_create_dataset(
+                    filename, filetype, job_id=job_id, progress=progress
+                ),
+            )
             return JSONResponse(
                 status_code=200,
                 content={
@@ -304,6 +377,7 @@ async def create_new_dataset(file: UploadFile = File(...)):
                     "filename": file.filename,
                     "hdfs_path": hdfs_path,
                     "file_size": file.size,
+                    "job_id": job_id,
                 },
             )
 
@@ -312,6 +386,10 @@ async def create_new_dataset(file: UploadFile = File(...)):
             if os.path.exists(temp_file_path):
                 os.unlink(temp_file_path)
 
+    except HTTPException:
+        raise
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         print(f"Error during file upload: {str(e)}")
         raise HTTPException(status_code=500, detail=f"❌ Upload failed: {str(e)}")
@@ -437,11 +515,55 @@ async def delete_processed_dataset_file(
 @dataset_router.post("/preprocess-dataset", status_code=status.HTTP_202_ACCEPTED)
 async def preprocess_dataset_endpoint(request: Request):
     data = await request.json()
-    executor.submit(
-        asyncio.run,
-        process_preprocessing(data["directory"], data["filename"], data["operations"]),
-    )
-    return {"message": "Preprocessing initiated"}
+    try:
+        job_id = job_queue.submit(
+            "preprocess",
+            {
+                "directory": data["directory"],
+                "filename": data["filename"],
+                "operations": data["operations"],
+            },
+            lambda job_id, progress: process_preprocessing(
+                data["directory"],
+                data["filename"],
+                data["operations"],
+                job_id=job_id,
+                progress=progress,
+            ),
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"message": "Preprocessing initiated", "job_id": job_id}
+
+
+############ Dataset Job Routes
+@dataset_router.get("/dataset-jobs")
+def list_dataset_jobs_endpoint(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    state: str = Query(None),
+    db: Session = Depends(get_db),
+):
+    result = list_jobs(db, skip=skip, limit=limit, state=state)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+
+@dataset_router.get("/dataset-jobs/{job_id}")
+def get_dataset_job_endpoint(job_id: str, db: Session = Depends(get_db)):
+    result = get_job(db, job_id)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
+
+@dataset_router.post("/dataset-jobs/{job_id}/cancel")
+def cancel_dataset_job_endpoint(job_id: str):
+    result = job_queue.cancel(job_id)
+    if "error" in result:
+        raise HTTPException(status_code=409, detail=result["error"])
+    return result
 
 
 @dataset_router.get("/list-recent-uploads")
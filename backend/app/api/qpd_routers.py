@@ -3,12 +3,13 @@ from sqlalchemy.orm import Session
 from utility.db import get_db
 from schemas.training_data_transfer import TransferCreate, SubmitPrice
 from utility.spark_services import SparkSessionManager
-import requests
 import os
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from utility.redis import redis_client
+from utility import federated_client
+from utility.session_config_cache import get_session_config
 load_dotenv()
 
 # instead ensure max free cpu, if no one is free wait !!
@@ -30,7 +31,11 @@ async def create_qpd_dataset_from_client_data(
         session_key = f"client_filename:{session_id}"
         filename = await redis_client.get(session_key)
         parent_filename = fed_info.get("dataset_info", {}).get("server_filename")
-        overview = await spark_client.create_qpd_dataset(filename, num_points)
+        overview = await spark_client.create_qpd_dataset(
+            filename,
+            num_points,
+            strata_columns=fed_info.get("dataset_info", {}).get("output_columns"),
+        )
 
         qpd_data = TransferCreate(
             training_name=fed_info.get("organisation_name"),
@@ -48,7 +53,7 @@ async def create_qpd_dataset_from_client_data(
 
         create_qpd_data_url = f"{BASE_URL}/create-transferred-data"
 
-        response = requests.post(
+        response = await federated_client.apost(
             create_qpd_data_url, json=qpd_data.dict(), headers=headers
         )
         response.raise_for_status()  # Raises HTTPError if not 2xx
@@ -71,17 +76,7 @@ def create_qpd_dataset_endpoint(request: SubmitPrice):
     num_points = request.session_price
     client_token = request.client_token
 
-    headers = {
-        "Authorization": f"Bearer {client_token}",
-        "Content-Type": "application/json",
-    }
-
-    get_url = f"{BASE_URL}/v2/get-federated-session/{session_id}"
-    response = requests.get(get_url, headers=headers)
-    response.raise_for_status()  # Raises HTTPError if not 2xx
-    result = response.json()
-
-    fed_info = result.get("federated_info")
+    fed_info = get_session_config(session_id, client_token)
 
     executor.submit(
         asyncio.run,
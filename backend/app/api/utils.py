@@ -1,6 +1,10 @@
 from fastapi import APIRouter
 from schemas.training_data_transfer import SaveToken
 from utility.redis import redis_client
+from utility import federated_client, dataset_cache
+from utility.spark_services import SparkSessionManager
+from utility.session_config_cache import invalidate_session_config
+from api.model_training_routes import training_pool
 
 utils_router = APIRouter(tags=["Utils"])
 
@@ -22,3 +26,58 @@ async def remove_token_endpoint():
     # -------------------------------------------------------------------
     await redis_client.delete("client_token")
     return {"message": "Token removed successfully."}
+
+
+@utils_router.get("/http-metrics")
+def http_metrics_endpoint():
+    # -------------------------------------------------------------------
+    # Latency of the calls to the federated server, per endpoint
+    # -------------------------------------------------------------------
+    return {
+        "api": federated_client.get_metrics(),
+        "training_workers": training_pool.worker_http_metrics,
+    }
+
+
+@utils_router.delete("/session-config/{session_id}", status_code=200)
+def invalidate_session_config_endpoint(session_id: int):
+    # -------------------------------------------------------------------
+    # Drop the cached config of a session, the next lookup refetches it
+    # -------------------------------------------------------------------
+    invalidate_session_config(session_id)
+    return {"message": "Session config invalidated."}
+
+
+@utils_router.get("/dataset-cache")
+def dataset_cache_stats_endpoint():
+    # -------------------------------------------------------------------
+    # Hit/miss counters and entries of the node-local dataset cache
+    # -------------------------------------------------------------------
+    return dataset_cache.get_cache_stats()
+
+
+@utils_router.delete("/dataset-cache", status_code=200)
+def clear_dataset_cache_endpoint():
+    # -------------------------------------------------------------------
+    # Remove the cached extractions no training session is linked to
+    # -------------------------------------------------------------------
+    kept = dataset_cache.clear_cache()
+    return {"message": "Dataset cache cleared.", "kept_in_use": kept}
+
+
+@utils_router.delete("/dataset-cache/sessions/{session_id}", status_code=200)
+def release_dataset_session_endpoint(session_id: str):
+    # -------------------------------------------------------------------
+    # Remove the dataset files linked into a finished session
+    # -------------------------------------------------------------------
+    if not dataset_cache.release_session(session_id):
+        return {"message": "No cached dataset files for this session."}
+    return {"message": "Session dataset files removed."}
+
+
+@utils_router.get("/spark-session")
+def spark_session_endpoint():
+    # -------------------------------------------------------------------
+    # Age, users and restarts of the shared (kept warm) Spark session
+    # -------------------------------------------------------------------
+    return SparkSessionManager.get_session_metrics()
@@ -112,6 +112,29 @@ def edit_raw_dataset_details(db: Session, newdetails: DatasetUpdate):
         return {"error": f"Database error: {e}"}
 
 
+def update_raw_dataset_stats(db: Session, filename: str, datastats: dict):
+    """Replace the stats of a raw dataset, column descriptions added meanwhile are kept."""
+    try:
+        dataset = db.query(RawDataset).filter(RawDataset.filename == filename).first()
+        if not dataset:
+            return {"error": "Raw dataset not found."}
+        descriptions = {
+            item["name"]: item["description"]
+            for item in (dataset.datastats or {}).get("columnStats", [])
+            if "description" in item
+        }
+        for item in datastats.get("columnStats", []):
+            if item["name"] in descriptions:
+                item["description"] = descriptions[item["name"]]
+        dataset.datastats = datastats
+        flag_modified(dataset, "datastats")
+        db.commit()
+        return {"message": "Raw dataset stats updated successfully."}
+    except SQLAlchemyError as e:
+        db.rollback()
+        return {"error": f"Database error: {e}"}
+
+
 def update_column_description(db: Session, filename: str, col_to_desc: dict):
     try:
         dataset = db.query(RawDataset).filter(RawDataset.filename == filename).first()
@@ -0,0 +1,87 @@
+from datetime import datetime
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from models.Jobs import DatasetJob
+
+ACTIVE_STATES = ["queued", "running"]
+
+
+def create_job(db: Session, job_id: str, job_type: str, params: dict):
+    try:
+        db_job = DatasetJob(
+            job_id=job_id,
+            job_type=job_type,
+            state="queued",
+            progress=0.0,
+            params=params,
+            created_at=datetime.utcnow(),
+        )
+        db.add(db_job)
+        db.commit()
+        db.refresh(db_job)
+        return db_job
+    except IntegrityError:
+        db.rollback()
+        return {"error": "Job with this ID already exists."}
+    except SQLAlchemyError as e:
+        db.rollback()
+        return {"error": f"Database error: {e}"}
+
+
+def update_job(db: Session, job_id: str, **fields):
+    try:
+        db_job = db.query(DatasetJob).filter(DatasetJob.job_id == job_id).first()
+        if not db_job:
+            return {"error": "Job not found."}
+        for key, value in fields.items():
+            setattr(db_job, key, value)
+        db.commit()
+        return db_job
+    except SQLAlchemyError as e:
+        db.rollback()
+        return {"error": f"Database error: {e}"}
+
+
+def get_job(db: Session, job_id: str):
+    try:
+        db_job = db.query(DatasetJob).filter(DatasetJob.job_id == job_id).first()
+        if not db_job:
+            return {"error": "Job not found."}
+        return db_job.as_dict()
+    except SQLAlchemyError as e:
+        return {"error": f"Database error: {e}"}
+
+
+def list_jobs(db: Session, skip: int = 0, limit: int = 100, state: str = None):
+    try:
+        query = db.query(DatasetJob)
+        if state:
+            query = query.filter(DatasetJob.state == state)
+        jobs = (
+            query.order_by(DatasetJob.created_at.desc()).offset(skip).limit(limit).all()
+        )
+        return {"jobs": [job.as_dict() for job in jobs], "count": query.count()}
+    except SQLAlchemyError as e:
+        return {"error": f"Database error: {e}"}
+
+
+def fail_interrupted_jobs(db: Session):
+    """Jobs still queued / running from a previous process can't finish anymore."""
+    try:
+        count = (
+            db.query(DatasetJob)
+            .filter(DatasetJob.state.in_(ACTIVE_STATES))
+            .update(
+                {
+                    "state": "failed",
+                    "error": "Interrupted by a restart of the client.",
+                    "finished_at": datetime.utcnow(),
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        return count
+    except SQLAlchemyError as e:
+        db.rollback()
+        return {"error": f"Database error: {e}"}
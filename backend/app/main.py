@@ -3,7 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
 import uvicorn
-import requests
+from utility import federated_client, hdfs_services, spark_services, dataset_jobs
 from contextlib import asynccontextmanager
 import asyncio
 from api import preprocessing_routes
@@ -33,6 +33,9 @@ environment = os.getenv("ENVIRONMENT")
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    model_training_routes.training_pool.start()
+    dataset_jobs.recover_interrupted_jobs()
+    spark_services.warmup_session()
     print("Starting Redis listeners")
     session_task = asyncio.create_task(redis_listener())
     round_task = asyncio.create_task(redis_round_listener())
@@ -49,6 +52,11 @@ async def lifespan(app: FastAPI):
     except asyncio.CancelledError:
         # This is expected
         pass
+    model_training_routes.training_pool.shutdown()
+    federated_client.close()
+    dataset_jobs.shutdown()
+    hdfs_services.shutdown()
+    spark_services.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -77,7 +85,7 @@ app.include_router(utils.utils_router)
 @app.get("/testing")
 def testing():
     try:
-        response = requests.get("http://localhost:8000/list-datasets")
+        response = federated_client.get("http://localhost:8000/list-datasets")
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -0,0 +1,37 @@
+from models.Base import Base
+from sqlalchemy import Column, DateTime, Float, JSON, String
+
+
+class DatasetJob(Base):
+    """Background dataset jobs (dataset creation, preprocessing) and their state"""
+
+    __tablename__ = "dataset_jobs"
+    job_id = Column(String(32), primary_key=True, index=True)
+    job_type = Column(String(32), nullable=False)
+    # queued, running, succeeded, failed, cancelled
+    state = Column(String(16), nullable=False, index=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    phase = Column(String(64), nullable=True)
+    params = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    timings = Column(JSON, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def as_dict(self):
+        return {
+            "job_id": self.job_id,
+            "job_type": self.job_type,
+            "state": self.state,
+            "progress": self.progress,
+            "phase": self.phase,
+            "params": self.params,
+            "result": self.result,
+            "error": self.error,
+            "timings": self.timings,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
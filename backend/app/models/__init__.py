@@ -1,2 +1,3 @@
 from .Dataset import RawDataset, Dataset
 from .Trainings import CurrentTrainings
+from .Jobs import DatasetJob
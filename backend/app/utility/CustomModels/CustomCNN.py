@@ -312,8 +312,8 @@ class CustomCNN:
             params = {"weights": []}
             for i, layer in enumerate(self.model.layers):
                 layer_weights = layer.get_weights()
-                # Convert each weight array to lists
-                params["weights"].append([w.tolist() for w in layer_weights])
+                # numpy arrays, serialized by the wire format (binary or JSON)
+                params["weights"].append(layer_weights)
             return params
         except Exception as e:
             handle_error(e)
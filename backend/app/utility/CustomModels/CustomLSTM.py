@@ -246,8 +246,8 @@ class CustomLSTM:
             params = {"weights": []}
             for i, layer in enumerate(self.model.layers):
                 layer_weights = layer.get_weights()
-                # Convert each weight array to lists (can't do at once.)
-                params["weights"].append([w.tolist() for w in layer_weights])
+                # numpy arrays, serialized by the wire format (binary or JSON)
+                params["weights"].append(layer_weights)
             return params
         except Exception as e:
             handle_error(e)
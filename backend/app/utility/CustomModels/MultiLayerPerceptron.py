@@ -2,6 +2,7 @@ import numpy as np
 import warnings
 from sklearn.neural_network import MLPClassifier, MLPRegressor
 from sklearn.preprocessing import StandardScaler
+from ..feature_parsing import is_string_rows, parse_delimited_rows
 
 
 class MultiLayerPerceptron:
@@ -122,46 +123,10 @@ class MultiLayerPerceptron:
     @staticmethod
     def _parse_to_2d_array(X):
         """Accepts arrays or lists of comma-separated strings and returns 2D np.array."""
-        print(f"X: {X}")
-        print(f"type(X): {type(X)}")
-        print(f"len(X): {len(X)}")
-        try:
-            print(f"isinstance(X[0], str): {isinstance(X[0], str)}")
-        except Exception:
-            pass
-        # Case 1: Python list of comma-separated strings
-        if isinstance(X, list) and len(X) > 0 and isinstance(X[0], str):
-            try:
-                parsed = []
-                for row in X:
-                    # split on commas and convert to float
-                    vals = [float(v.strip()) for v in row.split(",") if v.strip() != ""]
-                    parsed.append(vals)
-                return np.array(parsed, dtype=float)
-            except Exception:
-                pass
-        # Case 2: NumPy object array where each row is a single string, shape (n, 1)
-        if isinstance(X, np.ndarray) and X.dtype == object:
+        if is_string_rows(X):
             try:
-                if X.ndim == 2 and X.shape[1] == 1 and isinstance(X[0, 0], str):
-                    parsed = []
-                    for row in X:
-                        s = row[0]
-                        vals = [
-                            float(v.strip()) for v in s.split(",") if v.strip() != ""
-                        ]
-                        parsed.append(vals)
-                    return np.array(parsed, dtype=float)
-                # NumPy 1D object array of strings
-                if X.ndim == 1 and len(X) > 0 and isinstance(X[0], str):
-                    parsed = []
-                    for s in X:
-                        vals = [
-                            float(v.strip()) for v in s.split(",") if v.strip() != ""
-                        ]
-                        parsed.append(vals)
-                    return np.array(parsed, dtype=float)
-            except Exception:
+                return parse_delimited_rows(X, dtype=float)
+            except ValueError:
                 pass
         X_arr = np.array(X)
         if X_arr.ndim == 1:
@@ -399,7 +364,7 @@ class MultiLayerPerceptron:
                     self.hidden_layer_sizes = tuple(int(p) for p in parts)
                 except Exception:
                     pass
-            elif isinstance(hls, (list, tuple)):
+            elif isinstance(hls, (list, tuple, np.ndarray)):
                 try:
                     self.hidden_layer_sizes = tuple(int(v) for v in hls)
                 except Exception:
@@ -0,0 +1,365 @@
+import os
+import glob
+import gzip
+import json
+import time
+import random
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from dotenv import load_dotenv
+from . import parameter_exchange, federated_client
+from .parameter_exchange import (
+    PARAMETERS_CONTENT_TYPE,
+    JSON_CONTENT_TYPE,
+    encode_parameters,
+    upload_parameters,
+)
+from .update_compression import residual_path, save_residuals
+
+try:
+    import zstandard
+except ImportError:  # optional, gzip is used when zstandard isn't installed
+    zstandard = None
+
+load_dotenv()
+
+"""
+Chunked, resumable upload of client updates.
+
+Protocol (relative to the send-weights url):
+    GET  {url}/chunks/{upload_id}                -> {"received": [chunk indices], "completed": bool}
+    PUT  {url}/chunks/{upload_id}/{index}        -> body is one compressed chunk
+    POST {url}/chunks/{upload_id}/complete       -> server assembles and processes the update
+
+upload_id is the sha256 of the serialized update, so the same update always resumes the
+same upload. The serialized body, the acknowledged chunks and the round the update was
+trained for (the version of the global parameters it started from) are kept under
+data/uploads until the server confirms, with the error-feedback residuals of a compressed
+update, which become the session's residuals once the upload completed. A restarted worker finishes the pending uploads
+once at startup, an upload whose round is no longer the current one is dropped instead.
+Completing is not idempotent, after a failed complete request the upload status is checked
+before it is sent again. Servers without the chunk endpoints get the single request upload.
+"""
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 4 * 1024 * 1024))
+UPLOAD_PARALLELISM = int(os.getenv("UPLOAD_PARALLELISM", 4))
+UPLOAD_MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", 5))
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", 60))
+UPLOAD_COMPRESSION = os.getenv(
+    "UPLOAD_COMPRESSION", "zstd" if zstandard is not None else "gzip"
+)
+UPLOADS_DIR = os.path.join("data", "uploads")
+
+# status codes meaning the server has no chunked upload endpoints
+UNSUPPORTED_ENDPOINT_STATUS = (404, 405, 501)
+
+
+# remembered per process, a server without chunk endpoints is probed once
+_server_supports_chunks = True
+
+
+class ChunkedUploadUnsupported(Exception):
+    pass
+
+
+def _compress(chunk):
+    if UPLOAD_COMPRESSION == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(chunk), "zstd"
+    return gzip.compress(chunk, compresslevel=6), "gzip"
+
+
+def _state_paths(upload_id):
+    base = os.path.join(UPLOADS_DIR, upload_id)
+    return f"{base}.json", f"{base}.bin"
+
+
+def _save_state(state):
+    state_path, _ = _state_paths(state["upload_id"])
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+def _residuals_path(upload_id):
+    return os.path.join(UPLOADS_DIR, f"{upload_id}.residuals.npz")
+
+
+def _discard(upload_id):
+    for path in (*_state_paths(upload_id), _residuals_path(upload_id)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _commit_residuals(state):
+    """The residuals of a completed upload are carried over to the session's next round."""
+    path = _residuals_path(state["upload_id"])
+    if state.get("residuals") and os.path.exists(path):
+        session_path = residual_path(state["session_id"])
+        os.makedirs(os.path.dirname(session_path), exist_ok=True)
+        os.replace(path, session_path)
+
+
+def _with_retries(send, description):
+    """
+    Call send() until it succeeds, exponential backoff with jitter between attempts.
+    The chunk requests disable the client retries, uploads use their own longer backoff.
+    """
+    for attempt in range(UPLOAD_MAX_RETRIES):
+        try:
+            response = send()
+            if response.status_code < 500:
+                return response
+            error = f"status {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            error = str(e)
+        delay = min(30, 2**attempt) * (0.5 + random.random())
+        print(f"{description} failed ({error}), retrying in {delay:.1f}s")
+        time.sleep(delay)
+    raise requests.exceptions.RetryError(
+        f"{description} failed after {UPLOAD_MAX_RETRIES} attempts"
+    )
+
+
+def _run_upload(state, body, headers):
+    """Send the chunks the server hasn't acknowledged yet, then complete the upload."""
+    url = state["url"]
+    upload_id = state["upload_id"]
+    chunks_url = f"{url}/chunks/{upload_id}"
+
+    response = _with_retries(
+        lambda: federated_client.get(
+            chunks_url, headers=headers, timeout=UPLOAD_TIMEOUT, retries=0
+        ),
+        f"Upload status {upload_id}",
+    )
+    if response.status_code in UNSUPPORTED_ENDPOINT_STATUS:
+        raise ChunkedUploadUnsupported(url)
+    response.raise_for_status()
+    acknowledged = set(state["acknowledged"]) | set(response.json().get("received", []))
+
+    pending = [i for i in range(state["chunk_count"]) if i not in acknowledged]
+    print(
+        f"Uploading {len(pending)}/{state['chunk_count']} chunks of {upload_id} "
+        f"({state['total_size']} bytes, {UPLOAD_COMPRESSION})"
+    )
+
+    def send_chunk(index):
+        chunk = body[index * state["chunk_size"] : (index + 1) * state["chunk_size"]]
+        compressed, encoding = _compress(chunk)
+        chunk_headers = {
+            **headers,
+            "Content-Type": "application/octet-stream",
+            "Content-Encoding": encoding,
+            "X-Chunk-Count": str(state["chunk_count"]),
+            "X-Chunk-Sha256": hashlib.sha256(chunk).hexdigest(),
+            "X-Total-Size": str(state["total_size"]),
+            "X-Payload-Content-Type": state["content_type"],
+        }
+        response = _with_retries(
+            lambda: federated_client.put(
+                f"{chunks_url}/{index}",
+                data=compressed,
+                headers=chunk_headers,
+                timeout=UPLOAD_TIMEOUT,
+                retries=0,
+            ),
+            f"Chunk {index} of {upload_id}",
+        )
+        response.raise_for_status()
+        return index
+
+    with ThreadPoolExecutor(max_workers=max(1, UPLOAD_PARALLELISM)) as pool:
+        for index in pool.map(send_chunk, pending):
+            acknowledged.add(index)
+            state["acknowledged"] = sorted(acknowledged)
+            _save_state(state)
+
+    response = _complete_upload(state, headers)
+    _commit_residuals(state)
+    _discard(upload_id)
+    return response
+
+
+def _complete_upload(state, headers):
+    """
+    POST complete, but only while the server hasn't completed the upload already: a 5xx or
+    a lost response may come after the server processed the update.
+    """
+    upload_id = state["upload_id"]
+    chunks_url = f"{state['url']}/chunks/{upload_id}"
+    for attempt in range(UPLOAD_MAX_RETRIES):
+        if attempt:
+            time.sleep(min(30, 2**attempt) * (0.5 + random.random()))
+            status = _with_retries(
+                lambda: federated_client.get(
+                    chunks_url, headers=headers, timeout=UPLOAD_TIMEOUT, retries=0
+                ),
+                f"Upload status {upload_id}",
+            )
+            status.raise_for_status()
+            if status.json().get("completed"):
+                print(f"Upload {upload_id} was completed by the server")
+                return status
+        try:
+            response = federated_client.post(
+                f"{chunks_url}/complete",
+                json={
+                    "session_id": state["session_id"],
+                    "sha256": upload_id,
+                    "content_type": state["content_type"],
+                },
+                headers=headers,
+                timeout=UPLOAD_TIMEOUT,
+                retries=0,
+            )
+            if response.status_code < 500:
+                response.raise_for_status()
+                return response
+            error = f"status {response.status_code}"
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        ) as e:
+            error = str(e)
+        print(f"Completing {upload_id} failed ({error}), checking its status")
+    raise requests.exceptions.RetryError(
+        f"Completing {upload_id} failed after {UPLOAD_MAX_RETRIES} attempts"
+    )
+
+
+def upload_parameters_chunked(
+    url, payload, headers=None, to_json=None, round_id=None, residuals=None
+):
+    """
+    Upload a parameter payload in compressed chunks with per chunk retries.
+    round_id identifies the round the update belongs to, a pending upload is only resumed
+    while it is still the current one. residuals (error feedback of a compressed update)
+    are saved for the session once the server has the update, also by a later resume.
+    Falls back to a single request when the server has no chunk endpoints.
+    """
+    global _server_supports_chunks
+    headers = dict(headers or {})
+    headers.pop("Content-Type", None)
+    if not _server_supports_chunks:
+        return _upload_single(url, payload, headers, to_json, residuals)
+
+    if parameter_exchange.accepts_binary(url):
+        body, content_type = encode_parameters(payload), PARAMETERS_CONTENT_TYPE
+    else:
+        json_payload = to_json(payload) if to_json else payload
+        body, content_type = json.dumps(json_payload).encode("utf-8"), JSON_CONTENT_TYPE
+
+    upload_id = hashlib.sha256(body).hexdigest()
+    state_path, body_path = _state_paths(upload_id)
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+    else:
+        with open(body_path, "wb") as f:
+            f.write(body)
+        state = {
+            "upload_id": upload_id,
+            "url": url,
+            "session_id": payload.get("session_id"),
+            "round": round_id,
+            "content_type": content_type,
+            "total_size": len(body),
+            "chunk_size": UPLOAD_CHUNK_SIZE,
+            "chunk_count": max(1, -(-len(body) // UPLOAD_CHUNK_SIZE)),
+            "acknowledged": [],
+            "residuals": residuals is not None,
+        }
+        if residuals is not None:
+            save_residuals(
+                state["session_id"], residuals, path=_residuals_path(upload_id)
+            )
+        _save_state(state)
+
+    try:
+        return _run_upload(state, body, headers)
+    except ChunkedUploadUnsupported:
+        _discard(upload_id)
+        _server_supports_chunks = False
+        print("Server has no chunked upload endpoints, sending a single request")
+        return _upload_single(url, payload, headers, to_json, residuals)
+
+
+def _upload_single(url, payload, headers, to_json, residuals):
+    response = upload_parameters(
+        url, payload, headers=headers, to_json=to_json, timeout=UPLOAD_TIMEOUT
+    )
+    if residuals is not None:
+        save_residuals(payload.get("session_id"), residuals)
+    return response
+
+
+def _pending_uploads(session_id=None):
+    states = []
+    for state_path in glob.glob(os.path.join(UPLOADS_DIR, "*.json")):
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if session_id is None or str(state.get("session_id")) == str(session_id):
+            states.append(state)
+    return states
+
+
+def discard_stale_uploads(session_id, current_round):
+    """Drop pending uploads of a session trained for another round than current_round."""
+    for state in _pending_uploads(session_id):
+        if state.get("round") is None or state["round"] != current_round:
+            print(f"Dropping upload {state['upload_id']} of a past round")
+            _discard(state["upload_id"])
+
+
+def resume_pending_uploads(current_round, headers=None, owns_session=None):
+    """
+    Finish the uploads interrupted by a restart, meant to run once when a worker starts.
+    current_round(session_id) returns the round the server is in (None if unknown), an
+    upload of another round is dropped. owns_session(session_id) limits the resume to the
+    sessions of one worker. Returns how many uploads completed.
+    """
+    completed = 0
+    rounds = {}
+    for state in _pending_uploads():
+        session_id = str(state.get("session_id"))
+        if owns_session is not None and not owns_session(session_id):
+            continue
+        if session_id not in rounds:
+            try:
+                rounds[session_id] = current_round(session_id)
+            except requests.exceptions.RequestException as e:
+                print(f"Could not get the current round of session {session_id}: {e}")
+                rounds[session_id] = None
+        if rounds[session_id] is None:
+            continue  # left for a later start, a new round drops it if stale
+        if state.get("round") != rounds[session_id]:
+            print(f"Dropping upload {state['upload_id']} of a past round")
+            _discard(state["upload_id"])
+            continue
+
+        _, body_path = _state_paths(state["upload_id"])
+        if not os.path.exists(body_path):
+            _discard(state["upload_id"])
+            continue
+        with open(body_path, "rb") as f:
+            body = f.read()
+
+        print(f"Resuming upload {state['upload_id']} of session {session_id}")
+        try:
+            _run_upload(state, body, dict(headers or {}))
+            completed += 1
+        except ChunkedUploadUnsupported:
+            _discard(state["upload_id"])
+        except requests.exceptions.HTTPError as e:
+            # the server no longer wants this update (e.g. round closed)
+            print(f"Dropping pending upload {state['upload_id']}: {e}")
+            _discard(state["upload_id"])
+        except requests.exceptions.RequestException as e:
+            print(f"Could not resume upload {state['upload_id']}: {e}")
+    return completed
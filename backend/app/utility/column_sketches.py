@@ -0,0 +1,302 @@
+import os
+import math
+import base64
+from dotenv import load_dotenv
+
+load_dotenv()
+
+"""
+Mergeable per-column sketches stored next to the final numbers of a dataset overview
+(columnStats[i]["sketches"] in datastats):
+
+    moments      : count, nulls, sum, sum of squares, min, max (exact)
+    quantiles    : equal-weight centroids (value, weight) at OVERVIEW_SKETCH_CENTROIDS
+                   evenly spaced percentiles, merged like a t-digest
+    distinct     : DataSketches HyperLogLog (Spark hll_sketch_agg), base64
+    heavyHitters : most frequent values with counts + the count of everything else
+
+Stats of a union / append of datasets with the same columns are obtained by merging their
+sketches (merge_overviews) instead of rescanning. HLL unions need the optional
+`datasketches` package or an active Spark session. When a part has no HLL sketch or the
+registers can't be unioned, the merged distinct count is unknown (None), never a partial
+union that would undercount.
+"""
+
+OVERVIEW_SKETCHES = os.getenv("OVERVIEW_SKETCHES", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+OVERVIEW_SKETCH_CENTROIDS = int(os.getenv("OVERVIEW_SKETCH_CENTROIDS", 100))
+OVERVIEW_HLL_LGK = int(os.getenv("OVERVIEW_HLL_LGK", 10))
+HEAVY_HITTERS = int(os.getenv("OVERVIEW_HEAVY_HITTERS", 50))
+
+try:
+    import datasketches
+except ImportError:
+    datasketches = None
+
+
+def centroid_probabilities(num_centroids=OVERVIEW_SKETCH_CENTROIDS):
+    """Midpoints of num_centroids equal-weight slices of the distribution."""
+    return [(i + 0.5) / num_centroids for i in range(num_centroids)]
+
+
+def moments_sketch(count, nulls, total, squares, min_val, max_val):
+    return {
+        "count": count,
+        "nulls": nulls,
+        "sum": total,
+        "sumSquares": squares,
+        "min": min_val,
+        "max": max_val,
+    }
+
+
+def merge_moments(sketches):
+    sketches = [s for s in sketches if s]
+    if not sketches:
+        return None
+    minimums = [s["min"] for s in sketches if s["min"] is not None]
+    maximums = [s["max"] for s in sketches if s["max"] is not None]
+    return moments_sketch(
+        sum(s["count"] for s in sketches),
+        sum(s["nulls"] for s in sketches),
+        sum(s["sum"] or 0 for s in sketches),
+        sum(s["sumSquares"] or 0 for s in sketches),
+        min(minimums) if minimums else None,
+        max(maximums) if maximums else None,
+    )
+
+
+def quantile_sketch(values, count):
+    """Centroids of the percentile_approx values of a column with count non-null rows."""
+    if not values or not count:
+        return {"centroids": []}
+    weight = count / len(values)
+    return {"centroids": [[value, weight] for value in values]}
+
+
+def merge_quantiles(sketches, num_centroids=OVERVIEW_SKETCH_CENTROIDS):
+    """Combine the centroids and compress them back to num_centroids equal weights."""
+    centroids = sorted(
+        (c for s in sketches if s for c in s["centroids"]), key=lambda c: c[0]
+    )
+    total = sum(weight for _, weight in centroids)
+    if not total:
+        return {"centroids": []}
+    target = total / num_centroids
+    merged, value_sum, weight_sum = [], 0.0, 0.0
+    for value, weight in centroids:
+        while weight > 0:
+            take = min(weight, target - weight_sum)
+            value_sum += value * take
+            weight_sum += take
+            weight -= take
+            if weight_sum >= target * (1 - 1e-9):
+                merged.append([value_sum / weight_sum, weight_sum])
+                value_sum, weight_sum = 0.0, 0.0
+    if weight_sum > 0:
+        merged.append([value_sum / weight_sum, weight_sum])
+    return {"centroids": merged}
+
+
+def quantiles_from_sketch(sketch, probabilities):
+    """Quantiles by linear interpolation between the centroid midpoints."""
+    centroids = sketch["centroids"] if sketch else []
+    if not centroids:
+        return [None for _ in probabilities]
+    total = sum(weight for _, weight in centroids)
+    positions, cumulative = [], 0.0
+    for _, weight in centroids:
+        positions.append((cumulative + weight / 2) / total)
+        cumulative += weight
+    result = []
+    for p in probabilities:
+        if p <= positions[0]:
+            result.append(centroids[0][0])
+            continue
+        if p >= positions[-1]:
+            result.append(centroids[-1][0])
+            continue
+        for i in range(1, len(positions)):
+            if p <= positions[i]:
+                share = (p - positions[i - 1]) / (positions[i] - positions[i - 1])
+                low, high = centroids[i - 1][0], centroids[i][0]
+                result.append(low + share * (high - low))
+                break
+    return result
+
+
+def hll_sketch(serialized, lgk=OVERVIEW_HLL_LGK):
+    if serialized is None:
+        return None
+    return {"hll": base64.b64encode(bytes(serialized)).decode("ascii"), "lgk": lgk}
+
+
+def _spark_hll_union(sketches, lgk):
+    from pyspark.sql import SparkSession
+    from pyspark.sql import functions as F
+
+    spark = SparkSession.getActiveSession()
+    if spark is None:
+        return None
+    df = spark.createDataFrame([(s["hll"],) for s in sketches], ["hll"])
+    row = df.select(
+        F.hll_union_agg(F.unbase64("hll"), allowDifferentLgConfigK=True).alias("u")
+    ).select(F.col("u"), F.hll_sketch_estimate("u").alias("estimate"))
+    row = row.first()
+    return bytes(row["u"]), row["estimate"]
+
+
+def hll_from_values(values, lgk=OVERVIEW_HLL_LGK):
+    """
+    HLL sketch of python ints / strs hashed like Spark's hll_sketch_agg on integer and string
+    columns (HLL_4, empty strings skipped), so both engines' sketches union. None without
+    the datasketches package.
+    """
+    if datasketches is None:
+        return None
+    sketch = datasketches.hll_sketch(lgk, datasketches.tgt_hll_type.HLL_4)
+    for value in values:
+        sketch.update(value)
+    return hll_sketch(sketch.serialize_compact(), lgk)
+
+
+def merge_hll(sketches):
+    """Union of HLL sketches -> (sketch, distinct estimate), (None, None) when unknown."""
+    if not sketches or any(not s or not s.get("hll") for s in sketches):
+        print("A part has no HLL sketch, the merged distinct count is unknown")
+        return None, None
+    lgk = min(s["lgk"] for s in sketches)
+    if datasketches is not None:
+        union = datasketches.hll_union(lgk)
+        for s in sketches:
+            union.update(
+                datasketches.hll_sketch.deserialize(base64.b64decode(s["hll"]))
+            )
+        result = union.get_result()
+        return hll_sketch(result.serialize_compact(), lgk), round(result.get_estimate())
+    try:
+        merged = _spark_hll_union(sketches, lgk)
+    except Exception as e:
+        print(f"HLL union through Spark failed: {e}")
+        merged = None
+    if merged is not None:
+        return hll_sketch(merged[0], lgk), merged[1]
+    # no way to union the registers
+    return None, None
+
+
+def heavy_hitters_sketch(items, count):
+    """items: [(value, count)] of the most frequent values out of count rows."""
+    items = list(items)[:HEAVY_HITTERS]
+    return {
+        "items": [[value, value_count] for value, value_count in items],
+        "otherCount": count - sum(value_count for _, value_count in items),
+    }
+
+
+def merge_heavy_hitters(sketches):
+    """
+    Counts of values missing from a part's list are unknown (at most that part's smallest
+    listed count), so the merged counts are lower bounds, off by at most the sum of those.
+    """
+    counts, total = {}, 0
+    for s in sketches:
+        if not s:
+            continue
+        for value, value_count in s["items"]:
+            counts[value] = counts.get(value, 0) + value_count
+        total += s["otherCount"] + sum(c for _, c in s["items"])
+    items = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    return heavy_hitters_sketch(items, total)
+
+
+def merge_column_sketches(sketches):
+    """Merge the sketches of one column from several datasets."""
+    merged = {"moments": merge_moments([s.get("moments") for s in sketches])}
+    if any(s.get("quantiles") for s in sketches):
+        merged["quantiles"] = merge_quantiles([s.get("quantiles") for s in sketches])
+    if any("distinctEstimate" in s for s in sketches):
+        merged["distinct"], merged["distinctEstimate"] = merge_hll(
+            [s.get("distinct") for s in sketches]
+        )
+    if any(s.get("heavyHitters") for s in sketches):
+        merged["heavyHitters"] = merge_heavy_hitters(
+            [s.get("heavyHitters") for s in sketches]
+        )
+    return merged
+
+
+def stats_from_sketches(sketches, top_categories=10):
+    """The overview numbers of a column computed from its (merged) sketches."""
+    moments = sketches.get("moments") or {}
+    count = moments.get("count", 0)
+    nulls = moments.get("nulls", 0)
+    stats = {"entries": count, "nullCount": nulls}
+    values = count - nulls
+    if sketches.get("quantiles"):
+        mean = moments["sum"] / values if values else None
+        variance = None
+        if values > 1:
+            variance = (moments["sumSquares"] - values * mean**2) / (values - 1)
+        q1, median, q3 = quantiles_from_sketch(sketches["quantiles"], [0.25, 0.5, 0.75])
+        stats.update(
+            {
+                "mean": mean,
+                "stddev": math.sqrt(max(variance, 0)) if variance is not None else None,
+                "min": moments.get("min"),
+                "max": moments.get("max"),
+                "quartiles": {
+                    "Q1": q1,
+                    "median": median,
+                    "Q3": q3,
+                    "IQR": q3 - q1 if q1 is not None else None,
+                },
+            }
+        )
+    if sketches.get("distinctEstimate") is not None:
+        # like distinct().count(), null is one of the values
+        stats["uniqueCount"] = sketches["distinctEstimate"] + (1 if nulls else 0)
+    elif "distinctEstimate" in sketches:
+        stats["uniqueCount"] = None  # unknown, the parts' sketches could not be unioned
+    if sketches.get("heavyHitters"):
+        stats["topCategories"] = [
+            {"value": value, "count": value_count}
+            for value, value_count in sketches["heavyHitters"]["items"][:top_categories]
+        ]
+    return stats
+
+
+def merge_overviews(overviews):
+    """
+    Overview of the union of datasets with the same columns from their stored overviews.
+    Columns without sketches keep only name and type.
+    """
+    column_stats = []
+    for column in overviews[0]["columnStats"]:
+        parts = [
+            next(
+                (c for c in overview["columnStats"] if c["name"] == column["name"]),
+                None,
+            )
+            for overview in overviews
+        ]
+        if any(part is None or "sketches" not in part for part in parts):
+            column_stats.append({"name": column["name"], "type": column["type"]})
+            continue
+        sketches = merge_column_sketches([part["sketches"] for part in parts])
+        column_stats.append(
+            {
+                "name": column["name"],
+                "type": column["type"],
+                **stats_from_sketches(sketches),
+                "sketches": sketches,
+            }
+        )
+    return {
+        "numRows": sum(overview["numRows"] for overview in overviews),
+        "numColumns": overviews[0]["numColumns"],
+        "columnStats": column_stats,
+    }
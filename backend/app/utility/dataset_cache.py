@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+"""
+Node-local cache of extracted training arrays, shared by all sessions using the same data.
+
+An entry is keyed by (HDFS path, HDFS modification time, input columns, output columns) and
+holds the typed X/Y arrays + metadata sidecar written by save_training_arrays:
+
+data/dataset_cache/{key}/
+    X_entry.npy, Y_entry.npy, XY_entry.json
+    entry.json      -> hdfs path, columns, size, last access, linked sessions
+
+Sessions get hardlinks to the entry files (a copy when hardlinks aren't possible), so any
+number of sessions costs the disk space and page cache of one extraction. The cache is kept
+under DATASET_CACHE_MAX_BYTES by evicting the least recently used entries that no session
+is linked to: X/Y are only prepared when a session is set up, a training session keeps its
+entry until release_session removes its files after the last round. A hardlink keeps the
+blocks allocated, so a pinned entry costs no extra space over its sessions' files.
+"""
+
+DATASET_CACHE_DIR = os.path.join("data", "dataset_cache")
+DATASET_CACHE_MAX_BYTES = int(os.getenv("DATASET_CACHE_MAX_BYTES", 20 * 1024**3))
+ENTRY_NAME = "entry"
+# bumped when the layout of the cached arrays changes
+CACHE_FORMAT_VERSION = 2
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def cache_key(hdfs_path, modification_time, input_columns, output_columns):
+    description = json.dumps(
+        {
+            "hdfs_path": hdfs_path,
+            "modification_time": modification_time,
+            "input_columns": list(input_columns),
+            "output_columns": list(output_columns),
+            "version": CACHE_FORMAT_VERSION,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()[:24]
+
+
+def _entry_dir(key):
+    return os.path.join(DATASET_CACHE_DIR, key)
+
+
+def _read_entry(key):
+    try:
+        with open(os.path.join(_entry_dir(key), "entry.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_entry(entry_dir, entry):
+    path = os.path.join(entry_dir, "entry.json")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(entry, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _link(source, destination):
+    tmp_path = f"{destination}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copy2(source, tmp_path)
+    os.replace(tmp_path, destination)
+
+
+def _session_files(local_dir, session_id):
+    """[(entry file name, session path)], the sidecar last, it marks the arrays as complete."""
+    return [
+        (
+            f"{prefix}_{ENTRY_NAME}.{extension}",
+            os.path.join(local_dir, f"{prefix}_{session_id}.{extension}"),
+        )
+        for prefix, extension in (("X", "npy"), ("Y", "npy"), ("XY", "json"))
+    ]
+
+
+def _link_into_session(key, local_dir, session_id):
+    """Link the entry files into the session and record the session, returns the entry."""
+    entry_dir = _entry_dir(key)
+    for name, path in _session_files(local_dir, session_id):
+        _link(os.path.join(entry_dir, name), path)
+    # a session is linked to one entry at a time
+    for other_key, other in _entries():
+        if other_key != key and str(session_id) in other.get("sessions", {}):
+            del other["sessions"][str(session_id)]
+            _write_entry(_entry_dir(other_key), other)
+    entry = _read_entry(key)
+    entry.setdefault("sessions", {})[str(session_id)] = local_dir
+    _write_entry(entry_dir, entry)
+    return entry
+
+
+def _unlink_session(local_dir, session_id):
+    for _, path in _session_files(local_dir, session_id):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _linked_bytes(entry):
+    total = 0
+    for session_id, local_dir in entry.get("sessions", {}).items():
+        for _, path in _session_files(local_dir, session_id):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+    return total
+
+
+def link_cached(key, local_dir, session_id):
+    """Link a cached extraction into the session files, False on a miss."""
+    with _lock:
+        if _read_entry(key) is None:
+            _stats["misses"] += 1
+            return False
+        try:
+            entry = _link_into_session(key, local_dir, session_id)
+        except OSError as e:
+            print(f"Dataset cache entry {key} unusable ({e}), dropping it")
+            shutil.rmtree(_entry_dir(key), ignore_errors=True)
+            _stats["misses"] += 1
+            return False
+        entry["last_access"] = time.time()
+        entry["hits"] = entry.get("hits", 0) + 1
+        _write_entry(_entry_dir(key), entry)
+        _stats["hits"] += 1
+    print(f"Dataset cache hit for {entry['hdfs_path']} ({key})")
+    return True
+
+
+def staging_dir(key):
+    """Directory the extraction of a missed key is written to before store() commits it."""
+    path = os.path.join(DATASET_CACHE_DIR, f"{key}.{os.getpid()}.staging")
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return path
+
+
+def store(key, staged_dir, local_dir, session_id, hdfs_path, columns):
+    """Commit a staged extraction to the cache, link it into the session, then evict."""
+    size = sum(
+        os.path.getsize(os.path.join(staged_dir, name))
+        for name in os.listdir(staged_dir)
+    )
+    _write_entry(
+        staged_dir,
+        {
+            "hdfs_path": hdfs_path,
+            "columns": columns,
+            "size": size,
+            "created": time.time(),
+            "last_access": time.time(),
+            "hits": 0,
+        },
+    )
+    with _lock:
+        if os.path.exists(_entry_dir(key)):
+            # another session extracted the same data meanwhile
+            shutil.rmtree(staged_dir, ignore_errors=True)
+        else:
+            os.replace(staged_dir, _entry_dir(key))
+        _link_into_session(key, local_dir, session_id)
+        _evict(keep=key)
+
+
+def _entries():
+    if not os.path.isdir(DATASET_CACHE_DIR):
+        return []
+    entries = []
+    for key in os.listdir(DATASET_CACHE_DIR):
+        if "." in key:
+            continue  # staging directory of an extraction in progress
+        entry = _read_entry(key)
+        if entry is not None:
+            entries.append((key, entry))
+    return entries
+
+
+def _remove_entry(key):
+    shutil.rmtree(_entry_dir(key), ignore_errors=True)
+
+
+def release_session(session_id):
+    """Remove the files linked into a finished session, the cache entry itself stays."""
+    with _lock:
+        for key, entry in _entries():
+            local_dir = entry.get("sessions", {}).pop(str(session_id), None)
+            if local_dir is None:
+                continue
+            _unlink_session(local_dir, session_id)
+            _write_entry(_entry_dir(key), entry)
+            print(f"Released the dataset files of session {session_id} ({key})")
+            return True
+    return False
+
+
+def _evict(keep=None):
+    entries = sorted(_entries(), key=lambda item: item[1]["last_access"])
+    total = sum(entry["size"] for _, entry in entries)
+    for key, entry in entries:
+        if total <= DATASET_CACHE_MAX_BYTES:
+            break
+        # sessions still training read these files
+        if key == keep or entry.get("sessions"):
+            continue
+        _remove_entry(key)
+        total -= entry["size"]
+        _stats["evictions"] += 1
+        print(f"Evicted dataset cache entry {key} ({entry['hdfs_path']})")
+    if total > DATASET_CACHE_MAX_BYTES:
+        print(
+            f"Dataset cache holds {total} bytes over its {DATASET_CACHE_MAX_BYTES} byte "
+            f"limit, the remaining entries are in use by sessions"
+        )
+
+
+def get_cache_stats():
+    with _lock:
+        entries = _entries()
+        linked = {key: _linked_bytes(entry) for key, entry in entries}
+        return {
+            **_stats,
+            "entries": len(entries),
+            "bytes": sum(entry["size"] for _, entry in entries),
+            "linked_sessions": sum(
+                len(entry.get("sessions", {})) for _, entry in entries
+            ),
+            "linked_bytes": sum(linked.values()),
+            "max_bytes": DATASET_CACHE_MAX_BYTES,
+            "datasets": [
+                {
+                    "key": key,
+                    "hdfs_path": entry["hdfs_path"],
+                    "size": entry["size"],
+                    "hits": entry.get("hits", 0),
+                    "last_access": entry["last_access"],
+                    "sessions": sorted(entry.get("sessions", {})),
+                    "linked_bytes": linked[key],
+                }
+                for key, entry in entries
+            ],
+        }
+
+
+def clear_cache():
+    """Remove every entry no session is linked to, returns the number of entries kept."""
+    kept = 0
+    with _lock:
+        for key, entry in _entries():
+            if entry.get("sessions"):
+                kept += 1
+                continue
+            _remove_entry(key)
+    return kept
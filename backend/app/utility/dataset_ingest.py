@@ -0,0 +1,194 @@
+import os
+import json
+import math
+import hashlib
+from dotenv import load_dotenv
+from pyspark.sql import functions as F
+from pyspark.sql.types import (
+    DoubleType,
+    IntegerType,
+    LongType,
+    StringType,
+    StructField,
+    StructType,
+)
+from utility.redis import redis_sync_client
+
+load_dotenv()
+
+"""
+CSV to Parquet ingest with a single read of the CSV.
+
+inferSchema=True makes Spark read the whole CSV once only to find the column types. Here the
+types are inferred from the first CSV_SCHEMA_SAMPLE_ROWS lines, widened with the schema cached
+for the same header (re-uploads of the same layout), and the file is read once with that
+explicit schema. The read is FAILFAST: if a later row doesn't fit the sampled types, the
+file is read again with full inference, so no value is silently turned into null.
+A column without any value in the sample would be inferred as a string, which FAILFAST
+can't catch. It is marked as unknown (also in the cached schema, so its type is never
+taken from the cache) and the file is read with full inference instead.
+CSV_SCHEMA_MODE=infer keeps full inference.
+
+Parquet output uses PARQUET_COMPRESSION and files of at most about PARQUET_TARGET_FILE_MB.
+The output size of a CSV is estimated as CSV_PARQUET_SIZE_RATIO times its size. Only the
+write is repartitioned to that file count, the read and parse keep all their tasks.
+"""
+
+CSV_SCHEMA_MODE = os.getenv("CSV_SCHEMA_MODE", "sample")
+CSV_SCHEMA_SAMPLE_ROWS = int(os.getenv("CSV_SCHEMA_SAMPLE_ROWS", 10000))
+CSV_SCHEMA_CACHE_TTL = int(os.getenv("CSV_SCHEMA_CACHE_TTL", 30 * 24 * 3600))
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "snappy")
+PARQUET_TARGET_FILE_MB = int(os.getenv("PARQUET_TARGET_FILE_MB", 128))
+# Parquet bytes per CSV byte, typical for numeric / low cardinality columns with snappy
+CSV_PARQUET_SIZE_RATIO = float(os.getenv("CSV_PARQUET_SIZE_RATIO", 0.35))
+
+# numeric types CSV inference produces, narrowest first
+NUMERIC_WIDENING = [IntegerType(), LongType(), DoubleType()]
+# StructField metadata of a column that had no value in the sampled lines
+NO_VALUES = "csv_no_values"
+
+
+def _schema_key(header):
+    return f"csv_schema:{hashlib.sha256(header.encode('utf-8')).hexdigest()[:24]}"
+
+
+def _cached_schema(header):
+    try:
+        value = redis_sync_client.get(_schema_key(header))
+        return StructType.fromJson(json.loads(value)) if value else None
+    except Exception as e:
+        print(f"CSV schema cache unavailable: {e}")
+        return None
+
+
+def cache_schema(header, schema):
+    try:
+        redis_sync_client.set(
+            _schema_key(header), schema.json(), ex=CSV_SCHEMA_CACHE_TTL
+        )
+    except Exception as e:
+        print(f"CSV schema cache unavailable: {e}")
+
+
+def _wider_type(a, b):
+    if a == b:
+        return a
+    if a in NUMERIC_WIDENING and b in NUMERIC_WIDENING:
+        return max(a, b, key=NUMERIC_WIDENING.index)
+    return StringType()
+
+
+def _has_no_values(field):
+    return bool(field.metadata.get(NO_VALUES))
+
+
+def no_value_columns(schema):
+    """Columns whose type is unknown, they had no value in the sample."""
+    return [field.name for field in schema.fields if _has_no_values(field)]
+
+
+def mark_no_values(schema, columns):
+    columns = set(columns)
+    return StructType(
+        [
+            (
+                StructField(field.name, field.dataType, True, {NO_VALUES: True})
+                if field.name in columns
+                else field
+            )
+            for field in schema.fields
+        ]
+    )
+
+
+def _merge_field(cached, sampled):
+    # a column without values in the sample gets its type from the whole file, not the
+    # cache, and a cached column without values has no type to widen with
+    if _has_no_values(sampled) or _has_no_values(cached):
+        return sampled
+    return StructField(
+        sampled.name, _wider_type(cached.dataType, sampled.dataType), True
+    )
+
+
+def merge_schemas(cached, sampled):
+    """Column-wise wider type of both schemas, the sampled one if the columns differ."""
+    if cached is None or cached.fieldNames() != sampled.fieldNames():
+        return sampled
+    return StructType(
+        [_merge_field(a, b) for a, b in zip(cached.fields, sampled.fields)]
+    )
+
+
+def sample_schema(spark, path):
+    """
+    (schema, header line) inferred from the first CSV_SCHEMA_SAMPLE_ROWS lines and the
+    cached schema of the header, (None, None) when the file has no lines.
+    Note: a quoted value spanning several lines may be cut at the end of the sample.
+    """
+    lines = [
+        row.value
+        for row in spark.read.text(path).limit(CSV_SCHEMA_SAMPLE_ROWS + 1).collect()
+    ]
+    if not lines:
+        return None, None
+    sample = spark.read.csv(
+        spark.sparkContext.parallelize(lines), header=True, inferSchema=True
+    )
+    names = sample.schema.fieldNames()
+    counts = sample.select(
+        [F.count(F.col(f"`{name}`")).alias(str(i)) for i, name in enumerate(names)]
+    ).first()
+    sampled = mark_no_values(
+        sample.schema, [name for i, name in enumerate(names) if counts[i] == 0]
+    )
+    return merge_schemas(_cached_schema(lines[0]), sampled), lines[0]
+
+
+def write_parquet(df, path, input_bytes=None, size_ratio=1.0):
+    """
+    Write with the configured codec in files of about PARQUET_TARGET_FILE_MB, the output
+    size being estimated as input_bytes * size_ratio.
+    """
+    if input_bytes:
+        output_bytes = input_bytes * size_ratio
+        files = max(1, math.ceil(output_bytes / (PARQUET_TARGET_FILE_MB * 1024**2)))
+        if files < df.rdd.getNumPartitions():
+            # a shuffle before the write only, coalesce would also shrink the read stage
+            df = df.repartition(files)
+    df.write.mode("overwrite").option("compression", PARQUET_COMPRESSION).parquet(path)
+
+
+def ingest_csv(spark, source_path, target_path, input_bytes=None):
+    """Read the CSV once (sampled / cached schema) and write it as Parquet."""
+    schema, header, unknown = None, None, []
+    if CSV_SCHEMA_MODE != "infer":
+        schema, header = sample_schema(spark, source_path)
+    if schema is not None:
+        unknown = no_value_columns(schema)
+        if unknown:
+            print(
+                f"No values of {unknown} in the first {CSV_SCHEMA_SAMPLE_ROWS} lines, "
+                f"inferring the schema from the whole file"
+            )
+
+    if schema is not None and not unknown:
+        try:
+            df = spark.read.csv(
+                source_path, header=True, schema=schema, mode="FAILFAST"
+            )
+            write_parquet(df, target_path, input_bytes, CSV_PARQUET_SIZE_RATIO)
+            cache_schema(header, schema)
+            return
+        except Exception as e:
+            if "cancel" in str(e).lower():
+                raise
+            print(
+                f"CSV rows don't fit the sampled schema, inferring it from the whole file: {e}"
+            )
+
+    df = spark.read.csv(source_path, header=True, inferSchema=True)
+    write_parquet(df, target_path, input_bytes, CSV_PARQUET_SIZE_RATIO)
+    if header is not None:
+        # the types of the unknown columns stay unknown in the cache
+        cache_schema(header, mark_no_values(df.schema, unknown))
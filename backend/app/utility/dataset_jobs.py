@@ -0,0 +1,200 @@
+import os
+import time
+import uuid
+import asyncio
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from utility.db import get_db
+from utility.spark_services import SparkSessionManager
+from crud.jobs_crud import create_job, update_job, fail_interrupted_jobs
+
+load_dotenv()
+
+"""
+Background dataset jobs (dataset creation, preprocessing) with a persistent state.
+
+Every job gets a row in the dataset_jobs table (state, progress, phase timings, result,
+error) and runs on a small worker pool. Admission is bounded: at most DATASET_JOB_QUEUE_SIZE
+jobs can be queued or running, further submissions are rejected with JobQueueFull.
+The job id is the Spark job group of the job's Spark work, so cancel() (by the user or
+after DATASET_JOB_TIMEOUT seconds) stops its running stages with cancelJobGroup.
+"""
+
+DATASET_JOB_WORKERS = int(os.getenv("DATASET_JOB_WORKERS", 2))
+# queued + running jobs
+DATASET_JOB_QUEUE_SIZE = int(os.getenv("DATASET_JOB_QUEUE_SIZE", 8))
+DATASET_JOB_TIMEOUT = float(os.getenv("DATASET_JOB_TIMEOUT", 3600))
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _update(job_id, **fields):
+    db = next(get_db())
+    try:
+        result = update_job(db, job_id, **fields)
+        if isinstance(result, dict) and "error" in result:
+            print(f"Failed to update dataset job {job_id}: {result['error']}")
+    finally:
+        db.close()
+
+
+class DatasetJobQueue:
+    def __init__(
+        self,
+        workers=DATASET_JOB_WORKERS,
+        capacity=DATASET_JOB_QUEUE_SIZE,
+        timeout=DATASET_JOB_TIMEOUT,
+    ):
+        self.capacity = capacity
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="dataset-job"
+        )
+        self._lock = threading.Lock()
+        # job_id -> {"future", "cancelled", "reason", "phases"}
+        self._jobs = {}
+
+    def has_capacity(self):
+        with self._lock:
+            return len(self._jobs) < self.capacity
+
+    def submit(self, job_type, params, job_function):
+        """
+        Queue job_function(job_id, progress), an async function returning a result dict
+        ({"error": ...} marks the job failed). Returns the job id.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if len(self._jobs) >= self.capacity:
+                raise JobQueueFull(
+                    f"{len(self._jobs)} dataset jobs are queued or running, try again later."
+                )
+            db = next(get_db())
+            try:
+                result = create_job(db, job_id, job_type, params)
+            finally:
+                db.close()
+            if isinstance(result, dict) and "error" in result:
+                raise Exception(result["error"])
+            job = {"cancelled": threading.Event(), "reason": None, "phases": {}}
+            self._jobs[job_id] = job
+            job["future"] = self._executor.submit(self._run, job_id, job_function)
+        print(f"Dataset job {job_id} ({job_type}) queued")
+        return job_id
+
+    def _progress(self, job_id, job):
+        def progress(phase, fraction):
+            # phases are also the cancellation points of non-Spark work
+            if job["cancelled"].is_set():
+                raise JobCancelled(job["reason"])
+            now = time.time()
+            phases = job["phases"]
+            last = next(reversed(phases)) if phases else None
+            if last != phase:
+                # phases hold their start time until the next one begins
+                if last is not None:
+                    phases[last] = now - phases[last]
+                phases[phase] = now
+            _update(job_id, phase=phase, progress=fraction)
+
+        return progress
+
+    def _run(self, job_id, job_function):
+        with self._lock:
+            job = self._jobs[job_id]
+        started = time.time()
+        _update(job_id, state="running", started_at=datetime.utcnow())
+        watchdog = threading.Timer(
+            self.timeout,
+            self.cancel,
+            args=(job_id, f"Timed out after {self.timeout:.0f}s"),
+        )
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            result = asyncio.run(job_function(job_id, self._progress(job_id, job)))
+            error = result.get("error") if isinstance(result, dict) else None
+        except Exception as e:
+            result, error = None, str(e)
+        finally:
+            watchdog.cancel()
+            with self._lock:
+                self._jobs.pop(job_id, None)
+
+        phases = job["phases"]
+        if phases:
+            last = next(reversed(phases))
+            phases[last] = time.time() - phases[last]
+        fields = {
+            "finished_at": datetime.utcnow(),
+            "timings": {**phases, "total": time.time() - started},
+        }
+        if job["cancelled"].is_set():
+            fields.update(state="cancelled", error=job["reason"])
+        elif error:
+            fields.update(state="failed", error=error)
+        else:
+            fields.update(state="succeeded", progress=1.0, result=result)
+        _update(job_id, **fields)
+        print(f"Dataset job {job_id} {fields['state']}")
+
+    def cancel(self, job_id, reason="Cancelled by user."):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return {"error": "Job is not queued or running."}
+            job["reason"] = reason
+            job["cancelled"].set()
+            if job["future"].cancel():
+                # never started
+                self._jobs.pop(job_id, None)
+                queued = True
+            else:
+                queued = False
+
+        if queued:
+            _update(
+                job_id, state="cancelled", error=reason, finished_at=datetime.utcnow()
+            )
+            return {"message": "Job cancelled."}
+
+        spark = SparkSessionManager.get_active_session()
+        if spark is not None:
+            spark.sparkContext.cancelJobGroup(job_id)
+        print(f"Cancellation of dataset job {job_id} requested: {reason}")
+        return {"message": "Cancellation requested."}
+
+    def shutdown(self):
+        with self._lock:
+            job_ids = list(self._jobs)
+        for job_id in job_ids:
+            self.cancel(job_id, "Client is shutting down.")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+job_queue = DatasetJobQueue()
+
+
+def recover_interrupted_jobs():
+    """Mark the jobs a previous process left queued / running as failed (app startup)."""
+    db = next(get_db())
+    try:
+        count = fail_interrupted_jobs(db)
+        if isinstance(count, dict):
+            print(f"Could not recover dataset jobs: {count['error']}")
+        elif count:
+            print(f"Marked {count} interrupted dataset jobs as failed")
+    finally:
+        db.close()
+
+
+def shutdown():
+    job_queue.shutdown()
@@ -0,0 +1,401 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+from pyspark.sql import Window
+from pyspark.sql import functions as F
+from pyspark.sql.types import (
+    ArrayType,
+    DoubleType,
+    FloatType,
+    IntegerType,
+    LongType,
+    StringType,
+)
+from utility.column_sketches import (
+    OVERVIEW_SKETCHES,
+    OVERVIEW_HLL_LGK,
+    HEAVY_HITTERS,
+    centroid_probabilities,
+    moments_sketch,
+    quantile_sketch,
+    hll_sketch,
+    heavy_hitters_sketch,
+)
+
+load_dotenv()
+
+"""
+Per-column statistics of a dataset overview, computed with combined aggregate expressions.
+
+Instead of several Spark jobs per column (count, null count, summary, distinct, quantiles,
+histogram) the whole table is scanned a fixed number of times:
+    1. one aggregation: row count, null counts, mean/stddev/min/max, quartiles,
+       distinct counts and array length stats of every column
+    2. one aggregation: histogram buckets of every numeric column (needs the min/max of 1.)
+    3. one grouped job: top categories of every string column
+Distinct counts are HyperLogLog estimates unless OVERVIEW_EXACT_DISTINCT is set.
+With OVERVIEW_SKETCHES the same jobs also produce the mergeable sketches of every column
+(see utility.column_sketches).
+"""
+
+OVERVIEW_EXACT_DISTINCT = os.getenv("OVERVIEW_EXACT_DISTINCT", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# relative standard deviation of the approximate distinct counts
+OVERVIEW_DISTINCT_RSD = float(os.getenv("OVERVIEW_DISTINCT_RSD", 0.05))
+# same relative error approxQuantile was called with
+QUANTILE_RELATIVE_ERROR = 0.05
+HISTOGRAM_BINS = 10
+TOP_CATEGORIES = 10
+NUMERIC_TYPES = (IntegerType, DoubleType, FloatType, LongType)
+
+
+def _alias(index, name):
+    # positional aliases, column names may contain any character
+    return f"c{index}_{name}"
+
+
+def _column_kind(data_type):
+    if isinstance(data_type, NUMERIC_TYPES):
+        return "numeric"
+    if isinstance(data_type, StringType):
+        return "string"
+    if isinstance(data_type, ArrayType):
+        return "array"
+    return "other"
+
+
+def _distinct_count(column, exact_distinct):
+    if exact_distinct:
+        return F.countDistinct(column)
+    return F.approx_count_distinct(column, rsd=OVERVIEW_DISTINCT_RSD)
+
+
+def _sketch_expressions(index, column, kind, data_type):
+    expressions = []
+    if kind == "numeric":
+        value = column.cast("double")
+        expressions += [
+            F.sum(value).alias(_alias(index, "sum")),
+            F.sum(value * value).alias(_alias(index, "sumSquares")),
+            F.percentile_approx(
+                column,
+                centroid_probabilities(),
+                int(10 / QUANTILE_RELATIVE_ERROR),
+            ).alias(_alias(index, "centroids")),
+        ]
+    if kind in ("numeric", "string"):
+        # hll_sketch_agg takes integers, strings and binaries
+        if isinstance(data_type, (DoubleType, FloatType)):
+            column = column.cast("string")
+        expressions.append(
+            F.hll_sketch_agg(column, OVERVIEW_HLL_LGK).alias(_alias(index, "hll"))
+        )
+    return expressions
+
+
+def _summary_expressions(columns, exact_distinct, data_types=None):
+    expressions = [F.count(F.lit(1)).alias("numRows")]
+    for index, (column, kind) in enumerate(columns):
+        expressions.append(F.count_if(column.isNull()).alias(_alias(index, "nulls")))
+        if data_types is not None:
+            expressions += _sketch_expressions(index, column, kind, data_types[index])
+        if kind == "numeric":
+            expressions += [
+                F.mean(column).alias(_alias(index, "mean")),
+                F.stddev(column).alias(_alias(index, "stddev")),
+                F.min(column).alias(_alias(index, "min")),
+                F.max(column).alias(_alias(index, "max")),
+                F.percentile_approx(
+                    column,
+                    [0.25, 0.5, 0.75],
+                    int(1 / QUANTILE_RELATIVE_ERROR),
+                ).alias(_alias(index, "quartiles")),
+            ]
+        if kind in ("numeric", "string"):
+            expressions.append(
+                _distinct_count(column, exact_distinct).alias(_alias(index, "distinct"))
+            )
+        if kind == "array":
+            length = F.size(column)
+            expressions += [
+                F.first(column, ignorenulls=True).alias(_alias(index, "first")),
+                F.min(length).alias(_alias(index, "lenMin")),
+                F.max(length).alias(_alias(index, "lenMax")),
+                F.mean(length).alias(_alias(index, "lenMean")),
+                F.stddev(length).alias(_alias(index, "lenStd")),
+            ]
+    return expressions
+
+
+def _histogram_bins(min_val, max_val):
+    if min_val is None or max_val is None:
+        return None
+    if min_val == max_val:
+        return [min_val, max_val]
+    bin_width = (max_val - min_val) / HISTOGRAM_BINS
+    return [min_val + i * bin_width for i in range(HISTOGRAM_BINS + 1)]
+
+
+def _histogram_expressions(columns, bins_by_index):
+    """Bucket counts of all numeric columns, same buckets as RDD.histogram (last one closed)."""
+    expressions = []
+    for index, bins in bins_by_index.items():
+        column = columns[index][0]
+        if len(bins) == 2:
+            expressions.append(F.count(column).alias(_alias(index, "bin0")))
+            continue
+        bucket = F.least(
+            F.floor((column - F.lit(bins[0])) / F.lit(bins[1] - bins[0])),
+            F.lit(HISTOGRAM_BINS - 1),
+        )
+        expressions += [
+            F.count_if(bucket == i).alias(_alias(index, f"bin{i}"))
+            for i in range(HISTOGRAM_BINS)
+        ]
+    return expressions
+
+
+def _top_categories(df, columns, indices, limit=TOP_CATEGORIES):
+    """Top limit categories of all string columns with one grouped job."""
+    if not indices:
+        return {}
+    pairs = F.explode(
+        F.array(
+            *[
+                F.struct(F.lit(i).alias("column"), columns[i][0].alias("value"))
+                for i in indices
+            ]
+        )
+    ).alias("pair")
+    ranked = (
+        df.select(pairs)
+        .select("pair.column", "pair.value")
+        .groupBy("column", "value")
+        .count()
+        .withColumn(
+            "rank",
+            F.row_number().over(
+                Window.partitionBy("column").orderBy(F.col("count").desc())
+            ),
+        )
+        .filter(F.col("rank") <= limit)
+        .orderBy("column", "rank")
+        .collect()
+    )
+    top = {i: [] for i in indices}
+    for row in ranked:
+        top[row["column"]].append((row["value"], row["count"]))
+    return top
+
+
+def _category_entry(value, count):
+    return {
+        "value": (
+            value[:50] + "..." if isinstance(value, str) and len(value) > 50 else value
+        ),
+        "count": count,
+    }
+
+
+def _column_sketches(summary, index, kind, num_rows, top_categories):
+    nulls = summary[_alias(index, "nulls")]
+    if kind == "numeric":
+        sketches = {
+            "moments": moments_sketch(
+                num_rows,
+                nulls,
+                summary[_alias(index, "sum")],
+                summary[_alias(index, "sumSquares")],
+                summary[_alias(index, "min")],
+                summary[_alias(index, "max")],
+            ),
+            "quantiles": quantile_sketch(
+                summary[_alias(index, "centroids")], num_rows - nulls
+            ),
+        }
+    else:
+        sketches = {"moments": moments_sketch(num_rows, nulls, None, None, None, None)}
+    if kind in ("numeric", "string"):
+        sketches["distinct"] = hll_sketch(summary[_alias(index, "hll")])
+        sketches["distinctEstimate"] = summary[_alias(index, "distinct")]
+    if kind == "string":
+        sketches["heavyHitters"] = heavy_hitters_sketch(top_categories, num_rows)
+    return sketches
+
+
+def _flatten_all(x):
+    """Recursively flatten list to 1D"""
+    if isinstance(x, list):
+        for i in x:
+            yield from _flatten_all(i)
+    else:
+        yield x
+
+
+def _array_stats(df, column, name, first, summary, index, num_rows):
+    stats = {}
+    # Infer shape from the first non-null entry
+    shape = []
+    temp = first
+    while isinstance(temp, list):
+        shape.append(len(temp))
+        if len(temp) == 0:
+            break
+        temp = temp[0] if isinstance(temp[0], list) else None
+    stats["Shape"] = tuple(shape) if shape else None
+
+    stats["LengthStats"] = {
+        "min": int(summary[_alias(index, "lenMin")] or 0),
+        "max": int(summary[_alias(index, "lenMax")] or 0),
+        "mean": float(summary[_alias(index, "lenMean")] or 0),
+        "std": float(summary[_alias(index, "lenStd")] or 0),
+    }
+
+    if not isinstance(first, list):
+        stats["valueStats"] = "Not detected"
+        return stats
+    flat_sample = list(_flatten_all(first))
+    if not (flat_sample and isinstance(flat_sample[0], (int, float))):
+        stats["valueStats"] = "Not numeric"
+        return stats
+
+    # Value level stats on a bounded sample of the flattened values
+    try:
+        num_samples = int(np.minimum(num_rows * 0.2, 100000))
+        stats["sampleSize"] = f"{num_samples} samples"
+        sampled = (
+            df.select(column)
+            .rdd.filter(lambda row: row[0] is not None)
+            .flatMap(lambda row: _flatten_all(row[0]))
+            .take(num_samples)
+        )
+        if sampled:
+            arr_np = np.array(sampled)
+            stats["valueStats"] = {
+                "min": float(np.min(arr_np)),
+                "max": float(np.max(arr_np)),
+                "mean": float(np.mean(arr_np)),
+                "std": float(np.std(arr_np)),
+                "median": float(np.median(arr_np)),
+                "sparsity": float(np.mean(arr_np == 0)),  # Fraction of zeros
+            }
+    except Exception as e:
+        print(f"Error sampling values of column {name}: {e}")
+        stats["valueStats"] = None
+    return stats
+
+
+def compute_column_stats(df, exact_distinct=None, sketches=None):
+    """
+    Returns (numRows, columnStats) of a pyspark dataframe.
+    exact_distinct: count distinct values exactly instead of with HyperLogLog
+    (defaults to OVERVIEW_EXACT_DISTINCT).
+    sketches: add the mergeable sketches of every column (defaults to OVERVIEW_SKETCHES).
+    """
+    if exact_distinct is None:
+        exact_distinct = OVERVIEW_EXACT_DISTINCT
+    if sketches is None:
+        sketches = OVERVIEW_SKETCHES
+
+    # useful if col name contains special characters or spaces
+    columns = [
+        (F.col(f"`{field.name}`"), _column_kind(field.dataType))
+        for field in df.schema.fields
+    ]
+    data_types = [field.dataType for field in df.schema.fields] if sketches else None
+    summary = df.agg(*_summary_expressions(columns, exact_distinct, data_types)).first()
+    num_rows = summary["numRows"]
+
+    bins_by_index = {}
+    for index, (_, kind) in enumerate(columns):
+        if kind == "numeric":
+            bins = _histogram_bins(
+                summary[_alias(index, "min")], summary[_alias(index, "max")]
+            )
+            if bins:
+                bins_by_index[index] = bins
+    histograms = {}
+    if bins_by_index:
+        histograms = df.agg(*_histogram_expressions(columns, bins_by_index)).first()
+
+    top_categories = _top_categories(
+        df,
+        columns,
+        [i for i, (_, kind) in enumerate(columns) if kind == "string"],
+        max(TOP_CATEGORIES, HEAVY_HITTERS) if sketches else TOP_CATEGORIES,
+    )
+
+    column_stats = []
+    for index, (field, (column, kind)) in enumerate(zip(df.schema.fields, columns)):
+        try:
+            null_count = summary[_alias(index, "nulls")]
+            stats = {
+                "name": field.name,
+                "type": str(field.dataType),
+                "entries": num_rows,
+                "nullCount": null_count,
+            }
+            if kind in ("numeric", "string"):
+                # like distinct().count(), null is one of the values
+                unique_count = summary[_alias(index, "distinct")]
+                stats["uniqueCount"] = unique_count + (1 if null_count else 0)
+
+            if kind == "numeric":
+                stats.update(
+                    {
+                        "mean": summary[_alias(index, "mean")],
+                        "stddev": summary[_alias(index, "stddev")],
+                        "min": summary[_alias(index, "min")],
+                        "max": summary[_alias(index, "max")],
+                    }
+                )
+                quantiles = summary[_alias(index, "quartiles")]
+                if quantiles:
+                    stats["quartiles"] = {
+                        "Q1": quantiles[0],
+                        "median": quantiles[1],
+                        "Q3": quantiles[2],
+                        "IQR": quantiles[2] - quantiles[0],
+                    }
+                bins = bins_by_index.get(index)
+                if bins:
+                    stats["histogram"] = {
+                        "bins": bins,
+                        "counts": [
+                            histograms[_alias(index, f"bin{i}")]
+                            for i in range(len(bins) - 1)
+                        ],
+                    }
+
+            elif kind == "string":
+                stats["topCategories"] = [
+                    _category_entry(value, count)
+                    for value, count in top_categories[index][:TOP_CATEGORIES]
+                ]
+
+            elif kind == "array":
+                stats.update(
+                    _array_stats(
+                        df,
+                        column,
+                        field.name,
+                        summary[_alias(index, "first")],
+                        summary,
+                        index,
+                        num_rows,
+                    )
+                )
+
+            if sketches and kind != "other":
+                stats["sketches"] = _column_sketches(
+                    summary, index, kind, num_rows, top_categories.get(index)
+                )
+            column_stats.append(stats)
+        except Exception as e:
+            print(f"Error processing column {field.name}: {e}")
+            continue
+
+    return num_rows, column_stats
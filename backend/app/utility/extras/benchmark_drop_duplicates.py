@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark of hash_drop_duplicates against df.dropDuplicates() on an image-like dataset
+(a label column and a wide array column, a share of the rows duplicated).
+
+Runs on a local Spark session, e.g.
+    python utility/extras/benchmark_drop_duplicates.py --rows 200000 --width 784
+Every variant is timed with a noop write, the shuffle write bytes of its jobs are read from
+the Spark UI REST API. All variants must keep the same number of rows.
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import urllib.request
+
+# Add the app directory to the Python path
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+import findspark
+
+findspark.init()
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from utility.processing_helper_functions import hash_drop_duplicates
+
+
+def build_dataset(spark, rows, width, duplicates, partitions):
+    # ids below rows * duplicates appear twice
+    unique_rows = int(rows * (1 - duplicates))
+    ids = spark.range(0, rows, numPartitions=partitions).select(
+        (F.col("id") % unique_rows).alias("source")
+    )
+    return ids.select(
+        (F.col("source") % 10).cast("string").alias("label"),
+        F.transform(
+            F.sequence(F.lit(0), F.lit(width - 1)),
+            lambda i: F.sin(F.col("source") * 1000 + i),
+        ).alias("pixels"),
+    )
+
+
+def shuffle_write_bytes(spark, group):
+    base = f"{spark.sparkContext.uiWebUrl}/api/v1/applications/{spark.sparkContext.applicationId}"
+    with urllib.request.urlopen(f"{base}/jobs") as response:
+        jobs = json.load(response)
+    stage_ids = {
+        stage_id
+        for job in jobs
+        if job.get("jobGroup") == group
+        for stage_id in job["stageIds"]
+    }
+    with urllib.request.urlopen(f"{base}/stages") as response:
+        stages = json.load(response)
+    return sum(
+        stage["shuffleWriteBytes"]
+        for stage in stages
+        if stage["stageId"] in stage_ids and stage["status"] == "COMPLETE"
+    )
+
+
+def run(spark, name, deduplicate):
+    spark.sparkContext.setJobGroup(name, name)
+    t1 = time.time()
+    result = deduplicate()
+    result.write.format("noop").mode("overwrite").save()
+    elapsed = time.time() - t1
+    # the UI listener is asynchronous, give it a moment before reading the stages
+    time.sleep(1)
+    shuffled = shuffle_write_bytes(spark, name) / (1024 * 1024)
+    spark.sparkContext.setJobGroup(f"{name} count", f"{name} count")
+    rows = result.count()
+    print(
+        f"{name:<22} {elapsed:>8.2f}s  rows: {rows:>9}  shuffle write: {shuffled:>9.1f} MB"
+    )
+    return shuffled
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--width", type=int, default=784)
+    parser.add_argument("--duplicates", type=float, default=0.01)
+    parser.add_argument("--partitions", type=int, default=16)
+    args = parser.parse_args()
+
+    spark = (
+        SparkSession.builder.master("local[*]")
+        .appName("drop_duplicates_benchmark")
+        .getOrCreate()
+    )
+    df = build_dataset(spark, args.rows, args.width, args.duplicates, args.partitions)
+    path = os.path.join(tempfile.mkdtemp(), "dataset.parquet")
+    df.write.parquet(path)
+    df = spark.read.parquet(path)
+    print(
+        f"{args.rows} rows, {args.width} values per row, {args.duplicates:.0%} duplicated"
+    )
+
+    baseline = run(spark, "dropDuplicates", lambda: df.dropDuplicates())
+    for verify in [True, False]:
+        shuffled = run(
+            spark,
+            f"hash (verify={verify})",
+            lambda: hash_drop_duplicates(df, verify=verify),
+        )
+        print(f"{'':<22} {baseline / max(shuffled, 1e-6):>8.1f}x less shuffled")
+
+    spark.stop()
+    shutil.rmtree(os.path.dirname(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the QPD sampling methods against the previous df.orderBy(rand()).limit(n).
+
+Runs on a local Spark session with a synthetic dataset, e.g.
+    python utility/extras/benchmark_qpd_sampling.py --rows 5000000 --points 10000
+Every method is timed with a noop write (full evaluation, nothing stored). The mean of the
+sampled ids should be close to rows / 2 for a uniform sample.
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# Add the app directory to the Python path
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+import findspark
+
+findspark.init()
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from utility.qpd_sampling import sample_rows
+
+
+def build_dataset(spark, rows, partitions):
+    return spark.range(0, rows, numPartitions=partitions).select(
+        F.col("id"),
+        (F.rand(1) * 100).alias("feature_1"),
+        (F.randn(2) * 10).alias("feature_2"),
+        (F.col("id") % 5).cast("string").alias("label"),
+    )
+
+
+def run(name, build_sample):
+    t1 = time.time()
+    sample = build_sample()
+    sample.write.format("noop").mode("overwrite").save()
+    elapsed = time.time() - t1
+    stats = sample.agg(F.count("*").alias("rows"), F.mean("id").alias("mean")).first()
+    print(
+        f"{name:<22} {elapsed:>8.2f}s  rows: {stats['rows']:>8}  mean id: {stats['mean']:.0f}"
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--points", type=int, default=10_000)
+    parser.add_argument("--partitions", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    spark = (
+        SparkSession.builder.master("local[*]")
+        .appName("qpd_sampling_benchmark")
+        .getOrCreate()
+    )
+    df = build_dataset(spark, args.rows, args.partitions).cache()
+    df.count()
+    print(
+        f"{args.rows} rows, {args.partitions} partitions, {args.points} points, expected mean id: {args.rows // 2}"
+    )
+
+    baseline = run(
+        "orderBy(rand()).limit", lambda: df.orderBy(F.rand()).limit(args.points)
+    )
+    for method in ["bernoulli", "reservoir", "stratified"]:
+        elapsed = run(
+            method,
+            lambda: sample_rows(
+                df,
+                args.points,
+                method=method,
+                seed=args.seed,
+                num_rows=args.rows,
+                strata_columns=["label"],
+            ),
+        )
+        print(f"{'':<22} {baseline / elapsed:>8.1f}x faster than the sort")
+
+    spark.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test script for merging column sketches: the stats of two merged parts are compared with
+the stats computed directly on the concatenated data.
+"""
+
+import sys
+import os
+import numpy as np
+
+# Make the app package importable when run from anywhere
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from utility import column_sketches
+from utility.column_sketches import (
+    centroid_probabilities,
+    moments_sketch,
+    quantile_sketch,
+    heavy_hitters_sketch,
+    hll_from_values,
+    merge_column_sketches,
+    merge_overviews,
+    merge_quantiles,
+    quantiles_from_sketch,
+)
+
+
+def numeric_sketches(values):
+    return {
+        "moments": moments_sketch(
+            len(values),
+            0,
+            float(values.sum()),
+            float((values * values).sum()),
+            float(values.min()),
+            float(values.max()),
+        ),
+        "quantiles": quantile_sketch(
+            list(np.quantile(values, centroid_probabilities())), len(values)
+        ),
+    }
+
+
+def string_sketches(values):
+    labels, counts = np.unique(values, return_counts=True)
+    order = np.argsort(-counts)
+    return {
+        "moments": moments_sketch(len(values), 0, None, None, None, None),
+        "heavyHitters": heavy_hitters_sketch(
+            [(str(labels[i]), int(counts[i])) for i in order], len(values)
+        ),
+    }
+
+
+def overview(numbers, labels):
+    return {
+        "numRows": len(numbers),
+        "numColumns": 2,
+        "columnStats": [
+            {
+                "name": "x",
+                "type": "DoubleType()",
+                "sketches": numeric_sketches(numbers),
+            },
+            {"name": "y", "type": "StringType()", "sketches": string_sketches(labels)},
+        ],
+    }
+
+
+def test_merged_quantiles():
+    rng = np.random.default_rng(0)
+    first, second = rng.normal(0, 1, 20000), rng.normal(5, 2, 5000)
+    merged = merge_quantiles(
+        [numeric_sketches(first)["quantiles"], numeric_sketches(second)["quantiles"]]
+    )
+    assert len(merged["centroids"]) == len(centroid_probabilities())
+    both = np.concatenate([first, second])
+    expected = np.quantile(both, [0.1, 0.25, 0.5, 0.75, 0.9])
+    estimated = quantiles_from_sketch(merged, [0.1, 0.25, 0.5, 0.75, 0.9])
+    # within 2% of the value range
+    assert np.all(np.abs(np.array(estimated) - expected) < 0.02 * np.ptp(both))
+
+
+def test_merge_overviews():
+    rng = np.random.default_rng(1)
+    numbers = [rng.uniform(0, 10, 3000), rng.uniform(5, 20, 1000)]
+    labels = [rng.choice(["a", "b", "c"], 3000), rng.choice(["c", "d"], 1000)]
+    merged = merge_overviews(
+        [overview(numbers[0], labels[0]), overview(numbers[1], labels[1])]
+    )
+    assert merged["numRows"] == 4000
+
+    x, y = merged["columnStats"]
+    both = np.concatenate(numbers)
+    assert x["entries"] == 4000
+    assert abs(x["mean"] - both.mean()) < 1e-9
+    assert abs(x["stddev"] - both.std(ddof=1)) < 1e-9
+    assert x["min"] == both.min() and x["max"] == both.max()
+    assert abs(x["quartiles"]["median"] - np.median(both)) < 0.2
+
+    labels, counts = np.unique(np.concatenate(labels), return_counts=True)
+    expected = dict(zip(labels.tolist(), counts.tolist()))
+    assert {c["value"]: c["count"] for c in y["topCategories"]} == expected
+    assert y["sketches"]["heavyHitters"]["otherCount"] == 0
+
+
+def test_distinct_unknown_without_hll():
+    # e.g. a double column from the local engine next to one from Spark
+    parts = [
+        {"distinctEstimate": 3, "distinct": {"hll": "AgEHCgMIAQA=", "lgk": 10}},
+        {"distinctEstimate": 2},
+    ]
+    merged = merge_column_sketches(parts)
+    assert merged["distinctEstimate"] is None
+    assert merged["distinct"] is None
+
+
+def test_distinct_union():
+    if column_sketches.datasketches is None:
+        print("datasketches is not installed, skipping the HLL union test")
+        return
+    first = hll_from_values(range(0, 3000))
+    second = hll_from_values(range(2000, 5000))
+    merged = merge_column_sketches(
+        [
+            {"distinctEstimate": 3000, "distinct": first},
+            {"distinctEstimate": 3000, "distinct": second},
+        ]
+    )
+    # HLL with lgk 10 is within a few percent
+    assert abs(merged["distinctEstimate"] - 5000) < 0.1 * 5000
+
+
+if __name__ == "__main__":
+    print("Testing column sketch merges...")
+    test_merged_quantiles()
+    test_merge_overviews()
+    test_distinct_unknown_without_hll()
+    test_distinct_union()
+    print(
+        "\n✅ All tests passed! Merged sketches match the stats of the combined data."
+    )
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Parity test of the local engine (utility.local_engine) against Spark: the same operations on
+the same data must give the same rows, types and overview on both engines.
+Runs on a local Spark session.
+"""
+
+import sys
+import os
+import math
+import numpy as np
+import pyarrow as pa
+
+# Make the app package importable when run from anywhere
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+import findspark
+
+findspark.init()
+from pyspark.sql import SparkSession
+from utility import local_engine
+from utility.parquet_footer import spark_type_name
+from utility.preprocessing_planner import run_operations
+from utility.dataset_overview import compute_column_stats, QUANTILE_RELATIVE_ERROR
+
+spark = (
+    SparkSession.builder.master("local[2]").appName("local_engine_parity").getOrCreate()
+)
+
+
+def sample_table(rows=300):
+    rng = np.random.default_rng(7)
+    # no values close to the outlier bounds, approximate quantiles give the same rows
+    x = rng.uniform(8, 12, rows).round(3).tolist()
+    for i in (3, 50, 120):
+        x[i] = None
+    x[7], x[8] = 80.0, -40.0
+    y = rng.integers(0, 6, rows).tolist()
+    y[11] = None
+    label = rng.choice(["red", "green", "blue", "grey"], rows, p=[0.4, 0.3, 0.2, 0.1])
+    label = label.tolist()
+    label[5] = None
+    return pa.table(
+        {
+            "id": pa.array(range(rows), pa.int32()),
+            "x": pa.array(x, pa.float64()),
+            "y": pa.array(y, pa.int32()),
+            "z": pa.array(rng.uniform(1, 100, rows).round(2), pa.float64()),
+            "label": pa.array(label, pa.string()),
+            "flag": pa.array(
+                [None if i % 17 == 0 else i % 3 == 0 for i in range(rows)]
+            ),
+            "vector": pa.array(
+                [[float(i), float(i % 5)] for i in range(rows)], pa.list_(pa.float64())
+            ),
+        }
+    )
+
+
+TABLE = sample_table()
+EXCLUDE_ID = {"column": "id", "operation": "Exclude from All Columns list"}
+
+# (name, operations, compare rows by id or only count them)
+CASES = [
+    ("drop null column", [{"column": "x", "operation": "Drop Null"}], True),
+    ("drop column", [{"column": "vector", "operation": "Drop Column"}], True),
+    ("fill 0", [{"column": "y", "operation": "Fill 0"}], True),
+    ("fill mean", [{"column": "x", "operation": "Fill mean"}], True),
+    ("fill mean int", [{"column": "y", "operation": "Fill mean"}], True),
+    ("fill median", [{"column": "x", "operation": "Fill Median"}], True),
+    ("fill mode", [{"column": "y", "operation": "Fill Mode"}], True),
+    ("fill unknown", [{"column": "label", "operation": "Fill Unknown"}], True),
+    ("fill false", [{"column": "flag", "operation": "Fill False"}], True),
+    ("min-max", [{"column": "x", "operation": "Min-Max"}], True),
+    ("z-score", [{"column": "y", "operation": "Z-score"}], True),
+    ("l1 norm", [{"column": "z", "operation": "L1 Norm"}], True),
+    ("l2 norm", [{"column": "x", "operation": "L2 Norm"}], True),
+    ("l inf norm", [{"column": "x", "operation": "L inf Norm"}], True),
+    ("remove outliers", [{"column": "x", "operation": "Remove Outliers"}], True),
+    ("log", [{"column": "x", "operation": "Log"}], True),
+    ("square", [{"column": "y", "operation": "Square"}], True),
+    ("square root", [{"column": "x", "operation": "Square Root"}], True),
+    (
+        "label encoding",
+        [
+            {"column": "label", "operation": "Fill Unknown"},
+            {"column": "label", "operation": "Label Encoding"},
+        ],
+        True,
+    ),
+    ("label encoding int", [{"column": "z", "operation": "Label Encoding"}], True),
+    (
+        "drop duplicates column",
+        [{"column": "label", "operation": "Drop Duplicates"}],
+        False,
+    ),
+    (
+        "chained column steps",
+        [
+            {"column": "x", "operation": "Fill Median"},
+            {"column": "x", "operation": "Remove Outliers"},
+            {"column": "z", "operation": "Min-Max"},
+            {"column": "z", "operation": "Square Root"},
+            {"column": "y", "operation": "Drop Null"},
+            {"column": "y", "operation": "Z-score"},
+        ],
+        True,
+    ),
+    ("all drop null", [{"column": "All Columns", "operation": "Drop Null"}], True),
+    (
+        "all fill 0 unknown false",
+        [{"column": "All Columns", "operation": "Fill 0 Unknown False"}],
+        True,
+    ),
+    ("all fill mean", [{"column": "All Columns", "operation": "Fill Mean"}], True),
+    ("all fill median", [{"column": "All Columns", "operation": "Fill Median"}], True),
+    (
+        "all remove outliers",
+        [EXCLUDE_ID, {"column": "All Columns", "operation": "Remove Outliers"}],
+        True,
+    ),
+    (
+        "all drop duplicates",
+        [
+            {"column": "id", "operation": "Drop Column"},
+            {"column": "vector", "operation": "Drop Column"},
+            {"column": "x", "operation": "Drop Column"},
+            {"column": "z", "operation": "Drop Column"},
+            {"column": "All Columns", "operation": "Drop Duplicates"},
+        ],
+        False,
+    ),
+]
+for normalization in ["Min-Max", "Z-score", "L1 Norm", "L2 Norm", "L inf Norm"]:
+    CASES.append(
+        (
+            f"all {normalization}",
+            [
+                EXCLUDE_ID,
+                {"column": "All Columns", "operation": "Drop Null"},
+                {"column": "All Columns", "operation": normalization},
+            ],
+            True,
+        )
+    )
+
+
+def same_value(a, b):
+    if isinstance(a, float) or isinstance(b, float):
+        if a is None or b is None:
+            return a is None and b is None
+        if math.isnan(a) or math.isnan(b):
+            return math.isnan(a) and math.isnan(b)
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+    return a == b
+
+
+def assert_same_result(name, spark_table, local_table, compare_rows):
+    assert spark_table.column_names == local_table.column_names, name
+    spark_types = [spark_type_name(t) for t in spark_table.schema.types]
+    local_types = [spark_type_name(t) for t in local_table.schema.types]
+    assert spark_types == local_types, f"{name}: {spark_types} != {local_types}"
+    assert (
+        spark_table.num_rows == local_table.num_rows
+    ), f"{name}: {spark_table.num_rows} != {local_table.num_rows} rows"
+    if not compare_rows:
+        return
+    spark_rows = sorted(spark_table.to_pylist(), key=lambda row: row["id"])
+    local_rows = sorted(local_table.to_pylist(), key=lambda row: row["id"])
+    for spark_row, local_row in zip(spark_rows, local_rows):
+        for column in spark_table.column_names:
+            assert same_value(spark_row[column], local_row[column]), (
+                f"{name}: {column} of row {spark_row['id']}: "
+                f"{spark_row[column]} != {local_row[column]}"
+            )
+
+
+def test_operations():
+    for name, operations, compare_rows in CASES:
+        spark_result = run_operations(spark.createDataFrame(TABLE), operations)
+        local_result = local_engine.run_operations(
+            local_engine.to_pandas(TABLE), operations
+        )
+        assert_same_result(
+            name,
+            spark_result.toArrow(),
+            local_engine.to_arrow(local_result),
+            compare_rows,
+        )
+        print(f"  {name}: same result")
+
+
+def within_rank_error(values, quantile, probability):
+    """quantile is one of the values ranked within the relative error around probability."""
+    values = np.sort(values)
+    low = np.quantile(values, max(0.0, probability - QUANTILE_RELATIVE_ERROR))
+    high = np.quantile(values, min(1.0, probability + QUANTILE_RELATIVE_ERROR))
+    return low <= quantile <= high
+
+
+def test_overview():
+    _, spark_stats = compute_column_stats(spark.createDataFrame(TABLE))
+    local_stats = local_engine.compute_overview(local_engine.to_pandas(TABLE))
+    assert local_stats["numRows"] == TABLE.num_rows
+    for spark_column, local_column in zip(spark_stats, local_stats["columnStats"]):
+        name = spark_column["name"]
+        for key in ["name", "type", "entries", "nullCount"]:
+            assert spark_column[key] == local_column[key], f"{name} {key}"
+        if "uniqueCount" in spark_column:
+            # approximate on Spark
+            assert (
+                abs(spark_column["uniqueCount"] - local_column["uniqueCount"])
+                <= 0.05 * local_column["uniqueCount"] + 1
+            ), name
+        for key in ["mean", "stddev", "min", "max"]:
+            if key in spark_column:
+                assert same_value(
+                    float(spark_column[key]), float(local_column[key])
+                ), f"{name} {key}"
+        if "quartiles" in spark_column:
+            values = [v for v in TABLE.column(name).to_pylist() if v is not None]
+            for key, probability in [("Q1", 0.25), ("median", 0.5), ("Q3", 0.75)]:
+                assert within_rank_error(
+                    values, spark_column["quartiles"][key], probability
+                )
+                assert within_rank_error(
+                    values, local_column["quartiles"][key], probability
+                )
+        if "histogram" in spark_column:
+            assert np.allclose(
+                spark_column["histogram"]["bins"], local_column["histogram"]["bins"]
+            ), name
+            assert (
+                spark_column["histogram"]["counts"]
+                == local_column["histogram"]["counts"]
+            ), name
+        if "topCategories" in spark_column:
+            assert {c["value"]: c["count"] for c in spark_column["topCategories"]} == {
+                c["value"]: c["count"] for c in local_column["topCategories"]
+            }, name
+        if "LengthStats" in spark_column:
+            assert spark_column["Shape"] == local_column["Shape"], name
+            assert spark_column["LengthStats"] == local_column["LengthStats"], name
+        print(f"  {name}: same overview")
+
+
+if __name__ == "__main__":
+    print("Testing local engine parity with Spark...")
+    try:
+        test_operations()
+        test_overview()
+    finally:
+        spark.stop()
+    print("\n✅ All tests passed! The local engine gives the same results as Spark.")
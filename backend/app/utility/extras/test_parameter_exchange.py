@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Test script for the parameter wire formats (binary npz and JSON fallback).
+A stand-in federated server is started on localhost, one instance understands
+the binary format and the other one only speaks JSON.
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import numpy as np
+import requests
+
+# Make the app package importable when run from anywhere
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from utility import parameter_exchange, global_parameter_cache
+from utility.parameter_exchange import (
+    PARAMETERS_CONTENT_TYPE,
+    encode_parameters,
+    decode_parameters,
+    fetch_parameters,
+    upload_parameters,
+)
+
+
+def sample_parameters():
+    rng = np.random.default_rng(0)
+    return {
+        "weights": [
+            [rng.standard_normal((3, 3, 1, 8)).astype(np.float32), np.zeros(8)],
+            [],
+            [rng.standard_normal((72, 1)).astype(np.float32), np.ones(1)],
+        ],
+        "hidden_layer_sizes": [128, 64],
+        "intercept": 0.5,
+        "classes": ["a", "b"],
+    }
+
+
+def make_server(accepts_binary, stale_proxy=False):
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        etag = None
+
+        def _reply(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            if self.etag:
+                self.send_header("ETag", self.etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            # a caching proxy in front of the server answers 304 unless told not to
+            stale = stale_proxy and self.headers.get("Cache-Control") != "no-cache"
+            if stale or self.headers.get("If-None-Match") == '"round-1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            payload = {"is_first": 0, "global_parameters": sample_parameters()}
+            if accepts_binary and PARAMETERS_CONTENT_TYPE in self.headers.get(
+                "Accept", ""
+            ):
+                self.etag = '"round-1"'
+                self._reply(200, encode_parameters(payload), PARAMETERS_CONTENT_TYPE)
+            else:
+                body = json.dumps(
+                    payload, default=lambda a: np.asarray(a).tolist()
+                ).encode()
+                self._reply(200, body, "application/json")
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            content_type = self.headers.get("Content-Type", "")
+            if content_type == PARAMETERS_CONTENT_TYPE:
+                if not accepts_binary:
+                    self._reply(415, b'{"detail": "unsupported"}', "application/json")
+                    return
+                decoded = decode_parameters(body)
+                if "session_id" not in decoded:
+                    self._reply(422, b'{"detail": "invalid"}', "application/json")
+                    return
+                received.append(("binary", decoded))
+            else:
+                received.append(("json", json.loads(body)))
+            self._reply(200, b'{"message": "ok"}', "application/json")
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}", received
+
+
+def to_json(payload):
+    return json.loads(json.dumps(payload, default=lambda a: np.asarray(a).tolist()))
+
+
+def test_roundtrip():
+    params = sample_parameters()
+    decoded = decode_parameters(encode_parameters(params))
+    np.testing.assert_allclose(decoded["weights"][0][0], params["weights"][0][0])
+    assert decoded["weights"][0][0].dtype == np.float32
+    assert decoded["weights"][1].size == 0
+    # list leaves come back as arrays like every other tensor
+    assert isinstance(decoded["hidden_layer_sizes"], np.ndarray)
+    assert decoded["hidden_layer_sizes"].tolist() == [128, 64]
+    assert decoded["intercept"] == 0.5
+    assert decoded["classes"] == ["a", "b"]
+
+
+def test_binary_server():
+    parameter_exchange._json_only_until.clear()
+    server, url, received = make_server(accepts_binary=True)
+    try:
+        data = fetch_parameters(f"{url}/get-model-parameters/1")
+        assert isinstance(data["global_parameters"]["weights"][0][0], np.ndarray)
+
+        upload_parameters(
+            f"{url}/send-weights", {"session_id": 1, **data}, to_json=to_json
+        )
+        assert received[-1][0] == "binary"
+        assert received[-1][1]["session_id"] == 1
+    finally:
+        server.shutdown()
+
+
+def test_json_fallback():
+    parameter_exchange._json_only_until.clear()
+    server, url, received = make_server(accepts_binary=False)
+    try:
+        data = fetch_parameters(f"{url}/get-model-parameters/1")
+        assert isinstance(data["global_parameters"]["weights"][0][0], list)
+
+        upload_parameters(f"{url}/send-weights", sample_parameters(), to_json=to_json)
+        assert received[-1][0] == "json"
+        assert not parameter_exchange.accepts_binary(f"{url}/send-weights")
+        # only the endpoint that rejected the format falls back
+        assert parameter_exchange.accepts_binary(f"{url}/other-endpoint")
+
+        # the fallback is remembered, the next upload goes straight to JSON
+        upload_parameters(f"{url}/send-weights", sample_parameters(), to_json=to_json)
+        assert [kind for kind, _ in received] == ["json", "json"]
+
+        # once the fallback expired binary is tried again
+        parameter_exchange._json_only_until[f"{url}/send-weights"] = 0
+        assert parameter_exchange.accepts_binary(f"{url}/send-weights")
+    finally:
+        server.shutdown()
+        parameter_exchange._json_only_until.clear()
+
+
+def test_rejected_payload_keeps_binary():
+    parameter_exchange._json_only_until.clear()
+    server, url, received = make_server(accepts_binary=True)
+    try:
+        # a validation error (422) is not a media type problem
+        try:
+            upload_parameters(
+                f"{url}/send-weights", sample_parameters(), to_json=to_json
+            )
+            assert False, "the invalid payload must raise"
+        except requests.exceptions.HTTPError as e:
+            assert e.response.status_code == 422
+        assert parameter_exchange.accepts_binary(f"{url}/send-weights")
+        assert received == []
+    finally:
+        server.shutdown()
+
+
+def test_global_parameter_cache():
+    cache_dir = global_parameter_cache.GLOBAL_CACHE_DIR
+    global_parameter_cache.GLOBAL_CACHE_DIR = tempfile.mkdtemp()
+    server, url, _ = make_server(accepts_binary=True)
+    try:
+        first = global_parameter_cache.fetch_global_parameters(f"{url}/params/7", "7")
+        # the second request is answered with 304, tensors come from the memory mapped cache
+        second = global_parameter_cache.fetch_global_parameters(f"{url}/params/7", "7")
+        tensor = second["global_parameters"]["weights"][0][0]
+        assert isinstance(tensor, np.memmap)
+        np.testing.assert_array_equal(
+            tensor, first["global_parameters"]["weights"][0][0]
+        )
+        assert second["global_parameters"]["hidden_layer_sizes"].tolist() == [128, 64]
+    finally:
+        server.shutdown()
+        global_parameter_cache.GLOBAL_CACHE_DIR = cache_dir
+
+
+def test_304_without_cached_version():
+    cache_dir = global_parameter_cache.GLOBAL_CACHE_DIR
+    global_parameter_cache.GLOBAL_CACHE_DIR = tempfile.mkdtemp()
+    server, url, _ = make_server(accepts_binary=True, stale_proxy=True)
+    try:
+        data = global_parameter_cache.fetch_global_parameters(f"{url}/params/8", "8")
+        assert data["global_parameters"]["hidden_layer_sizes"].tolist() == [128, 64]
+    finally:
+        server.shutdown()
+        global_parameter_cache.GLOBAL_CACHE_DIR = cache_dir
+
+
+if __name__ == "__main__":
+    print("Testing parameter wire formats...")
+    test_roundtrip()
+    test_binary_server()
+    test_json_fallback()
+    test_rejected_payload_keeps_binary()
+    test_global_parameter_cache()
+    test_304_without_cached_version()
+    print("\n✅ All tests passed! Binary and JSON parameter exchange work correctly.")
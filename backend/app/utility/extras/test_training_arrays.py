@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test script for the typed X/Y arrays written at prep time: numeric targets are typed,
+categorical targets keep their raw labels so every client means the same class.
+"""
+
+import sys
+import os
+import json
+import tempfile
+import numpy as np
+
+# Make the app package importable when run from anywhere
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from utility.federated_services import save_training_arrays
+
+
+def saved_labels(labels):
+    X = np.arange(len(labels) * 2, dtype=np.float64).reshape(len(labels), 2)
+    Y = np.array(labels, dtype=object).reshape(len(labels), 1)
+    with tempfile.TemporaryDirectory() as local_dir:
+        metadata = save_training_arrays(local_dir, "1", X, Y, ["a", "b"], ["label"])
+        with open(os.path.join(local_dir, "XY_1.json")) as f:
+            assert json.load(f) == metadata
+        X = np.load(os.path.join(local_dir, "X_1.npy"), mmap_mode="r")
+        assert X.dtype == np.float32
+        return np.load(os.path.join(local_dir, "Y_1.npy"), allow_pickle=True)
+
+
+def test_clients_with_different_label_subsets():
+    # the first client never sees "cat", the second never sees "ant"
+    first = saved_labels(["bird", "dog", "ant", "dog"])
+    second = saved_labels(["dog", "cat", "bird"])
+    assert first[:, 0].tolist() == ["bird", "dog", "ant", "dog"]
+    assert second[:, 0].tolist() == ["dog", "cat", "bird"]
+    # "dog" is the same target on both clients
+    assert first[1, 0] == second[0, 0]
+
+
+def test_numeric_targets():
+    assert saved_labels(["1", "0", "2"]).dtype == np.int64
+    assert saved_labels([0.5, 1.5, 2.0]).dtype == np.float32
+
+
+if __name__ == "__main__":
+    print("Testing typed training arrays...")
+    test_clients_with_different_label_subsets()
+    test_numeric_targets()
+    print("\n✅ All tests passed! Labels mean the same class on every client.")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test script for the compressed (sparse quantized delta) client updates: what the server
+rebuilds with decompress_update, and the error-feedback residual carried to the next round.
+"""
+
+import sys
+import os
+import tempfile
+import numpy as np
+
+# Make the app package importable when run from anywhere
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from utility import update_compression, chunked_upload, federated_client
+from utility.update_compression import (
+    compress_update,
+    decompress_update,
+    save_residuals,
+)
+
+
+def sample_round(seed):
+    rng = np.random.default_rng(seed)
+    global_parameters = {
+        "weights": [
+            [rng.standard_normal((20, 10)).astype(np.float32), np.zeros(10)],
+            [],
+        ],
+        "intercept": 0.5,
+    }
+    updated = {
+        "weights": [
+            [
+                global_parameters["weights"][0][0]
+                + rng.normal(0, 0.1, (20, 10)).astype(np.float32),
+                np.full(10, 0.25, dtype=np.float32),
+            ],
+            [],
+        ],
+        "intercept": 0.75,
+    }
+    return global_parameters, updated
+
+
+def test_lossless_roundtrip():
+    global_parameters, updated = sample_round(0)
+    config = {"mode": "topk", "ratio": 1.0, "quantization": "none"}
+    compressed, report, residuals = compress_update(
+        updated, global_parameters, config, "roundtrip"
+    )
+    rebuilt = decompress_update(compressed, global_parameters)
+    np.testing.assert_allclose(
+        rebuilt["weights"][0][0], updated["weights"][0][0], atol=1e-6
+    )
+    np.testing.assert_allclose(rebuilt["weights"][0][1], updated["weights"][0][1])
+    assert rebuilt["intercept"] == 0.75
+    assert report["relative_reconstruction_error"] < 1e-6
+    assert all(np.abs(r).max() < 1e-6 for r in residuals.values())
+
+
+def test_error_feedback():
+    directory = tempfile.mkdtemp()
+    residual_path = update_compression.residual_path
+    update_compression.residual_path = lambda s: os.path.join(directory, f"r_{s}.npz")
+    try:
+        global_parameters, updated = sample_round(1)
+        config = {"mode": "topk", "ratio": 0.1, "quantization": "int8"}
+        compressed, _, residuals = compress_update(
+            updated, global_parameters, config, "feedback"
+        )
+        # nothing is written before the upload succeeded
+        assert not os.path.exists(update_compression.residual_path("feedback"))
+
+        # what the server got plus the residual is the whole delta
+        rebuilt = decompress_update(compressed, global_parameters)
+        np.testing.assert_allclose(
+            rebuilt["weights"][0][0] + residuals["r0"],
+            updated["weights"][0][0],
+            atol=1e-5,
+        )
+
+        # the next round sends the carried-over residual along with its own delta
+        save_residuals("feedback", residuals)
+        compressed, _, second = compress_update(
+            global_parameters, global_parameters, config, "feedback"
+        )
+        rebuilt = decompress_update(compressed, global_parameters)
+        sent = rebuilt["weights"][0][0] - global_parameters["weights"][0][0]
+        np.testing.assert_allclose(sent + second["r0"], residuals["r0"], atol=1e-5)
+        assert np.abs(sent).max() > 0
+    finally:
+        update_compression.residual_path = residual_path
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        pass
+
+
+def test_residuals_of_resumed_upload():
+    directory = tempfile.mkdtemp()
+    patched = {
+        (update_compression, "residual_path"): lambda s: os.path.join(
+            directory, f"r_{s}.npz"
+        ),
+        (chunked_upload, "UPLOADS_DIR"): os.path.join(directory, "uploads"),
+        (chunked_upload, "UPLOAD_MAX_RETRIES"): 1,
+        (federated_client, "get"): lambda *a, **k: FakeResponse(200, {"received": []}),
+        (federated_client, "put"): lambda *a, **k: FakeResponse(200),
+    }
+    patched[(chunked_upload, "residual_path")] = patched[
+        (update_compression, "residual_path")
+    ]
+    # the server fails the first complete request, the worker then restarts
+    answers = [FakeResponse(503), FakeResponse(200, {"status": "ok"})]
+    patched[(federated_client, "post")] = lambda *a, **k: answers.pop(0)
+    originals = {target: getattr(*target) for target in patched}
+    for (module, name), value in patched.items():
+        setattr(module, name, value)
+    try:
+        global_parameters, updated = sample_round(2)
+        config = {"mode": "topk", "ratio": 0.1, "quantization": "int8"}
+        compressed, _, residuals = compress_update(
+            updated, global_parameters, config, "resumed"
+        )
+        payload = {"session_id": "resumed", "client_parameter": compressed}
+        try:
+            chunked_upload.upload_parameters_chunked(
+                "http://server/send", payload, round_id="v1", residuals=residuals
+            )
+            assert False, "the failed complete request must raise"
+        except Exception as e:
+            assert "failed after" in str(e)
+        assert not os.path.exists(update_compression.residual_path("resumed"))
+
+        assert chunked_upload.resume_pending_uploads(lambda s: "v1") == 1
+        saved = update_compression._load_residuals(
+            update_compression.residual_path("resumed")
+        )
+        np.testing.assert_array_equal(saved["r0"], residuals["r0"])
+        assert os.listdir(chunked_upload.UPLOADS_DIR) == []
+    finally:
+        for (module, name), value in originals.items():
+            setattr(module, name, value)
+
+
+if __name__ == "__main__":
+    print("Testing compressed client updates...")
+    test_lossless_roundtrip()
+    test_error_feedback()
+    test_residuals_of_resumed_upload()
+    print("\n✅ All tests passed! Compressed updates decompress to what was sent.")
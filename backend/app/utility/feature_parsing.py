@@ -0,0 +1,65 @@
+import ast
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+"""
+Bulk parsing of features stored as comma-separated strings (e.g. flattened image pixels).
+
+The whole column is split and cast by Arrow in one vectorized pass instead of a Python
+loop per row. Used at data-prep time (so rounds load a typed array) and as a fallback by
+the training script and the models when they are given string rows.
+"""
+
+
+def is_string_rows(X):
+    """True for a list / (n,) / (n, 1) object array whose rows are strings."""
+    if isinstance(X, list):
+        return len(X) > 0 and isinstance(X[0], str)
+    if not isinstance(X, np.ndarray) or X.dtype.kind not in "OUS" or X.size == 0:
+        return False
+    if X.ndim == 1 or (X.ndim == 2 and X.shape[1] == 1):
+        return isinstance(X.reshape(-1)[0], (str, np.str_))
+    return False
+
+
+def parse_delimited_rows(X, dtype=np.float32, sep=","):
+    """
+    Parse rows like "0.1, 0.5, 0.9" into a 2D array of shape (n, values per row).
+    Empty values at the row ends are ignored, rows of different length raise ValueError.
+    """
+    rows = np.asarray(X, dtype=object).reshape(-1)
+    strings = pc.utf8_trim(pa.array(rows, type=pa.string()), characters=f" \t\r\n{sep}")
+    tokens = pc.split_pattern(strings, sep)
+    lengths = pc.list_value_length(tokens).to_numpy(zero_copy_only=False)
+    if len(lengths) and not (lengths == lengths[0]).all():
+        raise ValueError("Rows have different numbers of values")
+    values = pc.cast(
+        pc.utf8_trim_whitespace(tokens.flatten()),
+        pa.from_numpy_dtype(np.dtype(dtype)),
+    )
+    return values.to_numpy(zero_copy_only=False).reshape(len(lengths), -1)
+
+
+def parse_input_shape(input_shape):
+    """'(150,150,3)' / [150, 150, 3] -> (150, 150, 3), None when not given."""
+    if input_shape is None:
+        return None
+    if isinstance(input_shape, str):
+        input_shape = ast.literal_eval(input_shape)
+    if isinstance(input_shape, int):
+        return (input_shape,)
+    return tuple(int(d) for d in input_shape)
+
+
+def reshape_to_input_shape(X, input_shape):
+    """Reshape flat rows to (n, *input_shape), X is returned unchanged if they don't fit."""
+    input_shape = parse_input_shape(input_shape)
+    if input_shape is None or X.ndim < 2 or tuple(X.shape[1:]) == input_shape:
+        return X
+    if int(np.prod(X.shape[1:])) != int(np.prod(input_shape)):
+        print(
+            f"Reshape of {X.shape} to {input_shape} not possible. Keeping flat features."
+        )
+        return X
+    return X.reshape(-1, *input_shape)
@@ -0,0 +1,212 @@
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+"""
+Shared HTTP client for talking to the federated server.
+
+One pooled keep-alive requests.Session per process (the training workers get their own),
+default connect/read timeouts, retries with exponential backoff and jitter, and latency
+metrics per endpoint. The async variants run the same pooled session in a thread so the
+event loop (redis listeners, websocket) is never blocked by a round-trip.
+
+Retries: GET/PUT/HEAD/DELETE are retried on connection errors and 429/502/503/504,
+other methods only when the connection could not be established (the request never left),
+unless the caller says the call is idempotent.
+"""
+
+FEDERATED_SERVER_URL = os.getenv("REACT_APP_SERVER_BASE_URL")
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 60))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 16))
+
+RETRY_STATUS = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+# latencies kept per endpoint for the percentiles
+LATENCY_WINDOW = 256
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+# numeric ids, uuids and content hashes in a path are folded so metrics group per endpoint
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F-]{16,})$")
+
+
+def get_session():
+    """The pooled session of this process (recreated after a fork/spawn)."""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=0
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+def close():
+    global _session
+    with _session_lock:
+        if _session is not None and _session_pid == os.getpid():
+            _session.close()
+        _session = None
+
+
+def server_url(path):
+    """Absolute url of a federated server endpoint, e.g. server_url("/v2/send-weights")."""
+    return f"{FEDERATED_SERVER_URL}/{path.lstrip('/')}"
+
+
+def auth_headers(client_token, headers=None):
+    return {**(headers or {}), "Authorization": f"Bearer {client_token}"}
+
+
+def endpoint_name(method, url):
+    path = requests.utils.urlparse(url).path or "/"
+    segments = ["{id}" if _ID_SEGMENT.match(s) else s for s in path.split("/")]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+def _record(endpoint, elapsed, failed, retried):
+    with _metrics_lock:
+        entry = _metrics.get(endpoint)
+        if entry is None:
+            entry = _metrics[endpoint] = {
+                "count": 0,
+                "errors": 0,
+                "retries": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "latencies": deque(maxlen=LATENCY_WINDOW),
+            }
+        entry["count"] += 1
+        entry["errors"] += int(failed)
+        entry["retries"] += int(retried)
+        entry["total_seconds"] += elapsed
+        entry["max_seconds"] = max(entry["max_seconds"], elapsed)
+        entry["latencies"].append(elapsed)
+
+
+def get_metrics():
+    """Per endpoint request count, errors, retries and latency (ms) of this process."""
+    with _metrics_lock:
+        snapshot = {}
+        for endpoint, entry in _metrics.items():
+            latencies = sorted(entry["latencies"])
+
+            def percentile(q):
+                return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+            snapshot[endpoint] = {
+                "count": entry["count"],
+                "errors": entry["errors"],
+                "retries": entry["retries"],
+                "mean_ms": round(1000 * entry["total_seconds"] / entry["count"], 2),
+                "p50_ms": round(1000 * percentile(0.5), 2),
+                "p95_ms": round(1000 * percentile(0.95), 2),
+                "max_ms": round(1000 * entry["max_seconds"], 2),
+            }
+        return snapshot
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+def _never_sent(error):
+    """True when the connection failed before any byte of the request was sent."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def request(method, url, retries=None, idempotent=None, timeout=None, **kwargs):
+    """
+    Send a request through the pooled session.
+
+    Args:
+        retries: attempts after the first one (HTTP_MAX_RETRIES by default, 0 disables)
+        idempotent: allow retrying after the request was sent (default: by method)
+        timeout: seconds or (connect, read), defaults to the configured timeouts
+    Returns:
+        requests.Response (raise_for_status is left to the caller)
+    """
+    method = method.upper()
+    retries = HTTP_MAX_RETRIES if retries is None else retries
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    endpoint = endpoint_name(method, url)
+    session = get_session()
+
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            _record(endpoint, time.perf_counter() - start, True, attempt > 0)
+            if attempt >= retries or not (idempotent or _never_sent(e)):
+                raise
+            error = str(e)
+        else:
+            failed = response.status_code >= 400
+            _record(endpoint, time.perf_counter() - start, failed, attempt > 0)
+            if (
+                response.status_code not in RETRY_STATUS
+                or attempt >= retries
+                or not idempotent
+            ):
+                return response
+            error = f"status {response.status_code}"
+
+        delay = min(10, 0.25 * 2**attempt) * (0.5 + random.random())
+        print(f"{endpoint} failed ({error}), retry {attempt + 1} in {delay:.2f}s")
+        time.sleep(delay)
+        attempt += 1
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request("PUT", url, **kwargs)
+
+
+async def arequest(method, url, **kwargs):
+    """Async variant of request, the pooled session runs in a worker thread."""
+    return await asyncio.to_thread(request, method, url, **kwargs)
+
+
+async def aget(url, **kwargs):
+    return await arequest("GET", url, **kwargs)
+
+
+async def apost(url, **kwargs):
+    return await arequest("POST", url, **kwargs)
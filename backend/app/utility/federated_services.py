@@ -1,9 +1,13 @@
 import os
+import json
 from utility.hdfs_services import HDFSServiceManager
-import pandas as pd
 import shutil
 import numpy as np
-import requests
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from utility import federated_client, dataset_cache
+from utility.feature_parsing import is_string_rows, parse_delimited_rows
 
 HDFS_PROCESSED_DATASETS_DIR = os.getenv("HDFS_PROCESSED_DATASETS_DIR")
 REACT_APP_SERVER_BASE_URL = os.getenv("REACT_APP_SERVER_BASE_URL")
@@ -22,8 +26,8 @@ def send_client_initialize_model_signal(session_id: int, client_token: str) -> b
 
         data = {"session_id": session_id}
 
-        response = requests.post(
-            f"{REACT_APP_SERVER_BASE_URL}/client-initialize-model",
+        response = federated_client.post(
+            federated_client.server_url("/client-initialize-model"),
             json=data,
             headers=headers,
         )
@@ -40,6 +44,150 @@ def reshape_image(img_array):
     return img_array.astype(np.float32)
 
 
+def _column_to_numpy(column):
+    """
+    Convert an arrow column to numpy without going through pandas.
+    Numeric columns become typed arrays, list columns with equal lengths become
+    one dense (n, length, ...) array, anything else an object array.
+    """
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    column_type = column.type
+
+    if (
+        pa.types.is_integer(column_type)
+        or pa.types.is_floating(column_type)
+        or pa.types.is_boolean(column_type)
+    ):
+        return column.to_numpy(zero_copy_only=False)
+
+    if (
+        pa.types.is_list(column_type)
+        or pa.types.is_large_list(column_type)
+        or pa.types.is_fixed_size_list(column_type)
+    ) and column.null_count == 0:
+        lengths = pc.list_value_length(column).to_numpy(zero_copy_only=False)
+        if len(lengths) == 0 or (lengths == lengths[0]).all():
+            values = _column_to_numpy(column.flatten())
+            if values.dtype != object:
+                length = int(lengths[0]) if len(lengths) else 0
+                return values.reshape((len(column), length) + values.shape[1:])
+
+    return column.to_numpy(zero_copy_only=False)
+
+
+def _columns_to_numpy(table, columns):
+    """Stack the requested columns into one contiguous array of shape (n, len(columns))."""
+    arrays = [_column_to_numpy(table.column(name)) for name in columns]
+
+    if len(arrays) == 1 and arrays[0].ndim > 1:
+        # a single tensor column (e.g. an image stored as nested lists)
+        return np.ascontiguousarray(arrays[0])
+
+    if arrays and all(a.ndim == 1 and a.dtype != object for a in arrays):
+        result = np.empty((table.num_rows, len(arrays)), dtype=np.result_type(*arrays))
+    else:
+        # string / mixed columns keep the (n, k) object layout of DataFrame.values
+        result = np.empty((table.num_rows, len(arrays)), dtype=object)
+    for index, array in enumerate(arrays):
+        result[:, index] = list(array) if array.ndim > 1 else array
+    return result
+
+
+def extract_xy_from_parquet(parquet_files, input_columns, output_column):
+    """
+    Read X and Y from a set of parquet files in a single dataset scan.
+    Only the input and output columns are read, no pandas DataFrame is built.
+    """
+    dataset = ds.dataset(parquet_files, format="parquet")
+
+    # Check if all output columns exist
+    missing_cols = [col for col in output_column if col not in dataset.schema.names]
+    if missing_cols:
+        raise Exception(f"Output column(s) not found in the DataFrame: {missing_cols}")
+    missing_cols = [col for col in input_columns if col not in dataset.schema.names]
+    if missing_cols:
+        raise Exception(f"Input column(s) not found in the DataFrame: {missing_cols}")
+
+    columns = list(dict.fromkeys(list(input_columns) + list(output_column)))
+    table = dataset.to_table(columns=columns, use_threads=True)
+    X = _columns_to_numpy(table, input_columns)
+    Y = _columns_to_numpy(table, output_column)
+    return X, Y
+
+
+def _typed_features(X):
+    """
+    Numeric features are stored as float32. Comma-separated string rows are parsed
+    once here so rounds load a typed array, other inputs are kept as objects.
+    """
+    if is_string_rows(X):
+        try:
+            return parse_delimited_rows(X, dtype=np.float32)
+        except ValueError as e:
+            print(f"Keeping string features unparsed: {e}")
+    if X.dtype.kind in "fiub":
+        return np.ascontiguousarray(X, dtype=np.float32)
+    return X
+
+
+def _typed_labels(Y):
+    """
+    Targets as int64 (integer) or float32 (continuous). Categorical targets keep their
+    raw labels: each client only sees its own subset of the classes, so codes built
+    locally would not mean the same class on every client.
+    """
+    if Y.dtype.kind in "iub":
+        return np.ascontiguousarray(Y, dtype=np.int64)
+    if Y.dtype.kind == "f":
+        return np.ascontiguousarray(Y, dtype=np.float32)
+
+    columns = []
+    flat = Y.reshape(len(Y), -1)
+    for index in range(flat.shape[1]):
+        values = flat[:, index]
+        try:
+            numeric = values.astype(np.float64)
+        except (TypeError, ValueError):
+            return Y
+        is_integer = np.all(np.mod(numeric, 1) == 0)
+        columns.append(numeric.astype(np.int64 if is_integer else np.float32))
+    dtype = np.result_type(*columns) if columns else np.int64
+    return np.stack(columns, axis=1).astype(dtype).reshape(Y.shape)
+
+
+def save_training_arrays(local_dir, session_id, X, Y, input_columns, output_column):
+    """
+    Write X_{session}.npy / Y_{session}.npy as typed arrays and XY_{session}.json with
+    their shape and dtype. Only object inputs and categorical targets still need pickling.
+    """
+    X = _typed_features(X)
+    Y = _typed_labels(Y)
+
+    X_filename = os.path.join(local_dir, f"X_{session_id}.npy")
+    Y_filename = os.path.join(local_dir, f"Y_{session_id}.npy")
+    metadata_filename = os.path.join(local_dir, f"XY_{session_id}.json")
+
+    # the sidecar is written last, a partially written pair is never taken as typed
+    if os.path.exists(metadata_filename):
+        os.remove(metadata_filename)
+    for filename, array in ((X_filename, X), (Y_filename, Y)):
+        with open(f"{filename}.tmp", "wb") as f:
+            np.save(f, array, allow_pickle=array.dtype == object)
+        os.replace(f"{filename}.tmp", filename)
+
+    metadata = {
+        "X": {"shape": list(X.shape), "dtype": X.dtype.str},
+        "Y": {"shape": list(Y.shape), "dtype": Y.dtype.str},
+        "input_columns": list(input_columns),
+        "output_columns": list(output_column),
+    }
+    with open(f"{metadata_filename}.tmp", "w") as f:
+        json.dump(metadata, f)
+    os.replace(f"{metadata_filename}.tmp", metadata_filename)
+    return metadata
+
+
 def process_parquet_and_save_xy(
     filename: str,
     session_id: str,
@@ -54,6 +202,7 @@ def process_parquet_and_save_xy(
     Args:
         filename: HDFS folder name containing parquet files
         session_id: Unique session ID for temp file management
+        input_columns: Columns used as model input (X)
         output_column: Column to be treated as output (target)
 
     Returns:
@@ -65,65 +214,55 @@ def process_parquet_and_save_xy(
     local_dir = os.path.join(os.getcwd(), "data")
     os.makedirs(local_dir, exist_ok=True)
 
+    hdfs_service = HDFSServiceManager()
+    key = dataset_cache.cache_key(
+        hdfs_path,
+        hdfs_service.get_modification_time(hdfs_path),
+        input_columns,
+        output_column,
+    )
+    if dataset_cache.link_cached(key, local_dir, session_id):
+        send_client_initialize_model_signal(session_id, client_token)
+        return
+
     # Temporary download directory
     temp_download_dir = os.path.join(local_dir, f"temp_{session_id}")
     os.makedirs(temp_download_dir, exist_ok=True)
 
     # Download from HDFS
-    hdfs_service = HDFSServiceManager()
     hdfs_service.download_folder_from_hdfs(hdfs_path, temp_download_dir)
 
-    # Find and combine parquet files
-    combined_df = None
+    # Read all part files in one dataset scan, projecting only the needed columns
     parquet_files = []
-
     for root, _, files in os.walk(temp_download_dir):
         for file in files:
             if file.endswith(".parquet"):
-                file_path = os.path.join(root, file)
-                parquet_files.append(file_path)
-
-                df = pd.read_parquet(file_path)
-                if combined_df is None:
-                    combined_df = df
-                else:
-                    combined_df = pd.concat([combined_df, df], ignore_index=True)
-
-    shutil.rmtree(temp_download_dir)
-
-    if not parquet_files:
-        raise Exception("No parquet files found in the downloaded folder")
+                parquet_files.append(os.path.join(root, file))
 
-    # print(f"Combined DataFrame Shape: {combined_df.shape}")
-    # print(f"DataFrame Column Labels: {combined_df.columns.tolist()}")
-
-    # Check if all output columns exist
-    missing_cols = [col for col in output_column if col not in combined_df.columns]
-    if missing_cols:
-        raise Exception(f"Output column(s) not found in the DataFrame: {missing_cols}")
-
-    # print(combined_df.dtypes)
-    # print("Check head", combined_df.head())
-
-    # X = np.array([reshape_image(img) for img in combined_df["image"]])
-    X = combined_df[input_columns].values
-    Y = combined_df[output_column].values
-
-    # print(f"X shape: {X.shape}")
-    # print(f"Y shape: {Y.shape}")
-
-    # print("First Array : ", type(X), getattr(X, 'shape', 'no shape'))
-    # print("Second Array : ", type(X[0]), getattr(X[0], 'shape', 'no shape'))
-    # print("Third Array : ", type(X[0][0]), getattr(X[0][0], 'shape', 'no shape'))
-    # print("Third Array : ", type(X[0][0][0]), getattr(X[0][0][0], 'shape', 'no shape'))
-    # print("Fourth Element : ", type(X[0][0][0][0]))
-
-    # Save to local_dir
-    X_filename = os.path.join(local_dir, f"X_{session_id}.npy")
-    Y_filename = os.path.join(local_dir, f"Y_{session_id}.npy")
+    try:
+        if not parquet_files:
+            raise Exception("No parquet files found in the downloaded folder")
+        X, Y = extract_xy_from_parquet(parquet_files, input_columns, output_column)
+    finally:
+        shutil.rmtree(temp_download_dir)
 
-    np.save(X_filename, X)
-    np.save(Y_filename, Y)
+    # Typed arrays + metadata sidecar go to the node cache, the session gets hardlinks
+    staged_dir = dataset_cache.staging_dir(key)
+    try:
+        save_training_arrays(
+            staged_dir, dataset_cache.ENTRY_NAME, X, Y, input_columns, output_column
+        )
+        del X, Y
+        dataset_cache.store(
+            key,
+            staged_dir,
+            local_dir,
+            session_id,
+            hdfs_path,
+            {"input": list(input_columns), "output": list(output_column)},
+        )
+    finally:
+        shutil.rmtree(staged_dir, ignore_errors=True)
 
     # Sending Model Initialization signal to server
 
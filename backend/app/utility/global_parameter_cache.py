@@ -0,0 +1,167 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import requests
+from . import federated_client
+from dotenv import load_dotenv
+from .parameter_exchange import (
+    PARAMETER_WIRE_FORMAT,
+    PARAMETERS_CONTENT_TYPE,
+    JSON_CONTENT_TYPE,
+    decode_parameters,
+    flatten_parameters,
+    unflatten_parameters,
+)
+
+load_dotenv()
+
+"""
+Per session on-disk cache of the global parameters received from the federated server.
+
+data/global_cache/{session_id}/
+    index.json              -> {"latest": version, "versions": {version: {etag, sha256, round}}}
+    {version}/manifest.json -> structure of the payload (same manifest as the wire format)
+    {version}/t0.npy ...    -> one .npy file per tensor, opened with mmap_mode="r"
+
+A version is the content hash of the downloaded body. Requests carry If-None-Match (when the
+server sent an ETag) and a known_version query, a 304 answer is served from the cache. A 200
+answer whose body hash is already cached skips the decode as well.
+"""
+
+GLOBAL_CACHE_DIR = os.path.join("data", "global_cache")
+GLOBAL_CACHE_VERSIONS = int(os.getenv("GLOBAL_CACHE_VERSIONS", 2))
+
+# version last served per session, also when it could not be cached
+_current_versions = {}
+
+
+def _session_dir(session_id):
+    return os.path.join(GLOBAL_CACHE_DIR, str(session_id))
+
+
+def _read_index(session_id):
+    path = os.path.join(_session_dir(session_id), "index.json")
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"latest": None, "versions": {}}
+
+
+def _write_index(session_id, index):
+    path = os.path.join(_session_dir(session_id), "index.json")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _load_version(session_id, version):
+    version_dir = os.path.join(_session_dir(session_id), version)
+    with open(os.path.join(version_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    return unflatten_parameters(
+        manifest,
+        lambda name: np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode="r"),
+    )
+
+
+def _store_version(session_id, version, payload, etag, index):
+    session_dir = _session_dir(session_id)
+    version_dir = os.path.join(session_dir, version)
+    tmp_dir = f"{version_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    manifest, tensors = flatten_parameters(payload)
+    for name, tensor in tensors.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), tensor)
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.replace(tmp_dir, version_dir)
+
+    round_number = (
+        payload.get("round_number", payload.get("round"))
+        if isinstance(payload, dict)
+        else None
+    )
+    index["versions"].pop(version, None)
+    index["versions"][version] = {"etag": etag, "round": round_number}
+    index["latest"] = version
+
+    # keep only the most recent versions (dict keeps insertion order)
+    while len(index["versions"]) > max(1, GLOBAL_CACHE_VERSIONS):
+        stale = next(iter(index["versions"]))
+        index["versions"].pop(stale)
+        shutil.rmtree(os.path.join(session_dir, stale), ignore_errors=True)
+    _write_index(session_id, index)
+
+
+def current_version(session_id):
+    """Version of the global parameters last fetched for a session (None if never)."""
+    return _current_versions.get(str(session_id), _read_index(session_id).get("latest"))
+
+
+def fetch_global_parameters(url, session_id, headers=None, timeout=None):
+    """
+    GET the global parameters of a session, served from the local cache when unchanged.
+    Cached tensors are read-only memory maps.
+    """
+    os.makedirs(_session_dir(session_id), exist_ok=True)
+    index = _read_index(session_id)
+    latest = index.get("latest")
+    if latest and not os.path.isdir(os.path.join(_session_dir(session_id), latest)):
+        latest = None
+
+    headers = dict(headers or {})
+    params = {}
+    if PARAMETER_WIRE_FORMAT == "binary":
+        headers["Accept"] = f"{PARAMETERS_CONTENT_TYPE}, {JSON_CONTENT_TYPE};q=0.5"
+    if latest:
+        params["known_version"] = latest
+        etag = index["versions"][latest].get("etag")
+        if etag:
+            headers["If-None-Match"] = etag
+
+    response = federated_client.get(
+        url, headers=headers, params=params, timeout=timeout
+    )
+    if response.status_code == 304 and latest:
+        print(f"Global parameters of session {session_id} unchanged ({latest})")
+        _current_versions[str(session_id)] = latest
+        return _load_version(session_id, latest)
+    if response.status_code == 304:
+        # nothing cached to serve it from (e.g. a caching proxy), ask for the full body
+        headers.pop("If-None-Match", None)
+        headers["Cache-Control"] = "no-cache"
+        response = federated_client.get(url, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    if response.status_code == 304:
+        raise requests.exceptions.HTTPError(
+            f"Server answered 304 without a cached version for session {session_id}",
+            response=response,
+        )
+
+    version = hashlib.sha256(response.content).hexdigest()[:32]
+    _current_versions[str(session_id)] = version
+    if version in index["versions"] and os.path.isdir(
+        os.path.join(_session_dir(session_id), version)
+    ):
+        print(f"Global parameters of session {session_id} already cached ({version})")
+        return _load_version(session_id, version)
+
+    content_type = response.headers.get("Content-Type", "")
+    if content_type.startswith(PARAMETERS_CONTENT_TYPE):
+        payload = decode_parameters(response.content)
+    else:
+        payload = response.json()
+
+    try:
+        _store_version(
+            session_id, version, payload, response.headers.get("ETag"), index
+        )
+    except OSError as e:
+        print(f"Could not cache global parameters of session {session_id}: {e}")
+    return payload
@@ -1,7 +1,21 @@
 import os
+import time
+import asyncio
+import zlib
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
 from hdfs import InsecureClient
 from dotenv import load_dotenv
 
+try:
+    import crc32c
+except ImportError:  # optional, CRC32C checksums are then verified by size only
+    crc32c = None
+
 load_dotenv()
 
 HDFS_URL = os.getenv("HDFS_URL")
@@ -9,43 +23,163 @@ HADOOP_USER_NAME = os.getenv("HADOOP_USER_NAME")
 HDFS_RAW_DATASETS_DIR = os.getenv("HDFS_RAW_DATASETS_DIR")
 HDFS_PROCESSED_DATASETS_DIR = os.getenv("HDFS_PROCESSED_DATASETS_DIR")
 RECENTLY_UPLOADED_DATASETS_DIR = os.getenv("RECENTLY_UPLOADED_DATASETS_DIR")
+HDFS_DOWNLOAD_PARALLELISM = int(os.getenv("HDFS_DOWNLOAD_PARALLELISM", 8))
+HDFS_DOWNLOAD_RETRIES = int(os.getenv("HDFS_DOWNLOAD_RETRIES", 3))
+# "auto": verify the HDFS file checksum when its algorithm can be computed locally, "off": size only
+HDFS_VERIFY_CHECKSUM = os.getenv("HDFS_VERIFY_CHECKSUM", "auto")
+HDFS_EXECUTOR_WORKERS = int(os.getenv("HDFS_EXECUTOR_WORKERS", 8))
+# seconds, per WebHDFS request and per awaited operation
+HDFS_REQUEST_TIMEOUT = float(os.getenv("HDFS_REQUEST_TIMEOUT", 60))
+HDFS_OPERATION_TIMEOUT = float(os.getenv("HDFS_OPERATION_TIMEOUT", 600))
 """
-NOTE: HDFS session is created and destroyed on demand, so there is no session created when __init__ method is called.
+NOTE: one WebHDFS client with a keep-alive connection pool is shared by every HDFSServiceManager
+of the process. The async methods run on a dedicated bounded executor (never on the event loop)
+and accept a timeout; a timed out / cancelled operation is flagged so multi-step operations stop
+at their next step (a single WebHDFS request is bounded by HDFS_REQUEST_TIMEOUT).
 """
 
+_client = None
+_client_lock = threading.Lock()
+_executor = None
+
+
+class HDFSOperationCancelled(Exception):
+    pass
+
+
+def get_hdfs_client():
+    """The shared, pooled WebHDFS client of this process."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=max(HDFS_EXECUTOR_WORKERS, HDFS_DOWNLOAD_PARALLELISM),
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _client = InsecureClient(
+                HDFS_URL,
+                user=HADOOP_USER_NAME,
+                session=session,
+                timeout=HDFS_REQUEST_TIMEOUT,
+            )
+        return _client
+
+
+def _get_executor():
+    global _executor
+    with _client_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, HDFS_EXECUTOR_WORKERS), thread_name_prefix="hdfs"
+            )
+        return _executor
+
+
+def shutdown():
+    """Stop the executor and close the pooled connections (app shutdown)."""
+    global _client, _executor
+    with _client_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        if _client is not None:
+            _client._session.close()
+            _client = None
+
+
+def _chunk_crc(algorithm):
+    if algorithm.endswith("CRC32C"):
+        return crc32c.crc32c if crc32c is not None else None
+    if algorithm.endswith("CRC32"):
+        return zlib.crc32
+    return None
+
+
+def _local_file_checksum(local_path, file_checksum, block_size):
+    """
+    Compute the MD5-of-MD5-of-CRC checksum HDFS reports for a file from the local copy.
+    Returns None when the algorithm can't be computed here (then only the size is checked).
+    """
+    algorithm = file_checksum.get("algorithm", "")
+    crc = _chunk_crc(algorithm)
+    if crc is None or not algorithm.startswith("MD5-of-"):
+        return None
+    bytes_per_crc = int.from_bytes(bytes.fromhex(file_checksum["bytes"])[:4], "big")
+
+    block_md5s = []
+    with open(local_path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            crcs = b"".join(
+                (crc(block[i : i + bytes_per_crc]) & 0xFFFFFFFF).to_bytes(4, "big")
+                for i in range(0, len(block), bytes_per_crc)
+            )
+            block_md5s.append(hashlib.md5(crcs).digest())
+    crc_per_block = block_size // bytes_per_crc if len(block_md5s) > 1 else 0
+    digest = hashlib.md5(b"".join(block_md5s)).hexdigest()
+    return (
+        bytes_per_crc.to_bytes(4, "big").hex()
+        + crc_per_block.to_bytes(8, "big").hex()
+        + digest
+    )
+
 
 class HDFSServiceManager:
     def __init__(self):
         """
         Initialize HDFSServiceManager with basic settings.
-        HDFS connection is not persistent and will be established only when required.
+        The WebHDFS connection pool is shared and opened on first use.
         """
         self.buffer = b""
         self.file_name = ""
 
     def _with_hdfs_client(self, operation):
         """
-        Internal utility to manage HDFS connection asynchronously.
-        Offloads HDFS operations to a separate thread to avoid blocking the event loop.
+        Run operation(client) on the shared client in the calling thread (blocking).
+        Async code uses run() instead.
         """
+        try:
+            return operation(get_hdfs_client())
+        except HDFSOperationCancelled:
+            raise
+        except Exception as e:
+            print(f"Error during HDFS operation: {e}")
+            raise Exception(f"Error during HDFS operation: {e}")
 
-        def wrapped_operation():
-            client = InsecureClient(HDFS_URL, user=HADOOP_USER_NAME)
-            try:
-                return operation(client)
-            except Exception as e:
-                print(f"Error during HDFS operation: {e}")
-                raise Exception(f"Error during HDFS operation: {e}")
-            finally:
-                client = None  # Explicitly clean up the client
+    async def run(self, operation, timeout=HDFS_OPERATION_TIMEOUT, cancellable=False):
+        """
+        Await operation(client) on the HDFS executor without blocking the event loop.
 
-        # Offloading the blocking operation to a thread ...didn't work for some reason
-        # return asyncio.to_thread(wrapped_operation)
-        return wrapped_operation()
+        Args:
+            timeout: seconds before asyncio.TimeoutError is raised (None waits forever)
+            cancellable: call operation(client, cancelled) with a threading.Event that is
+                set once the caller gave up, so multi-step operations can stop early
+        """
+        cancelled = threading.Event()
+
+        def call(client):
+            if cancelled.is_set():
+                raise HDFSOperationCancelled(
+                    "HDFS operation cancelled before it started"
+                )
+            return operation(client, cancelled) if cancellable else operation(client)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(_get_executor(), self._with_hdfs_client, call)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            cancelled.set()
+            raise
 
     async def delete_file_from_hdfs(self, directory, filename):
         """
-        Delete a file from HDFS, don't make this method async (sync nature required for few use cases)
+        Delete a file (or folder, recursively) from HDFS.
         """
         hdfs_path = os.path.join(directory, filename)
         print(f"Deleting {hdfs_path} from HDFS...")
@@ -59,7 +193,7 @@ class HDFSServiceManager:
                 raise Exception(f"Failed to delete {hdfs_path} from HDFS.")
 
         try:
-            return self._with_hdfs_client(delete)
+            return await self.run(delete)
         except Exception as e:
             raise Exception(f"Error deleting file from HDFS: {e}")
 
@@ -120,7 +254,7 @@ class HDFSServiceManager:
                 print(f"Error listing files in HDFS: {e}")
                 raise Exception(f"Error listing files in HDFS: {e}")
 
-        return self._with_hdfs_client(list_files)
+        return await self.run(list_files)
 
     async def testing_list_all_datasets(self):
         def list_files(client):
@@ -135,7 +269,7 @@ class HDFSServiceManager:
                 result["error"] = str(e)
             return result
 
-        return self._with_hdfs_client(list_files)
+        return await self.run(list_files)
 
     async def rename_file_or_folder(self, source_path, destination_path):
         """
@@ -148,46 +282,144 @@ class HDFSServiceManager:
             print(f"Renamed {source_path} to {destination_path} in HDFS.")
 
         try:
-            return self._with_hdfs_client(rename)
+            return await self.run(rename)
         except Exception as e:
             print(f"Error renaming file in HDFS: {e}")
             raise Exception(f"Error renaming file in HDFS: {e}")
 
-    def download_folder_from_hdfs(self, hdfs_folder_path, local_destination_path):
+    def get_modification_time(self, hdfs_path):
+        """Modification time (ms) of a file or folder, a folder changes when files are added/removed."""
+        return get_hdfs_client().status(hdfs_path)["modificationTime"]
+
+    def get_content_size(self, hdfs_path):
+        """Total size in bytes of a file or of all files below a folder."""
+        return get_hdfs_client().content(hdfs_path)["length"]
+
+    @staticmethod
+    def _list_files_recursive(client, hdfs_folder_path, local_destination_path):
+        """[(hdfs_path, local_path, status)] of every file below the folder."""
+        files = []
+        pending = [(hdfs_folder_path, local_destination_path)]
+        while pending:
+            hdfs_dir, local_dir = pending.pop()
+            os.makedirs(local_dir, exist_ok=True)
+            for name, status in client.list(hdfs_dir, status=True):
+                hdfs_path = os.path.join(hdfs_dir, name)
+                local_path = os.path.join(local_dir, name)
+                if status["type"] == "FILE":
+                    files.append((hdfs_path, local_path, status))
+                else:
+                    pending.append((hdfs_path, local_path))
+        return files
+
+    @staticmethod
+    def _download_file(client, hdfs_path, local_path, status):
+        """Download one file through a temp file, verify it, retry with backoff."""
+        tmp_path = f"{local_path}.part"
+        for attempt in range(HDFS_DOWNLOAD_RETRIES + 1):
+            try:
+                with client.read(hdfs_path, chunk_size=1024 * 1024) as reader, open(
+                    tmp_path, "wb"
+                ) as f:
+                    for chunk in reader:
+                        f.write(chunk)
+
+                size = os.path.getsize(tmp_path)
+                if size != status["length"]:
+                    raise IOError(
+                        f"size mismatch, expected {status['length']} bytes, got {size}"
+                    )
+                if HDFS_VERIFY_CHECKSUM != "off" and size > 0:
+                    expected = client.checksum(hdfs_path)
+                    actual = _local_file_checksum(
+                        tmp_path, expected, status["blockSize"]
+                    )
+                    if actual is not None and actual != expected["bytes"]:
+                        raise IOError(f"checksum mismatch ({expected['algorithm']})")
+
+                os.replace(tmp_path, local_path)
+                return size
+            except Exception as e:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                if attempt >= HDFS_DOWNLOAD_RETRIES:
+                    raise Exception(f"Downloading {hdfs_path} failed: {e}")
+                delay = min(10, 2**attempt) * (0.5 + random.random())
+                print(f"Downloading {hdfs_path} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def download_folder_from_hdfs(
+        self, hdfs_folder_path, local_destination_path, cancelled=None
+    ):
         """
-        Download a folder from HDFS to local filesystem
+        Download a folder from HDFS to local filesystem, files are fetched in parallel
+        over one pooled client and verified (size, checksum when computable).
 
         Args:
             hdfs_folder_path: Full path to the folder in HDFS
             local_destination_path: Local path where folder should be downloaded
+            cancelled: optional threading.Event, pending files are skipped once it is set
+        Returns:
+            dict: files, bytes, seconds and MB/s of the download
         """
-
-        def download(client):
-            if not os.path.exists(local_destination_path):
-                os.makedirs(local_destination_path)
-
-            # List all files in the HDFS folder
-            files = client.list(hdfs_folder_path, status=True)
-
-            for file_entry in files:
-                hdfs_file_path = os.path.join(hdfs_folder_path, file_entry[0])
-                local_file_path = os.path.join(local_destination_path, file_entry[0])
-
-                if file_entry[1]["type"] == "FILE":
-                    # Download the file
-                    client.download(hdfs_file_path, local_file_path)
-                    print(f"Downloaded {hdfs_file_path} to {local_file_path}")
-                else:
-                    # If it's a directory, create it locally and recurse
-                    os.makedirs(local_file_path, exist_ok=True)
-                    self.download_folder_from_hdfs(hdfs_file_path, local_file_path)
-
         try:
-            return self._with_hdfs_client(download)
+            client = get_hdfs_client()
+            start = time.perf_counter()
+            files = self._list_files_recursive(
+                client, hdfs_folder_path, local_destination_path
+            )
+            total_bytes = 0
+            lock = threading.Lock()
+
+            def download(entry):
+                nonlocal total_bytes
+                if cancelled is not None and cancelled.is_set():
+                    raise HDFSOperationCancelled(f"Download of {hdfs_folder_path}")
+                size = self._download_file(client, *entry)
+                with lock:
+                    total_bytes += size
+
+            with ThreadPoolExecutor(
+                max_workers=max(1, HDFS_DOWNLOAD_PARALLELISM)
+            ) as executor:
+                # list() re-raises the first failed download
+                list(executor.map(download, files))
+
+            seconds = time.perf_counter() - start
+            stats = {
+                "files": len(files),
+                "bytes": total_bytes,
+                "seconds": round(seconds, 3),
+                "mb_per_s": round(total_bytes / (1024 * 1024) / max(seconds, 1e-6), 2),
+            }
+            print(f"Downloaded {hdfs_folder_path} to {local_destination_path}: {stats}")
+            return stats
         except Exception as e:
             print(f"Error downloading folder from HDFS: {e}")
             raise Exception(f"Error downloading folder from HDFS: {e}")
 
+    async def adownload_folder_from_hdfs(
+        self, hdfs_folder_path, local_destination_path, timeout=None
+    ):
+        """Awaitable download_folder_from_hdfs, stops between files when cancelled."""
+        return await self.run(
+            lambda client, cancelled: self.download_folder_from_hdfs(
+                hdfs_folder_path, local_destination_path, cancelled=cancelled
+            ),
+            timeout=timeout,
+            cancellable=True,
+        )
+
+    async def upload_file_to_hdfs(self, local_path, hdfs_path, timeout=None):
+        """Upload a local file to HDFS (overwriting), awaitable."""
+
+        def upload(client):
+            client.upload(hdfs_path, local_path, overwrite=True)
+            print(f"File uploaded to HDFS: {hdfs_path}")
+            return {"message": "File uploaded successfully", "hdfs_path": hdfs_path}
+
+        return await self.run(upload, timeout=timeout)
+
     ########## Don't delete ################
     # this method is never used in the current implementation of FedData
 
@@ -0,0 +1,663 @@
+import os
+import io
+import math
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from utility.hdfs_services import get_hdfs_client
+from utility.parquet_footer import parquet_files, spark_type_name
+from utility.processing_helper_functions import iqr_bounds
+from utility.preprocessing_planner import NORMALIZATIONS
+from utility.dataset_ingest import PARQUET_COMPRESSION
+from utility.dataset_overview import HISTOGRAM_BINS, TOP_CATEGORIES
+from utility.column_sketches import (
+    OVERVIEW_SKETCHES,
+    HEAVY_HITTERS,
+    centroid_probabilities,
+    moments_sketch,
+    quantile_sketch,
+    heavy_hitters_sketch,
+    hll_from_values,
+)
+
+load_dotenv()
+
+"""
+Local engine for small datasets: pyarrow for the Parquet / CSV IO over WebHDFS and pandas
+for the work, no Spark session, no job scheduling.
+
+It implements the preprocessing vocabulary of All_Column_Operations / Column_Operations with
+Spark's semantics (null / NaN handling, Imputer and StringIndexer rules, type changes) and
+the overview of utility.dataset_overview with the same schema. Quantiles, medians and
+distinct counts are exact here (Spark's are approximate). The HyperLogLog sketch of integer
+and string columns is hashed like Spark's (needs the optional datasketches package), double
+columns have none (Spark hashes their string cast), their merged distinct count is unknown.
+Datasets are written as a Parquet folder like Spark's output, so they stay readable by Spark.
+
+use_local_engine() is the dispatcher: datasets up to LOCAL_ENGINE_MAX_MB with operations
+the engine knows run locally, everything else on Spark. The engine is opt-in (0, the
+default, disables it) until utility/extras/test_local_engine_parity.py passes on the
+cluster's Spark version.
+"""
+
+LOCAL_ENGINE_MAX_MB = float(os.getenv("LOCAL_ENGINE_MAX_MB", 0))
+INTEGER_TYPES = ["IntegerType()", "LongType()"]
+NUMERIC_TYPES = ["IntegerType()", "DoubleType()", "FloatType()", "LongType()"]
+
+ALL_COLUMN_OPERATIONS = [
+    "Drop Null",
+    "Fill 0 Unknown False",
+    "Fill Mean",
+    "Fill Median",
+    "Drop Duplicates",
+    "Remove Outliers",
+] + NORMALIZATIONS
+COLUMN_OPERATIONS = [
+    "Drop Null",
+    "Drop Duplicates",
+    "Drop Column",
+    "Fill 0",
+    "Fill mean",
+    "Fill Mode",
+    "Fill Median",
+    "Fill Unknown",
+    "Fill False",
+    "Remove Outliers",
+    "Log",
+    "Square",
+    "Square Root",
+    "Label Encoding",
+] + NORMALIZATIONS
+# nullable pandas types, integer columns with nulls stay integers
+PANDAS_TYPES = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+    pa.float32(): pd.Float32Dtype(),
+    pa.float64(): pd.Float64Dtype(),
+    pa.bool_(): pd.BooleanDtype(),
+    pa.string(): pd.StringDtype(),
+    pa.large_string(): pd.StringDtype(),
+}
+
+
+def supports(operations):
+    """True when the local engine implements every step (One Hot Encoding needs Spark ML vectors)."""
+    for step in operations:
+        if step["operation"] == "Exclude from All Columns list":
+            continue
+        known = (
+            ALL_COLUMN_OPERATIONS
+            if step["column"] == "All Columns"
+            else COLUMN_OPERATIONS
+        )
+        if step["operation"] not in known:
+            return False
+    return True
+
+
+def use_local_engine(size_bytes, operations=None):
+    """Dispatcher between the engines, size_bytes: size of the input dataset on HDFS."""
+    if LOCAL_ENGINE_MAX_MB <= 0 or size_bytes is None:
+        return False
+    if size_bytes > LOCAL_ENGINE_MAX_MB * 1024 * 1024:
+        return False
+    return operations is None or supports(operations)
+
+
+###################### IO ######################
+def to_pandas(table):
+    return table.to_pandas(types_mapper=PANDAS_TYPES.get)
+
+
+def to_arrow(df):
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _read_bytes(client, path):
+    with client.read(path) as reader:
+        return reader.read()
+
+
+def read_parquet(hdfs_path):
+    """pandas dataframe of a Parquet file / folder on HDFS."""
+    client = get_hdfs_client()
+    tables = [
+        pq.read_table(io.BytesIO(_read_bytes(client, path)))
+        for path, _ in parquet_files(client, hdfs_path)
+    ]
+    return to_pandas(pa.concat_tables(tables, promote_options="default"))
+
+
+def _spark_csv_types(table):
+    """Narrow integers to int32 and timestamps to microseconds like Spark's CSV inference."""
+    fields = []
+    for field in table.schema:
+        data_type = field.type
+        if pa.types.is_int64(data_type):
+            column = table.column(field.name)
+            low, high = pc.min(column).as_py(), pc.max(column).as_py()
+            if low is None or (-(2**31) <= low and high < 2**31):
+                data_type = pa.int32()
+        elif pa.types.is_timestamp(data_type):
+            data_type = pa.timestamp("us", tz="UTC")
+        fields.append(pa.field(field.name, data_type))
+    return table.cast(pa.schema(fields))
+
+
+def read_csv(hdfs_path):
+    """pandas dataframe of a CSV file (header line, empty values are nulls) on HDFS."""
+    table = pa_csv.read_csv(
+        io.BytesIO(_read_bytes(get_hdfs_client(), hdfs_path)),
+        convert_options=pa_csv.ConvertOptions(strings_can_be_null=True),
+    )
+    return to_pandas(_spark_csv_types(table))
+
+
+def write_parquet(df, hdfs_path):
+    """Write df as a Parquet folder (one part file + _SUCCESS) like Spark does."""
+    sink = io.BytesIO()
+    pq.write_table(
+        to_arrow(df),
+        sink,
+        compression=PARQUET_COMPRESSION,
+        # Spark can't read nanosecond timestamps
+        coerce_timestamps="us",
+        allow_truncated_timestamps=True,
+    )
+    client = get_hdfs_client()
+    client.write(
+        f"{hdfs_path}/part-00000-local.{PARQUET_COMPRESSION}.parquet",
+        data=sink.getvalue(),
+        overwrite=True,
+    )
+    client.write(f"{hdfs_path}/_SUCCESS", data=b"", overwrite=True)
+
+
+###################### Preprocessing ######################
+def _values(series):
+    """(float values, null mask) of a numeric column, NaN stays NaN."""
+    return series.to_numpy(dtype="float64", na_value=np.nan), series.isna().to_numpy()
+
+
+def _doubles(values, mask=None):
+    values = np.asarray(values, dtype="float64")
+    if mask is None:
+        mask = np.zeros(len(values), dtype=bool)
+    return pd.arrays.FloatingArray(values, np.asarray(mask, dtype=bool))
+
+
+def _is_numeric(series):
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(
+        series
+    )
+
+
+def _is_string(series):
+    return pd.api.types.is_string_dtype(series) and not pd.api.types.is_object_dtype(
+        series
+    )
+
+
+def _missing(series):
+    """Null, and NaN in numeric columns (what dropna / fillna treat as missing)."""
+    if _is_numeric(series):
+        return np.isnan(_values(series)[0])
+    return series.isna().to_numpy()
+
+
+def _require(df, columns):
+    absent = [c for c in columns if c not in df.columns]
+    if absent:
+        raise KeyError(f"Columns not in the dataset: {absent}")
+
+
+def _rank_quantile(sorted_values, probability):
+    """The value at rank ceil(p * n), the element approxQuantile / percentile_approx return."""
+    index = max(0, math.ceil(probability * len(sorted_values)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def _present_sorted(series):
+    values, _ = _values(series)
+    return np.sort(values[~np.isnan(values)])
+
+
+def _drop_rows(df, drop):
+    return df[~drop].reset_index(drop=True)
+
+
+def _fill(df, columns, value):
+    """DataFrame.fillna(value, subset=columns): only columns of the value's type are filled."""
+    _require(df, columns)
+    df = df.copy()
+    for column in columns:
+        series = df[column]
+        if isinstance(value, bool):
+            matches = pd.api.types.is_bool_dtype(series)
+        elif isinstance(value, str):
+            matches = _is_string(series)
+        else:
+            matches = _is_numeric(series)
+        if matches:
+            df[column] = series.mask(_missing(series), value)
+    return df
+
+
+def _impute(df, columns, strategy):
+    """Imputer: nulls and NaN replaced by the surrogate, cast back to the column type."""
+    df = df.copy()
+    for column in columns:
+        series = df[column]
+        values = _values(series)[0]
+        missing = np.isnan(values)
+        if missing.all():
+            raise ValueError(f"surrogate cannot be computed, {column} has no values")
+        present = np.sort(values[~missing])
+        if strategy == "mean":
+            surrogate = present.mean()
+        elif strategy == "median":
+            surrogate = _rank_quantile(present, 0.5)
+        else:
+            # most frequent, the smallest one on ties
+            unique, counts = np.unique(present, return_counts=True)
+            surrogate = unique[counts == counts.max()].min()
+        filled = np.where(missing, surrogate, values)
+        if pd.api.types.is_integer_dtype(series):
+            df[column] = pd.array(np.trunc(filled).astype("int64"), dtype=series.dtype)
+        else:
+            df[column] = pd.array(filled, dtype=series.dtype)
+    return df
+
+
+def _remove_outliers(df, columns, factor=1.5):
+    """Rows with a value outside the IQR bounds, or a null, in any of the columns are removed."""
+    keep = np.ones(len(df), dtype=bool)
+    for column in columns:
+        present = _present_sorted(df[column])
+        if not len(present):
+            raise ValueError(f"no values in {column} to compute quantiles of")
+        lower_bound, upper_bound = iqr_bounds(
+            _rank_quantile(present, 0.25), _rank_quantile(present, 0.75), factor
+        )
+        values = _values(df[column])[0]
+        with np.errstate(invalid="ignore"):
+            keep &= (values >= lower_bound) & (values <= upper_bound)
+    return _drop_rows(df, ~keep)
+
+
+def _normalize_rows(df, columns, operation):
+    """All Columns normalizations: the numeric columns of a row are one vector."""
+    _require(df, columns)
+    matrix = np.column_stack([_values(df[c])[0] for c in columns])
+    if np.isnan(matrix).any():
+        raise ValueError("null values in the numeric columns can't be assembled")
+    if operation in ["L1 Norm", "L2 Norm", "L inf Norm"]:
+        order = {"L1 Norm": 1, "L2 Norm": 2, "L inf Norm": np.inf}[operation]
+        norms = np.linalg.norm(matrix, ord=order, axis=1)
+        scaled = matrix / np.where(norms == 0, 1, norms)[:, None]
+    elif operation == "Min-Max":
+        low, high = matrix.min(axis=0), matrix.max(axis=0)
+        span = high - low
+        # MinMaxScaler maps a constant column to the middle of the range
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scaled = np.where(span == 0, 0.5, (matrix - low) / span)
+    else:
+        # StandardScaler(withMean=False, withStd=True)
+        std = matrix.std(axis=0, ddof=1) if len(matrix) > 1 else np.zeros(len(columns))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scaled = np.where(std == 0, 0.0, matrix / std)
+    df = df.copy()
+    for index, column in enumerate(columns):
+        df[column] = _doubles(scaled[:, index])
+    return df
+
+
+def _normalize_column(df, column, operation):
+    """Same statistics and constant column handling as normalized_expression."""
+    values, mask = _values(df[column])
+    present = values[~mask]
+    if not len(present):
+        raise ValueError(f"no values in {column} to normalize")
+    if operation == "Min-Max":
+        low, high = present.min(), present.max()
+        scale = None if high - low == 0 else (low, high - low)
+    elif operation == "Z-score":
+        stddev = present.std(ddof=1) if len(present) > 1 else 0
+        scale = None if not stddev else (present.mean(), stddev)
+    elif operation == "L1 Norm":
+        total = np.abs(present).sum()
+        scale = None if total == 0 else (0, total)
+    elif operation == "L2 Norm":
+        total = (present**2).sum()
+        scale = None if total == 0 else (0, math.sqrt(total))
+    else:
+        total = np.abs(present).max()
+        scale = None if total == 0 else (0, total)
+
+    df = df.copy()
+    if scale is None:
+        # a literal 0.0, nulls included
+        df[column] = _doubles(np.zeros(len(df)))
+    else:
+        df[column] = _doubles((values - scale[0]) / scale[1], mask)
+    return df
+
+
+def _as_strings(series):
+    """Values as Spark casts them to string (StringIndexer input)."""
+    if pd.api.types.is_bool_dtype(series):
+        return series.map({True: "true", False: "false"})
+    return series.astype(str)
+
+
+def _label_encode(df, column):
+    """StringIndexer: most frequent value first, alphabetical on ties, double indices."""
+    strings = _as_strings(df[column])
+    counts = strings.value_counts()
+    order = sorted(counts.index, key=lambda value: (-counts[value], value))
+    indices = {value: float(index) for index, value in enumerate(order)}
+    df = df.copy()
+    df[column] = _doubles(strings.map(indices).to_numpy(dtype="float64"))
+    return df
+
+
+def all_column_operations(df, step, numeric_columns, all_columns):
+    operation = step["operation"]
+    if operation == "Drop Null":
+        _require(df, all_columns)
+        return _drop_rows(df, np.any([_missing(df[c]) for c in all_columns], axis=0))
+    elif operation == "Fill 0 Unknown False":
+        df = _fill(df, all_columns, 0)
+        df = _fill(df, all_columns, "unknown")
+        return _fill(df, all_columns, False)
+    elif operation in ["Fill Mean", "Fill Median"]:
+        _require(df, numeric_columns)
+        return _impute(df, numeric_columns, operation.split()[1].lower())
+    elif operation == "Drop Duplicates":
+        return df.drop_duplicates().reset_index(drop=True)
+    elif operation in NORMALIZATIONS:
+        return _normalize_rows(df, numeric_columns, operation)
+    elif operation == "Remove Outliers":
+        return _remove_outliers(df, numeric_columns)
+    raise ValueError(f"Operation not supported by the local engine: {operation}")
+
+
+def column_operations(df, step):
+    column, operation = step["column"], step["operation"]
+    _require(df, [column])
+    if operation == "Drop Null":
+        return _drop_rows(df, _missing(df[column]))
+    elif operation == "Drop Duplicates":
+        return df.drop_duplicates(subset=[column]).reset_index(drop=True)
+    elif operation == "Drop Column":
+        return df.drop(columns=[column])
+    elif operation == "Fill 0":
+        return _fill(df, [column], 0)
+    elif operation in ["Fill mean", "Fill Mode", "Fill Median"]:
+        return _impute(df, [column], operation.split()[1].lower())
+    elif operation == "Fill Unknown":
+        return _fill(df, [column], "Unknown")
+    elif operation == "Fill False":
+        return _fill(df, [column], False)
+    elif operation in NORMALIZATIONS:
+        return _normalize_column(df, column, operation)
+    elif operation == "Remove Outliers":
+        return _remove_outliers(df, [column])
+    elif operation in ["Log", "Square Root"]:
+        values, mask = _values(df[column])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if operation == "Log":
+                # log of values <= 0 is null
+                mask = mask | ~(values > 0)
+                result = np.log(np.where(mask, 1, values))
+            else:
+                result = np.sqrt(values)
+        df = df.copy()
+        df[column] = _doubles(np.where(mask, 0, result), mask)
+        return df
+    elif operation == "Square":
+        # same as Column_Operations
+        df = df.copy()
+        df[column] = df[column] * 2
+        return df
+    elif operation == "Label Encoding":
+        if df[column].isna().any():
+            print(f"error: Null values found in {column} column for Label Encoding")
+            return df
+        return _label_encode(df, column)
+    raise ValueError(f"Operation not supported by the local engine: {operation}")
+
+
+def run_operations(df, operations):
+    """Local counterpart of utility.preprocessing_planner.run_operations."""
+    all_columns = list(df.columns)
+    numeric_columns = [c for c in all_columns if _is_numeric(df[c])]
+    for step in operations:
+        column, operation = step["column"], step["operation"]
+        if operation == "Exclude from All Columns list":
+            all_columns.remove(column)
+            if column in numeric_columns:
+                numeric_columns.remove(column)
+            continue
+        try:
+            if column == "All Columns":
+                df = all_column_operations(df, step, numeric_columns, all_columns)
+            else:
+                df = column_operations(df, step)
+        except Exception as e:
+            print(
+                f"error: Error in {operation} operation for {column} column: {str(e)} \n"
+            )
+    return df
+
+
+###################### Overview ######################
+def _histogram(values, min_val, max_val):
+    """Buckets of utility.dataset_overview (the last one closed)."""
+    if min_val == max_val:
+        return {"bins": [min_val, max_val], "counts": [len(values)]}
+    bin_width = (max_val - min_val) / HISTOGRAM_BINS
+    bins = [min_val + i * bin_width for i in range(HISTOGRAM_BINS + 1)]
+    buckets = np.minimum(
+        np.floor((values - bins[0]) / (bins[1] - bins[0])), HISTOGRAM_BINS - 1
+    )
+    return {
+        "bins": bins,
+        "counts": [int((buckets == i).sum()) for i in range(HISTOGRAM_BINS)],
+    }
+
+
+def _python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _numeric_stats(series, num_rows, nulls):
+    values = _values(series)[0]
+    values = values[~series.isna().to_numpy()]
+    stats, sketches = {}, None
+    if not len(values):
+        return {"mean": None, "stddev": None, "min": None, "max": None}, sketches
+    present = np.sort(values)
+    if pd.api.types.is_integer_dtype(series):
+        present = present.astype("int64")
+    min_val, max_val = _python(present[0]), _python(present[-1])
+    q1, median, q3 = [_rank_quantile(present, p) for p in (0.25, 0.5, 0.75)]
+    stats = {
+        "mean": float(present.mean()),
+        "stddev": float(present.std(ddof=1)) if len(present) > 1 else None,
+        "min": min_val,
+        "max": max_val,
+        "quartiles": {
+            "Q1": _python(q1),
+            "median": _python(median),
+            "Q3": _python(q3),
+            "IQR": _python(q3 - q1),
+        },
+        "histogram": _histogram(present, min_val, max_val),
+    }
+    if OVERVIEW_SKETCHES:
+        sketches = {
+            "moments": moments_sketch(
+                num_rows,
+                nulls,
+                float(present.sum()),
+                float((present * present).sum()),
+                min_val,
+                max_val,
+            ),
+            "quantiles": quantile_sketch(
+                [_python(_rank_quantile(present, p)) for p in centroid_probabilities()],
+                len(present),
+            ),
+        }
+    return stats, sketches
+
+
+def _top_values(series, limit):
+    counts = (
+        series.astype(object).where(series.notna(), None).value_counts(dropna=False)
+    )
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+    return [(value, int(count)) for value, count in ranked[:limit]]
+
+
+def _array_stats(values, num_rows):
+    """Same as utility.dataset_overview._array_stats on the Python lists of the column."""
+    present = [value for value in values if value is not None]
+    first = present[0] if present else None
+    stats = {}
+    shape, temp = [], first
+    while isinstance(temp, list):
+        shape.append(len(temp))
+        if len(temp) == 0:
+            break
+        temp = temp[0] if isinstance(temp[0], list) else None
+    stats["Shape"] = tuple(shape) if shape else None
+
+    lengths = np.array([len(value) for value in present], dtype="float64")
+    stats["LengthStats"] = {
+        "min": int(lengths.min()) if len(lengths) else 0,
+        "max": int(lengths.max()) if len(lengths) else 0,
+        "mean": float(lengths.mean()) if len(lengths) else 0.0,
+        "std": float(lengths.std(ddof=1)) if len(lengths) > 1 else 0.0,
+    }
+
+    def flatten(x):
+        if isinstance(x, list):
+            for item in x:
+                yield from flatten(item)
+        else:
+            yield x
+
+    if not isinstance(first, list):
+        stats["valueStats"] = "Not detected"
+        return stats
+    flat_sample = list(flatten(first))
+    if not (flat_sample and isinstance(flat_sample[0], (int, float))):
+        stats["valueStats"] = "Not numeric"
+        return stats
+    num_samples = int(min(num_rows * 0.2, 100000))
+    stats["sampleSize"] = f"{num_samples} samples"
+    sampled = []
+    for value in present:
+        sampled.extend(flatten(value))
+        if len(sampled) >= num_samples:
+            break
+    sampled = np.array(sampled[:num_samples], dtype="float64")
+    if len(sampled):
+        stats["valueStats"] = {
+            "min": float(np.min(sampled)),
+            "max": float(np.max(sampled)),
+            "mean": float(np.mean(sampled)),
+            "std": float(np.std(sampled)),
+            "median": float(np.median(sampled)),
+            "sparsity": float(np.mean(sampled == 0)),
+        }
+    return stats
+
+
+def compute_overview(df):
+    """The overview of SparkSessionManager._get_overview for a pandas dataframe."""
+    table = to_arrow(df)
+    num_rows = len(df)
+    column_stats = []
+    for field in table.schema:
+        name = field.name
+        series = df[name]
+        try:
+            data_type = spark_type_name(field.type)
+            nulls = int(series.isna().sum())
+            stats = {
+                "name": name,
+                "type": data_type,
+                "entries": num_rows,
+                "nullCount": nulls,
+            }
+            sketches = None
+            if data_type in NUMERIC_TYPES or data_type == "StringType()":
+                # like distinct().count(), null is one of the values
+                distinct = int(series.nunique(dropna=True))
+                stats["uniqueCount"] = distinct + (1 if nulls else 0)
+
+            if data_type in NUMERIC_TYPES:
+                numeric, sketches = _numeric_stats(series, num_rows, nulls)
+                stats.update(numeric)
+            elif data_type == "StringType()":
+                top = _top_values(series, max(TOP_CATEGORIES, HEAVY_HITTERS))
+                stats["topCategories"] = [
+                    {
+                        "value": (
+                            value[:50] + "..."
+                            if isinstance(value, str) and len(value) > 50
+                            else value
+                        ),
+                        "count": count,
+                    }
+                    for value, count in top[:TOP_CATEGORIES]
+                ]
+                if OVERVIEW_SKETCHES:
+                    sketches = {
+                        "moments": moments_sketch(
+                            num_rows, nulls, None, None, None, None
+                        ),
+                        "heavyHitters": heavy_hitters_sketch(top, num_rows),
+                    }
+            elif data_type.startswith("ArrayType"):
+                stats.update(_array_stats(table.column(name).to_pylist(), num_rows))
+                if OVERVIEW_SKETCHES:
+                    sketches = {
+                        "moments": moments_sketch(
+                            num_rows, nulls, None, None, None, None
+                        )
+                    }
+
+            if sketches is not None:
+                if "uniqueCount" in stats:
+                    sketches["distinctEstimate"] = stats["uniqueCount"] - (
+                        1 if nulls else 0
+                    )
+                    if data_type in INTEGER_TYPES or data_type == "StringType()":
+                        sketches["distinct"] = hll_from_values(
+                            _python(value) for value in series.dropna()
+                        )
+                stats["sketches"] = sketches
+            column_stats.append(stats)
+        except Exception as e:
+            print(f"Error processing column {name}: {e}")
+            continue
+
+    head = df.head(5).astype(object)
+    return {
+        "numRows": num_rows,
+        "numColumns": len(df.columns),
+        "columnStats": column_stats,
+        "datasetHead": head.where(head.notna(), None).to_dict(orient="records"),
+        "statsLevel": "full",
+        "engine": "local",
+    }
@@ -0,0 +1,201 @@
+import io
+import json
+import os
+import time
+import numpy as np
+from . import federated_client
+from dotenv import load_dotenv
+
+load_dotenv()
+
+"""
+Wire formats for moving model parameters between the client and the federated server.
+
+- json:   the original format, nested lists produced by sanitize_parameters
+- binary: an uncompressed npz archive, every tensor stored as raw little-endian data
+          (floats as float32) plus a "__manifest__" entry describing the nested
+          dict/list structure and the shape/dtype of each tensor
+
+The client asks for binary with an Accept header and checks the Content-Type of the answer,
+uploads are sent as binary first and fall back to JSON when an endpoint rejects the media type
+(406 / 415). That endpoint then gets JSON for BINARY_RETRY_SECONDS before binary is tried again.
+"""
+
+PARAMETERS_CONTENT_TYPE = "application/vnd.fed.parameters+npz"
+JSON_CONTENT_TYPE = "application/json"
+PARAMETER_WIRE_FORMAT = os.getenv("PARAMETER_WIRE_FORMAT", "binary")
+
+MANIFEST_KEY = "__manifest__"
+# status codes a server answers with when it does not take the binary media type, other
+# errors (a bad payload, a closed round) say nothing about the format
+UNSUPPORTED_FORMAT_STATUS = (406, 415)
+BINARY_RETRY_SECONDS = float(os.getenv("BINARY_RETRY_SECONDS", 3600))
+
+# url -> time.monotonic() until which the endpoint is sent JSON, remembered per process so a
+# JSON-only server is not probed every round
+_json_only_until = {}
+
+
+def accepts_binary(url):
+    """Whether uploads to url are sent in the binary format."""
+    if PARAMETER_WIRE_FORMAT != "binary":
+        return False
+    until = _json_only_until.get(url)
+    if until is None:
+        return True
+    if time.monotonic() >= until:
+        _json_only_until.pop(url, None)
+        return True
+    return False
+
+
+def as_tensor_leaf(value):
+    """Return value as a numeric ndarray if it is a tensor leaf, otherwise None."""
+    if hasattr(value, "numpy") and not isinstance(value, np.ndarray):
+        value = value.numpy()  # tf.Tensor / tf.Variable
+    if isinstance(value, np.ndarray):
+        arr = value
+    elif isinstance(value, (list, tuple)):
+        # a list holding arrays or dicts is structure (e.g. the weights of one layer)
+        if any(isinstance(v, (np.ndarray, dict)) or hasattr(v, "numpy") for v in value):
+            return None
+        try:
+            arr = np.asarray(value)
+        except ValueError:
+            return None  # ragged nested lists
+    else:
+        return None
+
+    if arr.dtype.kind == "f":
+        # float64 is narrowed to float32, already narrower floats (float16) are kept
+        dtype = (
+            np.dtype("<f4") if arr.dtype.itemsize >= 4 else arr.dtype.newbyteorder("<")
+        )
+        limit = min(1e10, float(np.finfo(dtype).max))
+        arr = np.nan_to_num(arr, nan=0.0, posinf=limit, neginf=-limit).astype(dtype)
+    elif arr.dtype.kind in "iu":
+        arr = arr.astype(arr.dtype.newbyteorder("<"))
+    elif arr.dtype.kind != "b":
+        return None
+    return np.ascontiguousarray(arr)
+
+
+def flatten_parameters(payload):
+    """Split a nested payload into (manifest, {name: tensor}), shared by the wire format and caches."""
+    tensors = {}
+
+    def build(value):
+        tensor = as_tensor_leaf(value)
+        if tensor is not None:
+            name = f"t{len(tensors)}"
+            tensors[name] = tensor
+            return {
+                "tensor": name,
+                "shape": list(tensor.shape),
+                "dtype": tensor.dtype.str,
+                "list": not isinstance(value, np.ndarray),
+            }
+        if isinstance(value, dict):
+            return {"dict": {str(k): build(v) for k, v in value.items()}}
+        if isinstance(value, (list, tuple)):
+            return {"list_of": [build(v) for v in value]}
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, float) and not np.isfinite(value):
+            value = 0.0 if np.isnan(value) else float(np.sign(value) * 1e10)
+        return {"value": value}
+
+    manifest = build(payload)
+    return manifest, tensors
+
+
+def unflatten_parameters(manifest, load_tensor):
+    """Rebuild the nested payload, load_tensor(name) returns the stored array."""
+
+    def build(node):
+        if "tensor" in node:
+            arr = load_tensor(node["tensor"])
+            if list(arr.shape) != node["shape"] or arr.dtype.str != node["dtype"]:
+                raise ValueError(f"Tensor {node['tensor']} does not match manifest")
+            # every tensor leaf comes back as an ndarray, whatever it was sent as
+            return arr
+        if "dict" in node:
+            return {k: build(v) for k, v in node["dict"].items()}
+        if "list_of" in node:
+            return [build(v) for v in node["list_of"]]
+        return node["value"]
+
+    return build(manifest)
+
+
+def encode_parameters(payload) -> bytes:
+    """Serialize a (nested) parameter payload into the binary npz wire format."""
+    manifest, tensors = flatten_parameters(payload)
+    tensors[MANIFEST_KEY] = np.frombuffer(
+        json.dumps(manifest).encode("utf-8"), dtype=np.uint8
+    )
+    buffer = io.BytesIO()
+    np.savez(buffer, **tensors)
+    return buffer.getvalue()
+
+
+def decode_parameters(data: bytes):
+    """Inverse of encode_parameters, tensors come back as numpy arrays."""
+    with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+        manifest = json.loads(archive[MANIFEST_KEY].tobytes().decode("utf-8"))
+        return unflatten_parameters(manifest, lambda name: archive[name])
+
+
+def fetch_parameters(url, headers=None, timeout=None):
+    """
+    GET parameters from the server, offering the binary format.
+    Returns the decoded payload whatever format the server chose to answer with.
+    """
+    headers = dict(headers or {})
+    if PARAMETER_WIRE_FORMAT == "binary":
+        headers["Accept"] = f"{PARAMETERS_CONTENT_TYPE}, {JSON_CONTENT_TYPE};q=0.5"
+    response = federated_client.get(url, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    content_type = response.headers.get("Content-Type", "")
+    if content_type.startswith(PARAMETERS_CONTENT_TYPE):
+        return decode_parameters(response.content)
+    return response.json()
+
+
+def upload_parameters(url, payload, headers=None, to_json=None, timeout=None):
+    """
+    POST a parameter payload, binary when the server accepts it, JSON otherwise.
+
+    Args:
+        to_json: callable making the payload JSON serializable (used for the JSON path)
+    Returns:
+        The requests.Response of the accepted upload
+    """
+    headers = dict(headers or {})
+    headers.pop("Content-Type", None)
+
+    if accepts_binary(url):
+        response = federated_client.post(
+            url,
+            data=encode_parameters(payload),
+            headers={**headers, "Content-Type": PARAMETERS_CONTENT_TYPE},
+            timeout=timeout,
+        )
+        if response.status_code not in UNSUPPORTED_FORMAT_STATUS:
+            response.raise_for_status()
+            return response
+        print(
+            f"Server rejected binary parameters ({response.status_code}), sending JSON "
+            f"to {url} for the next {BINARY_RETRY_SECONDS:.0f}s"
+        )
+        _json_only_until[url] = time.monotonic() + BINARY_RETRY_SECONDS
+
+    json_payload = to_json(payload) if to_json else payload
+    response = federated_client.post(
+        url,
+        json=json_payload,
+        headers={**headers, "Content-Type": JSON_CONTENT_TYPE},
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    return response
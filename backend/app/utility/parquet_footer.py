@@ -0,0 +1,218 @@
+import os
+import io
+import math
+import time
+from decimal import Decimal
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from utility.hdfs_services import get_hdfs_client
+
+load_dotenv()
+
+"""
+Overview of a Parquet dataset on HDFS from the file footers only, no Spark and no data pages.
+
+The footer of every part file is fetched over WebHDFS (one ranged read of its tail, a second
+one only for footers larger than PARQUET_FOOTER_READ_BYTES) and the row-group statistics are
+summed up: row count, null counts, min and max per column. The result has the same shape as
+the full overview with "statsLevel": "footer", the distribution stats (mean, quartiles,
+histograms, distinct counts, top categories) come later from the Spark overview.
+"""
+
+PARQUET_FOOTER_READ_BYTES = int(os.getenv("PARQUET_FOOTER_READ_BYTES", 64 * 1024))
+PARQUET_FOOTER_WORKERS = int(os.getenv("PARQUET_FOOTER_WORKERS", 8))
+
+# same names as str() of the Spark data types in the full overview
+SPARK_TYPE_NAMES = {
+    pa.int8(): "ByteType()",
+    pa.int16(): "ShortType()",
+    pa.int32(): "IntegerType()",
+    pa.int64(): "LongType()",
+    pa.float32(): "FloatType()",
+    pa.float64(): "DoubleType()",
+    pa.string(): "StringType()",
+    pa.large_string(): "StringType()",
+    pa.bool_(): "BooleanType()",
+    pa.binary(): "BinaryType()",
+    pa.date32(): "DateType()",
+}
+
+
+class HDFSFileTail(io.RawIOBase):
+    """
+    Read-only, seekable view of an HDFS file for pyarrow. The last PARQUET_FOOTER_READ_BYTES
+    are fetched up front, any other range is fetched when it is read.
+    """
+
+    def __init__(self, client, path, size):
+        self.client = client
+        self.path = path
+        self.size = size
+        self.position = 0
+        self.tail_start = max(0, size - PARQUET_FOOTER_READ_BYTES)
+        self.tail = self._fetch(self.tail_start, size - self.tail_start)
+
+    def _fetch(self, offset, length):
+        with self.client.read(self.path, offset=offset, length=length) as reader:
+            return reader.read()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = offset
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        size = min(size, self.size - self.position)
+        if size <= 0:
+            return b""
+        start = self.position
+        if start >= self.tail_start:
+            start -= self.tail_start
+            data = self.tail[start : start + size]
+        else:
+            data = self._fetch(start, size)
+        self.position += len(data)
+        return data
+
+
+def spark_type_name(data_type):
+    if data_type in SPARK_TYPE_NAMES:
+        return SPARK_TYPE_NAMES[data_type]
+    if pa.types.is_timestamp(data_type):
+        return "TimestampType()" if data_type.tz else "TimestampNTZType()"
+    if pa.types.is_decimal(data_type):
+        return f"DecimalType({data_type.precision}, {data_type.scale})"
+    if pa.types.is_list(data_type) or pa.types.is_large_list(data_type):
+        return f"ArrayType({spark_type_name(data_type.value_type)}, True)"
+    return str(data_type)
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, bytes):
+        return None
+    if isinstance(value, str) and len(value) > 50:
+        return value[:50] + "..."
+    return value
+
+
+def parquet_files(client, hdfs_path):
+    """[(path, size)] of a Parquet file or of the part files of a Parquet folder."""
+    status = client.status(hdfs_path)
+    if status["type"] == "FILE":
+        return [(hdfs_path, status["length"])]
+    return [
+        (f"{hdfs_path}/{name}", file_status["length"])
+        for name, file_status in client.list(hdfs_path, status=True)
+        if file_status["type"] == "FILE"
+        and name.endswith(".parquet")
+        and not name.startswith(("_", "."))
+        and file_status["length"] > 0
+    ]
+
+
+def read_footer(client, path, size):
+    return pq.read_metadata(HDFSFileTail(client, path, size))
+
+
+def summarize_footers(metadatas):
+    """Overview dict from the FileMetaData of the part files of one dataset."""
+    schema = metadatas[0].schema.to_arrow_schema()
+    # row-group statistics exist for primitive top level columns only
+    totals = {
+        field.name: {"nullCount": 0, "min": None, "max": None, "complete": True}
+        for field in schema
+        if not pa.types.is_nested(field.type)
+    }
+    num_rows = 0
+    row_groups = 0
+    for metadata in metadatas:
+        num_rows += metadata.num_rows
+        for index in range(metadata.num_row_groups):
+            row_group = metadata.row_group(index)
+            row_groups += 1
+            for column_index in range(row_group.num_columns):
+                column = row_group.column(column_index)
+                total = totals.get(column.path_in_schema)
+                if total is None:
+                    continue
+                statistics = column.statistics
+                if statistics is None or not statistics.has_null_count:
+                    total["complete"] = False
+                    continue
+                total["nullCount"] += statistics.null_count
+                if statistics.has_min_max and row_group.num_rows:
+                    if total["min"] is None or statistics.min < total["min"]:
+                        total["min"] = statistics.min
+                    if total["max"] is None or statistics.max > total["max"]:
+                        total["max"] = statistics.max
+
+    column_stats = []
+    for field in schema:
+        stats = {
+            "name": field.name,
+            "type": spark_type_name(field.type),
+            "entries": num_rows,
+        }
+        total = totals.get(field.name)
+        if total is not None and total["complete"]:
+            stats.update(
+                {
+                    "nullCount": total["nullCount"],
+                    "min": _json_value(total["min"]),
+                    "max": _json_value(total["max"]),
+                }
+            )
+        column_stats.append(stats)
+    return {
+        "numRows": num_rows,
+        "numColumns": len(schema),
+        "columnStats": column_stats,
+        "datasetHead": [],
+        "statsLevel": "footer",
+        "files": len(metadatas),
+        "rowGroups": row_groups,
+    }
+
+
+def footer_overview(hdfs_path):
+    """
+    Footer-only overview of the Parquet file / folder at hdfs_path (relative paths are below
+    the HDFS user's home, like the other HDFS services).
+    """
+    start = time.time()
+    client = get_hdfs_client()
+    files = parquet_files(client, hdfs_path)
+    if not files:
+        return {"error": f"No Parquet files in {hdfs_path}."}
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(PARQUET_FOOTER_WORKERS, len(files)))
+    ) as executor:
+        metadatas = list(executor.map(lambda f: read_footer(client, *f), files))
+    overview = summarize_footers(metadatas)
+    print(
+        f"Footer overview of {hdfs_path}: {len(files)} files in {time.time() - start:.3f}s"
+    )
+    return overview
@@ -0,0 +1,229 @@
+from pyspark.sql import functions as F
+from pyspark.sql.types import NumericType
+from utility.processing_helper_functions import (
+    All_Column_Operations,
+    Column_Operations,
+    iqr_bounds,
+    label_encode,
+    normalization_aggregates,
+    normalized_expression,
+    one_hot_encode,
+)
+
+"""
+Runs the preprocessing `operations` list with batched statistics collection.
+
+Step by step, every normalization / outlier removal / encoding null check is its own full
+scan. The planner groups consecutive steps into stages: a step joins the current stage
+when no earlier step of the stage changed the rows (Drop Null, Remove Outliers ...) or the
+column it needs statistics of. The statistics of a whole stage are then collected with one
+aggregation (plus one approxQuantile call for outlier bounds) on the stage's input, which is
+exactly the data each step would have seen, and the column rewrites of the stage are applied
+as a single projection.
+
+Steps the planner can't batch (All Columns operations, imputers, unknown operations) close
+the current stage and run through All_Column_Operations / Column_Operations as before.
+"""
+
+NORMALIZATIONS = ["L1 Norm", "L2 Norm", "L inf Norm", "Min-Max", "Z-score"]
+ENCODINGS = {"Label Encoding": label_encode, "One Hot Encoding": one_hot_encode}
+# column rewrites without statistics
+EXPRESSIONS = {
+    "Log": F.log,
+    "Square": lambda column: column * 2,
+    "Square Root": F.sqrt,
+}
+# lazy column steps that keep the rows
+COLUMN_STEPS = ["Fill 0", "Fill Unknown", "Fill False", "Drop Column"]
+# lazy column steps that change the rows
+ROW_STEPS = ["Drop Null", "Drop Duplicates"]
+# steps that need statistics of their column
+STATISTICS_STEPS = NORMALIZATIONS + list(ENCODINGS) + ["Remove Outliers"]
+
+
+def _step_error(step, e):
+    print(
+        f"error: Error in {step['operation']} operation for {step['column']} column: {str(e)} \n"
+    )
+
+
+class _Stage:
+    """Steps whose statistics can all be computed on the same input dataframe."""
+
+    def __init__(self):
+        self.steps = []
+        self.changed_columns = set()
+        self.rows_changed = False
+
+    def accepts(self, column):
+        return not self.rows_changed and column not in self.changed_columns
+
+    def add(self, step, changes_rows):
+        self.steps.append(step)
+        self.changed_columns.add(step["column"])
+        self.rows_changed = self.rows_changed or changes_rows
+
+    def _collect_stats(self, df):
+        """One aggregation for all steps of the stage, one approxQuantile for outliers."""
+        aggregates, outlier_columns = [], []
+        for index, step in enumerate(self.steps):
+            column, operation = step["column"], step["operation"]
+            if operation in NORMALIZATIONS:
+                aggregates += [
+                    expr.alias(f"s{index}_{name}")
+                    for name, expr in normalization_aggregates(
+                        F.col(column), operation
+                    ).items()
+                ]
+            elif operation in ENCODINGS:
+                aggregates.append(
+                    F.count_if(F.col(column).isNull()).alias(f"s{index}_nulls")
+                )
+            elif operation == "Remove Outliers":
+                outlier_columns.append(column)
+
+        stats = df.agg(*aggregates).first().asDict() if aggregates else {}
+        if outlier_columns:
+            quantiles = df.approxQuantile(outlier_columns, [0.25, 0.75], 0.01)
+            stats["quantiles"] = dict(zip(outlier_columns, quantiles))
+        return stats
+
+    def run(self, df):
+        if not self.steps:
+            return df
+        try:
+            stats = self._collect_stats(df)
+        except Exception as e:
+            print(f"Batched statistics failed ({e}), running the steps one by one")
+            for step in self.steps:
+                try:
+                    df = Column_Operations(df, step)
+                except Exception as e:
+                    _step_error(step, e)
+            return df
+
+        # column rewrites are collected and applied as one select
+        rewrites = []
+        for index, step in enumerate(self.steps):
+            column, operation = step["column"], step["operation"]
+            try:
+                if operation in NORMALIZATIONS:
+                    step_stats = {
+                        name[len(f"s{index}_") :]: value
+                        for name, value in stats.items()
+                        if name.startswith(f"s{index}_")
+                    }
+                    # raises here (and skips only this step) if the stats don't fit
+                    normalized_expression(F.col(column), operation, step_stats)
+                    rewrites.append(
+                        (
+                            step,
+                            lambda current, operation=operation, stats=step_stats: (
+                                normalized_expression(current, operation, stats)
+                            ),
+                        )
+                    )
+                elif operation in EXPRESSIONS:
+                    rewrites.append((step, EXPRESSIONS[operation]))
+                else:
+                    df = _project(df, rewrites)
+                    rewrites = []
+                    if operation in ENCODINGS:
+                        if stats[f"s{index}_nulls"] > 0:
+                            print(
+                                f"error: Null values found in {column} column for {operation}"
+                            )
+                            continue
+                        df = ENCODINGS[operation](df, column)
+                    elif operation == "Remove Outliers":
+                        lower_bound, upper_bound = iqr_bounds(
+                            *stats["quantiles"][column]
+                        )
+                        df = df.where(F.col(column).between(lower_bound, upper_bound))
+                    else:
+                        df = Column_Operations(df, step)
+            except Exception as e:
+                _step_error(step, e)
+        return _project(df, rewrites)
+
+
+def _project(df, rewrites):
+    """Apply the collected rewrites (in step order) with a single select."""
+    if not rewrites:
+        return df
+    current = {}
+    for step, rewrite in rewrites:
+        column = step["column"]
+        current[column] = rewrite(current.get(column, F.col(column)))
+    try:
+        return df.select(
+            [
+                current[name].alias(name) if name in current else F.col(f"`{name}`")
+                for name in df.columns
+            ]
+        )
+    except Exception:
+        # same error handling as step by step: skip only the failing steps
+        for step, rewrite in rewrites:
+            try:
+                column = step["column"]
+                df = df.withColumn(column, rewrite(F.col(column)))
+            except Exception as e:
+                _step_error(step, e)
+        return df
+
+
+def run_operations(df, operations):
+    """
+    Apply the preprocessing `operations` (see SparkSessionManager.preprocess_data) with the
+    statistics of consecutive independent steps collected in shared passes.
+    """
+    All_Columns = df.columns
+    numericCols = [
+        c for c in All_Columns if isinstance(df.schema[c].dataType, NumericType)
+    ]
+
+    stage = _Stage()
+    passes = 0
+    for step in operations:
+        column, operation = step["column"], step["operation"]
+
+        if operation == "Exclude from All Columns list":
+            All_Columns.remove(column)
+            if column in numericCols:
+                numericCols.remove(column)
+            continue
+
+        plannable = column != "All Columns" and (
+            operation in STATISTICS_STEPS
+            or operation in EXPRESSIONS
+            or operation in COLUMN_STEPS
+            or operation in ROW_STEPS
+        )
+        if plannable and column in df.columns:
+            if operation in STATISTICS_STEPS and not stage.accepts(column):
+                df = stage.run(df)
+                passes += 1
+                stage = _Stage()
+            stage.add(
+                step,
+                changes_rows=operation in ROW_STEPS or operation == "Remove Outliers",
+            )
+            continue
+
+        # not batchable: run the stage so far, then the step itself
+        df = stage.run(df)
+        passes += bool(stage.steps)
+        stage = _Stage()
+        try:
+            if column == "All Columns":
+                df = All_Column_Operations(df, step, numericCols, All_Columns)
+            else:
+                df = Column_Operations(df, step)
+        except Exception as e:
+            _step_error(step, e)
+
+    df = stage.run(df)
+    passes += bool(stage.steps)
+    print(f"Preprocessing plan: {len(operations)} steps in {passes} batched stages")
+    return df
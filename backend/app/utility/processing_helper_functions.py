@@ -17,14 +17,20 @@ from pyspark.sql.types import (
     DecimalType,
     StringType,
     BooleanType,
+    MapType,
+    ArrayType,
 )
 from pyspark.sql.functions import col, udf, lit
 from pyspark.sql import functions as F
 from functools import reduce
+from dotenv import load_dotenv
+import os
 import math
 import time
 from uuid import uuid4
 
+load_dotenv()
+
 
 """
     I have tried to keep the functions optimal for large datasets, such that they can be run on a cluster with
@@ -32,97 +38,195 @@ from uuid import uuid4
 """
 
 
+# "exact": df.dropDuplicates(), "hash": hash_drop_duplicates,
+# "auto": hash_drop_duplicates for wide rows or array columns, dropDuplicates otherwise
+DEDUPE_MODE = os.getenv("DEDUPE_MODE", "exact")
+# "auto" hashes rows of at least this many columns
+DEDUPE_HASH_MIN_COLUMNS = int(os.getenv("DEDUPE_HASH_MIN_COLUMNS", 20))
+# rows with equal hashes are compared by value before they are merged
+DEDUPE_VERIFY = os.getenv("DEDUPE_VERIFY", "true").lower() in ("1", "true", "yes")
+# more duplicated hashes than this can't be broadcast, dropDuplicates is used instead
+DEDUPE_BROADCAST_ROWS = int(os.getenv("DEDUPE_BROADCAST_ROWS", 1000000))
+
+
 def get_temp_col(base: str) -> str:
     """Generates unique temp column names using UUID"""
     return f"{base}_{uuid4().hex[:8]}"
 
 
+def _hash_inputs(df, column):
+    value = F.col(f"`{column}`")
+    if isinstance(df.schema[column].dataType, (DoubleType, FloatType)):
+        # dropDuplicates treats -0.0 and 0.0, and all NaNs, as equal
+        value = (
+            F.when(F.isnan(value), F.lit(float("nan")))
+            .when(value == 0, F.lit(0.0))
+            .otherwise(value)
+        )
+    # a null doesn't change xxhash64, the flag tells (null, 1) from (1, null)
+    return [F.col(f"`{column}`").isNull(), value]
+
+
+def use_hash_dedupe(df, columns=None):
+    """Whether DEDUPE_MODE deduplicates these columns of df by hash."""
+    if DEDUPE_MODE != "auto":
+        return DEDUPE_MODE == "hash"
+    columns = columns or df.columns
+    if len(columns) >= DEDUPE_HASH_MIN_COLUMNS:
+        return True
+    # arrays are the expensive keys to shuffle and compare
+    return any(isinstance(df.schema[c].dataType, ArrayType) for c in columns)
+
+
+def hash_drop_duplicates(df, columns=None, verify=None):
+    """
+    dropDuplicates(columns) that shuffles 128 bits per row instead of whole rows.
+
+    Every row gets two xxhash64 values of the columns, only the hashes are aggregated to find
+    the hashes that occur more than once. Rows with a unique hash are kept as they are (anti
+    join against the broadcast duplicated hashes), only the rows of duplicated hashes are
+    deduplicated, by value when verify (defaults to DEDUPE_VERIFY, a hash collision then
+    keeps both rows) or else by hash. Without duplicates nothing wide is shuffled at all.
+    The input is evaluated three times (hashes, unique rows, duplicated rows).
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    verify = DEDUPE_VERIFY if verify is None else verify
+    if any(isinstance(df.schema[c].dataType, MapType) for c in columns):
+        return df.dropDuplicates(columns)
+
+    inputs = [expr for column in columns for expr in _hash_inputs(df, column)]
+    hash_1, hash_2 = get_temp_col("hash1"), get_temp_col("hash2")
+    keyed = df.withColumns(
+        {
+            hash_1: F.xxhash64(*inputs),
+            # a different first value gives an independent second hash
+            hash_2: F.xxhash64(F.lit("dedupe"), *inputs),
+        }
+    )
+    hashes = keyed.select(hash_1, hash_2)
+    duplicated = (
+        hashes.groupBy(hash_1, hash_2)
+        .count()
+        .filter(F.col("count") > 1)
+        .select(hash_1, hash_2)
+        .limit(DEDUPE_BROADCAST_ROWS + 1)
+        .collect()
+    )
+    if not duplicated:
+        return df
+    if len(duplicated) > DEDUPE_BROADCAST_ROWS:
+        print(
+            f"More than {DEDUPE_BROADCAST_ROWS} duplicated rows, using dropDuplicates"
+        )
+        return df.dropDuplicates(columns)
+
+    duplicated = F.broadcast(df.sparkSession.createDataFrame(duplicated, hashes.schema))
+    unique_rows = keyed.join(duplicated, [hash_1, hash_2], "left_anti")
+    repeated_rows = keyed.join(duplicated, [hash_1, hash_2], "left_semi")
+    repeated_rows = repeated_rows.dropDuplicates(
+        columns if verify else [hash_1, hash_2]
+    )
+    return unique_rows.unionByName(repeated_rows).drop(hash_1, hash_2)
+
+
+def iqr_bounds(q1, q3, factor=1.5):
+    """Rows outside [Q1 - factor * IQR, Q3 + factor * IQR] are outliers."""
+    iqr = q3 - q1
+    return q1 - factor * iqr, q3 + factor * iqr
+
+
 def remove_outlier_by_IQR(dataframe, columns, factor=1.5):
     """
     Detects and treats outliers using IQR for multiple variables in a PySpark DataFrame,
     Removes the whole row if any column has an outlier.
 
     :param dataframe: The input PySpark DataFrame
-    :param columns: A list of columns to apply IQR outlier treatment
+    :param columns: A column or a list of columns to apply IQR outlier treatment
     :param factor: The IQR factor to use for detecting outliers (default is 1.5)
     :return: The processed DataFrame with outliers treated
     """
+    if isinstance(columns, str):
+        columns = [columns]
+    # Q1 and Q3 of all columns in one pass
+    quantiles = dataframe.approxQuantile(columns, [0.25, 0.75], 0.01)
     conditions = []
-    for column in columns:
-        # Calculate Q1, Q3, and IQR
-        quantiles = dataframe.approxQuantile(column, [0.25, 0.75], 0.01)
-        q1, q3 = quantiles[0], quantiles[1]
-        iqr = q3 - q1
-
-        # Define the upper and lower bounds for outliers
-        lower_bound = q1 - factor * iqr
-        upper_bound = q3 + factor * iqr
-
+    for column, (q1, q3) in zip(columns, quantiles):
+        lower_bound, upper_bound = iqr_bounds(q1, q3, factor)
         conditions.append(F.col(column).between(lower_bound, upper_bound))
 
     return dataframe.where(reduce(lambda a, b: a & b, conditions))
 
 
-def normalize_column(df, column_name, method):
-    """
-    i) Normalizes a column in a PySpark DataFrame using specified normalization method
-    Supported methods: 'min-max', 'z-score', 'l1', 'l2', 'linf'
-    ii) It removes entire rows if any of the specified columns contains an outlier.
-    iii) I'm calculating stats multiple times as required(it seems this will cause multiple scans),
-        but a user will normalize a column only once (by any given method), so this is better,
-        same reason for not computing stats for every column at once
-    """
+def normalization_aggregates(column, method):
+    """Aggregate expressions (by stat name) a normalization method needs, None if unsupported."""
+    if method == "Min-Max":
+        return {"min": F.min(column), "max": F.max(column)}
+    elif method == "Z-score":
+        return {"mean": F.mean(column), "stddev": F.stddev(column)}
+    elif method == "L1 Norm":
+        return {"abs_sum": F.sum(F.abs(column))}
+    elif method == "L2 Norm":
+        return {"squared_sum": F.sum(F.pow(column, 2))}
+    elif method == "L inf Norm":
+        return {"abs_max": F.max(F.abs(column))}
+    return None
+
 
+def normalized_expression(column, method, stats):
+    """The normalized column given the stats of normalization_aggregates."""
     if method == "Min-Max":
-        stats = df.agg(
-            F.min(F.col(column_name)).alias("min"),
-            F.max(F.col(column_name)).alias("max"),
-        ).first()
         min_val = stats["min"]
         max_val = stats["max"]
 
         # Handle constant column
         if (max_val - min_val) == 0:
-            return df.withColumn(column_name, F.lit(0.0))
-        return df.withColumn(
-            column_name, (F.col(column_name) - min_val) / (max_val - min_val)
-        )
+            return F.lit(0.0)
+        return (column - min_val) / (max_val - min_val)
 
     elif method == "Z-score":
-        stats = df.agg(
-            F.mean(F.col(column_name)).alias("mean"),
-            F.stddev(F.col(column_name)).alias("stddev"),
-        ).first()
         mean_val = stats["mean"]
         stddev_val = stats["stddev"] or 0  # Handle null for constant column
 
         if stddev_val == 0:
-            return df.withColumn(column_name, F.lit(0.0))
-        return df.withColumn(column_name, (F.col(column_name) - mean_val) / stddev_val)
+            return F.lit(0.0)
+        return (column - mean_val) / stddev_val
 
     elif method == "L1 Norm":
-        abs_sum = df.agg(F.sum(F.abs(F.col(column_name)))).first()[0]
-        if abs_sum == 0:
-            return df.withColumn(column_name, F.lit(0.0))
-        return df.withColumn(column_name, F.col(column_name) / abs_sum)
+        if stats["abs_sum"] == 0:
+            return F.lit(0.0)
+        return column / stats["abs_sum"]
 
     elif method == "L2 Norm":
-        squared_sum = df.agg(F.sum(F.pow(F.col(column_name), 2))).first()[0]
-        if squared_sum == 0:
-            return df.withColumn(column_name, F.lit(0.0))
-        l2_norm = math.sqrt(squared_sum)
-        return df.withColumn(column_name, F.col(column_name) / l2_norm)
+        if stats["squared_sum"] == 0:
+            return F.lit(0.0)
+        return column / math.sqrt(stats["squared_sum"])
 
     elif method == "L inf Norm":
-        abs_max = df.agg(F.max(F.abs(F.col(column_name)))).first()[0]
-        if abs_max == 0:
-            return df.withColumn(column_name, F.lit(0.0))
-        return df.withColumn(column_name, F.col(column_name) / abs_max)
+        if stats["abs_max"] == 0:
+            return F.lit(0.0)
+        return column / stats["abs_max"]
 
-    else:
+
+def normalize_column(df, column_name, method):
+    """
+    i) Normalizes a column in a PySpark DataFrame using specified normalization method
+    Supported methods: 'min-max', 'z-score', 'l1', 'l2', 'linf'
+    ii) It removes entire rows if any of the specified columns contains an outlier.
+    iii) This runs one aggregation per call, the preprocessing planner
+        (utility.preprocessing_planner) batches the stats of several steps into one pass
+    """
+    aggregates = normalization_aggregates(F.col(column_name), method)
+    if aggregates is None:
         print(
             f"Unsupported normalization method: {method} for the column {column_name}"
         )
+        return
+
+    stats = df.agg(*[expr.alias(name) for name, expr in aggregates.items()]).first()
+    return df.withColumn(
+        column_name,
+        normalized_expression(F.col(column_name), method, stats.asDict()),
+    )
 
 
 def All_Column_Operations(df, step, numericCols, allCols):
@@ -149,6 +253,8 @@ def All_Column_Operations(df, step, numericCols, allCols):
         return imputer.fit(df).transform(df)
 
     elif step["operation"] == "Drop Duplicates":
+        if use_hash_dedupe(df):
+            return hash_drop_duplicates(df)
         return df.dropDuplicates()
 
     elif step["operation"] in [
@@ -205,13 +311,41 @@ def All_Column_Operations(df, step, numericCols, allCols):
         return df
 
 
+def label_encode(df, column):
+    """Replace the column by its StringIndexer index (the column must not contain nulls)."""
+    temp_col1 = get_temp_col("features")
+    indexer = StringIndexer(inputCol=column, outputCol=temp_col1)
+    df = indexer.fit(df).transform(df)
+    return df.withColumn(column, col(temp_col1)).drop(temp_col1)
+
+
+def one_hot_encode(df, column):
+    """
+    Replace the column by its one-hot vector (the column must not contain nulls).
+    this gives sparse vector, which if not compatible with ML model then have to encode in dense vectors
+    """
+    temp_col1 = get_temp_col("features")
+    # check if column is string type
+    if isinstance(df.schema[column].dataType, StringType):
+        indexer = StringIndexer(inputCol=column, outputCol=temp_col1)
+        df = indexer.fit(df).transform(df)
+        df = df.withColumn(column, col(temp_col1)).drop(temp_col1)
+
+    encoder = OneHotEncoder(inputCol=column, outputCol=temp_col1)
+    df = encoder.fit(df).transform(df)
+    return df.withColumn(column, col(temp_col1)).drop(temp_col1)
+
+
 def Column_Operations(df, step):
     column = step["column"]
     if step["operation"] == "Drop Null":
         return df.dropna(subset=column)
 
     elif step["operation"] == "Drop Duplicates":
-        return df.dropDuplicates(subset=column)
+        if use_hash_dedupe(df, [column]):
+            return hash_drop_duplicates(df, [column])
+        # subset must be a list, a single column name is rejected
+        return df.dropDuplicates(subset=[column])
 
     elif step["operation"] == "Drop Column":
         return df.drop(column)
@@ -232,7 +366,7 @@ def Column_Operations(df, step):
         return df.fillna("Unknown", subset=column)
 
     elif step["operation"] == "Fill False":
-        df = df.fillna(False, subset=column)
+        return df.fillna(False, subset=column)
 
     elif step["operation"] in [
         "L1 Norm",
@@ -260,29 +394,14 @@ def Column_Operations(df, step):
         if df.filter(col(column).isNull()).count() > 0:
             print(f"error: Null values found in {column} column for Label Encoding")
             return df
-
-        temp_col1 = get_temp_col("features")
-        indexer = StringIndexer(inputCol=column, outputCol=temp_col1)
-        df = indexer.fit(df).transform(df)
-        return df.withColumn(column, col(temp_col1)).drop(temp_col1)
+        return label_encode(df, column)
 
     elif step["operation"] == "One Hot Encoding":
-        # this gives sparse vector, which if not compatible with ML model then have to encode in dense vectors
 
         if df.filter(col(column).isNull()).count() > 0:
             print(f"error: Null values found in {column} column for One Hot Encoding")
             return df
-
-        temp_col1 = get_temp_col("features")
-        # check if column is string type
-        if isinstance(df.schema[column].dataType, StringType):
-            indexer = StringIndexer(inputCol=column, outputCol=temp_col1)
-            df = indexer.fit(df).transform(df)
-            df = df.withColumn(column, col(temp_col1)).drop(temp_col1)
-
-        encoder = OneHotEncoder(inputCol=column, outputCol=temp_col1)
-        df = encoder.fit(df).transform(df)
-        return df.withColumn(column, col(temp_col1)).drop(temp_col1)
+        return one_hot_encode(df, column)
 
     else:
         print(
@@ -0,0 +1,198 @@
+import os
+import math
+import heapq
+import random
+from operator import itemgetter
+from dotenv import load_dotenv
+from pyspark.sql import Window
+from pyspark.sql import functions as F
+from pyspark.sql.types import DoubleType, StructField, StructType
+
+load_dotenv()
+
+"""
+Uniform row sampling for QPD (quality preserving dataset) creation without sorting the
+whole dataset like df.orderBy(rand()).limit(n).
+
+    bernoulli   : df.sample() with a fraction sized from the row count so that it keeps at
+                  least n rows with high probability, then an exact-n trim of that small sample.
+                  A sample that still falls short is drawn again with a larger fraction
+    reservoir   : per-partition reservoir (k smallest random keys) in one pass, then the n
+                  smallest keys of the candidates
+    stratified  : sampleBy() on the strata columns (e.g. the output columns) with
+                  proportional (largest remainder) allocation, then an exact trim per stratum
+
+All methods take a seed, the same seed on the same data gives the same subset. Samples kept
+in memory are appended to the cached list given to sample_rows, the caller unpersists them
+once the subset is written.
+"""
+
+QPD_SAMPLING_METHOD = os.getenv("QPD_SAMPLING_METHOD", "bernoulli")
+QPD_SAMPLING_SEED = os.getenv("QPD_SAMPLING_SEED")
+# more strata than this (e.g. a continuous target) falls back to bernoulli sampling
+QPD_MAX_STRATA = int(os.getenv("QPD_MAX_STRATA", 1000))
+# draws with a larger fraction when a bernoulli sample has fewer than n rows
+QPD_SAMPLE_RETRIES = int(os.getenv("QPD_SAMPLE_RETRIES", 3))
+SAMPLING_METHODS = ["bernoulli", "reservoir", "stratified"]
+KEY_COLUMN = "__qpd_sample_key"
+
+
+def oversampling_fraction(num_points, num_rows):
+    """
+    Bernoulli fraction whose sample has at least num_points of num_rows rows with high
+    probability (mean + 3 standard deviations + a margin for small n).
+    """
+    if num_rows <= 0:
+        return 1.0
+    return min(1.0, (num_points + 3 * math.sqrt(num_points) + 10) / num_rows)
+
+
+def _trim(df, num_points, seed):
+    # the sample is small, ordering it is cheap (top-k, no full sort)
+    return df.orderBy(F.rand(seed)).limit(num_points)
+
+
+def proportional_allocation(num_points, counts):
+    """
+    {stratum: rows} proportional to counts and summing to exactly num_points (at most the
+    total): every stratum gets the floor of its share, the rows left go to the largest
+    remainders.
+    """
+    num_rows = sum(counts.values())
+    num_points = min(num_points, num_rows)
+    if num_rows <= 0:
+        return {stratum: 0 for stratum in counts}
+    shares = {
+        stratum: num_points * count / num_rows for stratum, count in counts.items()
+    }
+    allocation = {stratum: math.floor(share) for stratum, share in shares.items()}
+    left = num_points - sum(allocation.values())
+    by_remainder = sorted(
+        shares, key=lambda stratum: shares[stratum] - allocation[stratum], reverse=True
+    )
+    for stratum in by_remainder[:left]:
+        allocation[stratum] += 1
+    return allocation
+
+
+def bernoulli_sample(df, num_points, seed=None, num_rows=None, cached=None):
+    num_rows = df.count() if num_rows is None else num_rows
+    if num_points >= num_rows:
+        return df
+    fraction = oversampling_fraction(num_points, num_rows)
+    for attempt in range(QPD_SAMPLE_RETRIES + 1):
+        # the sample is small, kept in memory for the size check and the trim
+        sampled = df.sample(withReplacement=False, fraction=fraction, seed=seed)
+        sampled = sampled.persist()
+        found = sampled.count()
+        if found >= num_points or fraction >= 1.0 or attempt == QPD_SAMPLE_RETRIES:
+            break
+        sampled.unpersist()
+        print(
+            f"Bernoulli sample has {found} of {num_points} rows, drawing it again "
+            f"with a larger fraction"
+        )
+        # scaled by the shortfall, with the same margin as the first fraction
+        wanted = num_points + 3 * math.sqrt(num_points) + 10
+        fraction = min(1.0, fraction * (wanted / found if found else 2))
+    if found < num_points:
+        print(f"Only {found} rows could be sampled, {num_points} were asked for")
+    if cached is not None:
+        cached.append(sampled)
+    return _trim(sampled, num_points, seed)
+
+
+def reservoir_sample(df, num_points, seed=None):
+    """One pass over every partition, at most num_points rows per partition are kept."""
+
+    def partition_reservoir(index, rows):
+        rng = random.Random(None if seed is None else seed + index)
+        keyed = ((rng.random(), row) for row in rows)
+        for key, row in heapq.nsmallest(num_points, keyed, key=itemgetter(0)):
+            yield (key,) + tuple(row)
+
+    schema = StructType(
+        [StructField(KEY_COLUMN, DoubleType(), False)] + df.schema.fields
+    )
+    candidates = df.sparkSession.createDataFrame(
+        df.rdd.mapPartitionsWithIndex(partition_reservoir), schema
+    )
+    return candidates.orderBy(KEY_COLUMN).limit(num_points).drop(KEY_COLUMN)
+
+
+def _strata_key(columns):
+    return F.concat_ws(
+        "\u0001",
+        *[F.coalesce(F.col(f"`{c}`").cast("string"), F.lit("<null>")) for c in columns],
+    )
+
+
+def stratified_sample(
+    df, num_points, strata_columns, seed=None, num_rows=None, cached=None
+):
+    """Proportional allocation, the strata keep num_points rows in total."""
+    keyed = df.withColumn(KEY_COLUMN, _strata_key(strata_columns))
+    counts = {
+        row[KEY_COLUMN]: row["count"]
+        for row in keyed.groupBy(KEY_COLUMN).count().limit(QPD_MAX_STRATA + 1).collect()
+    }
+    if len(counts) > QPD_MAX_STRATA:
+        print(
+            f"More than {QPD_MAX_STRATA} strata in {strata_columns}, using bernoulli sampling"
+        )
+        return bernoulli_sample(df, num_points, seed, num_rows, cached)
+
+    num_rows = sum(counts.values())
+    if num_points >= num_rows:
+        return df
+    allocation = proportional_allocation(num_points, counts)
+    fractions = {
+        stratum: oversampling_fraction(allocation[stratum], count)
+        for stratum, count in counts.items()
+        if allocation[stratum] > 0
+    }
+    sampled = keyed.sampleBy(KEY_COLUMN, fractions, seed)
+
+    limits = sampled.sparkSession.createDataFrame(
+        list(allocation.items()), [KEY_COLUMN, "__qpd_stratum_limit"]
+    )
+    rank = F.row_number().over(Window.partitionBy(KEY_COLUMN).orderBy(F.rand(seed)))
+    return (
+        sampled.withColumn("__qpd_rank", rank)
+        .join(F.broadcast(limits), KEY_COLUMN)
+        .filter(F.col("__qpd_rank") <= F.col("__qpd_stratum_limit"))
+        .drop(KEY_COLUMN, "__qpd_rank", "__qpd_stratum_limit")
+    )
+
+
+def sample_rows(
+    df,
+    num_points,
+    method=None,
+    seed=None,
+    num_rows=None,
+    strata_columns=None,
+    cached=None,
+):
+    """
+    num_points uniformly sampled rows of df (all rows if it is smaller).
+    method: bernoulli / reservoir / stratified (defaults to QPD_SAMPLING_METHOD),
+    seed defaults to QPD_SAMPLING_SEED, num_rows avoids counting the dataset again.
+    cached: list the persisted intermediate samples are appended to, to unpersist later
+    """
+    method = method or QPD_SAMPLING_METHOD
+    if seed is None and QPD_SAMPLING_SEED:
+        seed = int(QPD_SAMPLING_SEED)
+    num_points = int(num_points)
+
+    if method == "reservoir":
+        return reservoir_sample(df, num_points, seed)
+    if method == "stratified":
+        if strata_columns:
+            return stratified_sample(
+                df, num_points, strata_columns, seed, num_rows, cached
+            )
+        print("No strata columns given, using bernoulli sampling")
+    elif method != "bernoulli":
+        print(f"Unknown sampling method {method}, using bernoulli sampling")
+    return bernoulli_sample(df, num_points, seed, num_rows, cached)
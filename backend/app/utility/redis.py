@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 import redis.asyncio as redis
+import redis as redis_sync
 
 load_dotenv()
 
@@ -29,3 +30,12 @@ redis_pubsub2 = redis.Redis(
     decode_responses=True,  # Automatically decode responses to strings
     db=0,  # Use database 0 for pubsub operations
 )
+
+# Blocking connection for code running outside the event loop (training workers)
+redis_sync_client = redis_sync.Redis(
+    host=os.environ.get("REDIS_URL", "localhost"),
+    port=int(os.environ.get("REDIS_PORT", 6380)),
+    password=os.environ.get("REDIS_PASSWORD", "123456"),
+    decode_responses=True,  # Automatically decode responses to strings
+    db=0,  # Use database 0 for key-value operations
+)
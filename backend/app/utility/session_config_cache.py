@@ -0,0 +1,106 @@
+import os
+import json
+import asyncio
+from dotenv import load_dotenv
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+from utility import federated_client
+from utility.db import get_db
+from utility.redis import redis_sync_client
+from crud.trainings_crud import get_training_details
+
+load_dotenv()
+
+"""
+Redis cache of the federated session config (the "federated_info" of /v2/get-federated-session).
+
+The config doesn't change during a session, so it is looked up once and shared by the API
+process and the training workers through the key session_config:{session_id}.
+Lookup order: redis -> current_trainings table (written by /initiate-model) -> federated server.
+Entries expire after SESSION_CONFIG_TTL seconds, invalidate_session_config drops one explicitly.
+A redis outage only costs the round-trips, lookups then go to the DB / server directly.
+"""
+
+SESSION_CONFIG_TTL = int(os.getenv("SESSION_CONFIG_TTL", 6 * 60 * 60))
+
+
+def _key(session_id):
+    return f"session_config:{session_id}"
+
+
+def _from_redis(session_id):
+    try:
+        cached = redis_sync_client.get(_key(session_id))
+    except RedisError as e:
+        print(f"Session config cache unavailable: {e}")
+        return None
+    return json.loads(cached) if cached else None
+
+
+def _from_db(session_id):
+    db = next(get_db())
+    try:
+        record = get_training_details(db, int(session_id))
+    except (SQLAlchemyError, ValueError):
+        return None
+    finally:
+        db.close()
+    if "error" in record:
+        return None
+    return record["training_details"]
+
+
+def _from_server(session_id, client_token):
+    response = federated_client.get(
+        federated_client.server_url(f"/v2/get-federated-session/{session_id}"),
+        headers=federated_client.auth_headers(client_token),
+    )
+    response.raise_for_status()
+    return response.json().get("federated_info")
+
+
+def cache_session_config(session_id, federated_info):
+    try:
+        redis_sync_client.set(
+            _key(session_id), json.dumps(federated_info), ex=SESSION_CONFIG_TTL
+        )
+    except RedisError as e:
+        print(f"Could not cache session config of {session_id}: {e}")
+
+
+def get_session_config(session_id, client_token, refresh=False):
+    """
+    federated_info of a session, fetched from the server at most once per TTL.
+
+    Args:
+        refresh: skip redis and the DB, re-read the config from the server
+    Returns:
+        dict or None when the server has no config for the session
+    """
+    if not refresh:
+        federated_info = _from_redis(session_id)
+        if federated_info:
+            return federated_info
+        federated_info = _from_db(session_id)
+        if federated_info:
+            cache_session_config(session_id, federated_info)
+            return federated_info
+
+    federated_info = _from_server(session_id, client_token)
+    if federated_info:
+        cache_session_config(session_id, federated_info)
+    return federated_info
+
+
+def invalidate_session_config(session_id):
+    try:
+        redis_sync_client.delete(_key(session_id))
+    except RedisError as e:
+        print(f"Could not invalidate session config of {session_id}: {e}")
+
+
+async def aget_session_config(session_id, client_token, refresh=False):
+    """Async variant of get_session_config for the event loop (runs in a thread)."""
+    return await asyncio.to_thread(
+        get_session_config, session_id, client_token, refresh
+    )
@@ -3,31 +3,21 @@ import findspark
 findspark.init()
 from pyspark.sql import SparkSession
 from dotenv import load_dotenv
-from pyspark.sql.functions import (
-    col,
-    size,
-    count,
-    expr,
-    mean,
-    stddev,
-    min,
-    max,
-    rand,
-    lit,
-    rank,
-    when,
-)
-from pyspark.sql.types import NumericType, StringType, ArrayType
 import numpy as np
-from utility.processing_helper_functions import All_Column_Operations, Column_Operations
+from utility.preprocessing_planner import run_operations
 from utility.hdfs_services import HDFSServiceManager
+from utility.dataset_overview import compute_column_stats
+from utility.dataset_ingest import ingest_csv, write_parquet
+from utility.qpd_sampling import sample_rows
+from utility.parquet_footer import footer_overview
+from utility import local_engine
 import threading
 import time
 import os
-import time
 import json
 import uuid
 from datetime import date, datetime
+from contextlib import contextmanager
 
 load_dotenv()
 hdfs_client = HDFSServiceManager()
@@ -41,6 +31,18 @@ RECENTLY_UPLOADED_DATASETS_DIR = os.getenv("RECENTLY_UPLOADED_DATASETS_DIR")
 SPARK_MASTER_URL = os.getenv("SPARK_MASTER_URL")
 BUCKET_NAME = os.getenv("BUCKET_NAME")  # "qpd-data"
 S3_PREFIX = os.getenv("S3_PREFIX")  # "temp"
+# seconds an unused session is kept alive, 0 stops it when the last user leaves
+SPARK_IDLE_TIMEOUT = float(os.getenv("SPARK_IDLE_TIMEOUT", 900))
+# FAIR scheduler pools per job class, "name:weight:minShare" separated by commas
+SPARK_SCHEDULER_POOLS = os.getenv(
+    "SPARK_SCHEDULER_POOLS", "ingest:2:1,preprocess:1:0,overview:3:1,qpd:1:0"
+)
+SPARK_POOLS_FILE = os.path.join("data", "spark_fairscheduler.xml")
+SPARK_WARMUP_ON_STARTUP = os.getenv("SPARK_WARMUP_ON_STARTUP", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
 
 # to see the docker hostname if running inside the docker container
 # import socket
@@ -78,11 +80,76 @@ def serialize_for_json(obj):
         return obj
 
 
+def log_phase_timings(label, timings):
+    """Print how long each phase (in insertion order) of a dataset job took."""
+    total = sum(timings.values())
+    phases = ", ".join(f"{phase}: {seconds:.2f}s" for phase, seconds in timings.items())
+    print(f"{label} timings -> {phases} (total: {total:.2f}s)")
+
+
+def _write_pools_file():
+    """Allocation file of the FAIR scheduler, pools from SPARK_SCHEDULER_POOLS."""
+    pools = []
+    for entry in SPARK_SCHEDULER_POOLS.split(","):
+        if not entry.strip():
+            continue
+        name, weight, min_share = (entry.strip().split(":") + ["1", "0"])[:3]
+        pools.append(
+            f'  <pool name="{name}">\n'
+            f"    <schedulingMode>FAIR</schedulingMode>\n"
+            f"    <weight>{int(weight)}</weight>\n"
+            f"    <minShare>{int(min_share)}</minShare>\n"
+            f"  </pool>\n"
+        )
+    os.makedirs(os.path.dirname(SPARK_POOLS_FILE), exist_ok=True)
+    with open(SPARK_POOLS_FILE, "w") as f:
+        f.write(
+            f'<?xml version="1.0"?>\n<allocations>\n{"".join(pools)}</allocations>\n'
+        )
+    return os.path.abspath(SPARK_POOLS_FILE)
+
+
+@contextmanager
+def spark_job(spark, pool, description, group_id=None):
+    """
+    Run the Spark jobs of the block in a scheduler pool, tagged with a job group and
+    description (visible in the Spark UI, cancellable with cancelJobGroup).
+    Without group_id an enclosing job group is kept, otherwise a new one is created.
+    Yields the job group id.
+    """
+    sc = spark.sparkContext
+    keys = [
+        "spark.scheduler.pool",
+        "spark.jobGroup.id",
+        "spark.job.description",
+        "spark.job.interruptOnCancel",
+    ]
+    # local properties are per thread, restore them for the caller afterwards
+    previous = {key: sc.getLocalProperty(key) for key in keys}
+    group_id = group_id or previous["spark.jobGroup.id"] or f"{pool}-{uuid.uuid4().hex}"
+    sc.setLocalProperty("spark.scheduler.pool", pool)
+    sc.setJobGroup(group_id, description, interruptOnCancel=True)
+    try:
+        yield group_id
+    finally:
+        for key, value in previous.items():
+            sc.setLocalProperty(key, value)
+
+
+def report_progress(progress, phase, fraction):
+    """Tell the caller (e.g. a dataset job) which phase started, progress may be None."""
+    if progress is not None:
+        progress(phase, fraction)
+
+
 class SparkSessionManager:
     """
     Thread-safe singleton SparkSession manager with reference counting.
     Creates a new SparkSession object if not already created, and returns an active session if there is (for threads).
     This is thread safe implementation, and not process safe (pyspark limitation).
+
+    The session is kept warm for SPARK_IDLE_TIMEOUT seconds after the last user leaves
+    (0 stops it right away), so back to back requests don't pay the JVM / executor startup.
     """
 
     # Class variables
@@ -91,6 +158,11 @@ class SparkSessionManager:
     _session = None
     _reference_count = 0
     _config_lock = threading.Lock()
+    _idle_timer = None
+    _created_at = None
+    _last_release = None
+    _sessions_started = 0
+    _restarts = 0
 
     def __new__(cls, app_name="default_app", master=SPARK_MASTER_URL):
         with cls._lock:
@@ -100,31 +172,69 @@ class SparkSessionManager:
                 cls._instance.master = master
             return cls._instance
 
+    @staticmethod
+    def _is_alive(session):
+        # the context is gone when the driver was stopped or lost its cluster
+        return session is not None and session.sparkContext._jsc is not None
+
     # Context Manager for SparkSession creation
     def __enter__(self):
-        with self._config_lock:
+        cls = type(self)
+        with cls._config_lock:
+            with cls._lock:
+                cls._reference_count += 1
+                if cls._idle_timer is not None:
+                    cls._idle_timer.cancel()
+                    cls._idle_timer = None
             # Double-checked locking pattern
-            if self._session is None:
-                self._session = (
+            if not self._is_alive(cls._session):
+                if cls._session is not None:
+                    print("Spark session lost, restarting...")
+                    cls._restarts += 1
+                cls._session = (
                     SparkSession.builder.master(self.master)
                     .appName(self.app_name)
+                    .config("spark.scheduler.mode", "FAIR")
+                    .config("spark.scheduler.allocation.file", _write_pools_file())
                     .getOrCreate()
                 )
+                cls._created_at = time.time()
+                cls._sessions_started += 1
                 print("Spark session created...")
                 # # for standalone cluster (will not use YARN as resource manager)
                 # spark = SparkSession.builder.remote("sc://localhost:8080").getOrCreate()
-
-        with self._lock:
-            self._reference_count += 1
-        return self._session
+        return cls._session
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        with self._lock:
-            self._reference_count -= 1
-            if self._reference_count == 0:
-                self._session.stop()
-                self._session = None
-                print("Spark session stopped...")
+        cls = type(self)
+        with cls._lock:
+            cls._reference_count -= 1
+            if cls._reference_count > 0:
+                return
+            cls._last_release = time.time()
+            if SPARK_IDLE_TIMEOUT <= 0:
+                cls._stop_session()
+                return
+            cls._idle_timer = threading.Timer(SPARK_IDLE_TIMEOUT, cls._stop_if_idle)
+            cls._idle_timer.daemon = True
+            cls._idle_timer.start()
+
+    @classmethod
+    def _stop_session(cls):
+        # caller holds cls._lock
+        if cls._session is not None:
+            cls._session.stop()
+            cls._session = None
+            cls._created_at = None
+            print("Spark session stopped...")
+
+    @classmethod
+    def _stop_if_idle(cls):
+        with cls._lock:
+            if cls._reference_count == 0 and cls._idle_timer is not None:
+                cls._idle_timer = None
+                print(f"Spark session idle for {SPARK_IDLE_TIMEOUT}s")
+                cls._stop_session()
 
     @classmethod
     def get_active_session(cls):
@@ -138,213 +248,77 @@ class SparkSessionManager:
         with cls._lock:
             return cls._session is not None
 
+    @classmethod
+    def get_session_metrics(cls):
+        """Age, users and restart counts of the shared session."""
+        with cls._lock:
+            now = time.time()
+            return {
+                "active": cls._session is not None,
+                "age_seconds": now - cls._created_at if cls._created_at else None,
+                "idle_seconds": (
+                    now - cls._last_release
+                    if cls._session is not None and cls._reference_count == 0
+                    else 0
+                ),
+                "reference_count": cls._reference_count,
+                "sessions_started": cls._sessions_started,
+                "restarts": cls._restarts,
+                "idle_timeout": SPARK_IDLE_TIMEOUT,
+            }
+
+    def warmup(self):
+        """Start the session with a tiny job, so the first request finds the executors up."""
+        t1 = time.time()
+        with self as spark:
+            with spark_job(spark, "overview", "Warmup"):
+                spark.range(1).count()
+        print(f"Spark session warmed up in {time.time() - t1:.2f}s")
+
     def __del__(self):
         # Safety net for resource cleanup
-        if self._session is not None:
-            self._session.stop()
+        if type(self)._session is not None:
+            type(self)._session.stop()
 
     def spark_session_cleanup(self):
         """Stop the spark session and reset the reference count."""
-        with self._lock:
-            self._reference_count = 0
-            self._session.stop()
-            self._session = None
-
-    async def _get_overview(self, df, filename=None, tmp_deletion=True):
+        cls = type(self)
+        with cls._lock:
+            if cls._idle_timer is not None:
+                cls._idle_timer.cancel()
+                cls._idle_timer = None
+            cls._reference_count = 0
+            cls._stop_session()
+
+    async def _get_overview(
+        self, df, filename=None, tmp_deletion=True, exact_distinct=None
+    ):
         """
         Get an overview of the dataset given pyspark dataframe.
+        All column statistics come from a fixed number of scans (see utility.dataset_overview),
+        distinct counts are approximate unless exact_distinct / OVERVIEW_EXACT_DISTINCT is set.
         """
         if not df:
             return {"message": "Dataset not found."}
 
-        overview = None
-        column_stats = []
-        # Get the first 5 rows of the dataframe and store it
-        try:
-            dataset_head = df.limit(5).toPandas().to_dict(orient="records")
-            # Serialize datetime objects to strings for JSON compatibility
-            dataset_head = serialize_for_json(dataset_head)
-        except Exception as e:
-            dataset_head = []
-        for column in df.columns:
+        with spark_job(df.sparkSession, "overview", f"Overview of {filename}"):
+            # Get the first 5 rows of the dataframe and store it
             try:
-                column_expr = col(
-                    f"`{column}`"
-                )  # useful if col name contains special characters or spaces
-                column_type = df.schema[column].dataType
-                num_rows = df.select(column_expr).count()
-                stats = {"name": column, "type": str(column_type), "entries": num_rows}
-
-                # Common statistics for all columns
-                stats["nullCount"] = df.filter(column_expr.isNull()).count()
-
-                # Column specific statistics
-                NumberTypes = [
-                    "IntegerType()",
-                    "DoubleType()",
-                    "FloatType()",
-                    "LongType()",
-                ]
-                if str(column_type) in NumberTypes:
-                    summary = df.select(
-                        mean(column_expr).alias("mean"),
-                        stddev(column_expr).alias("stddev"),
-                        min(column_expr).alias("min"),
-                        max(column_expr).alias("max"),
-                    ).first()
-                    stats.update(
-                        {
-                            "mean": summary["mean"],
-                            "stddev": summary["stddev"],
-                            "min": summary["min"],
-                            "max": summary["max"],
-                            "uniqueCount": df.select(column_expr).distinct().count(),
-                        }
-                    )
-
-                    # Quartile calculation
-                    quantiles = df.approxQuantile(column, [0.25, 0.5, 0.75], 0.05)
-                    stats["quartiles"] = {
-                        "Q1": quantiles[0],
-                        "median": quantiles[1],
-                        "Q3": quantiles[2],
-                        "IQR": quantiles[2] - quantiles[0],
-                    }
-
-                    # Histogram binning
-                    min_val = summary["min"]
-                    max_val = summary["max"]
-                    bin_width = (max_val - min_val) / 10
-                    bins = [min_val + i * bin_width for i in range(11)]
-                    histogram = (
-                        df.select(column_expr).rdd.flatMap(lambda x: x).histogram(bins)
-                    )
-                    stats["histogram"] = {"bins": histogram[0], "counts": histogram[1]}
-
-                # String columns
-                elif "StringType" in str(column_type):
-                    stats["uniqueCount"] = df.select(column_expr).distinct().count()
-
-                    # Frequency distribution for top 10 categories
-                    top_categories = (
-                        df.groupBy(column_expr)
-                        .count()
-                        .orderBy(col("count").desc())
-                        .limit(10)
-                        .collect()
-                    )
-
-                    stats["topCategories"] = [
-                        {
-                            "value": (
-                                row[column][:50] + "..."
-                                if isinstance(row[column], str)
-                                and len(row[column]) > 50
-                                else row[column]
-                            ),
-                            "count": row["count"],
-                        }
-                        for row in top_categories
-                    ]
-
-                elif "ArrayType" in str(column_type):
-                    # Get first non-null entry
-                    row = (
-                        df.select(column_expr)
-                        .filter(col(column).isNotNull())
-                        .limit(1)
-                        .first()
-                    )
-                    arr = row[column] if row else None
-
-                    # Infer shape
-                    shape = []
-                    temp = arr
-                    while isinstance(temp, list):
-                        shape.append(len(temp))
-                        if len(temp) == 0:
-                            break
-                        temp = temp[0] if isinstance(temp[0], list) else None
-                    stats["Shape"] = tuple(shape) if shape else None
-
-                    # Length Distribution (top level)
-                    length_stats = (
-                        df.select(size(col(column)).alias("len"))
-                        .summary("count", "min", "max", "mean", "stddev")
-                        .toPandas()
-                        .set_index("summary")
-                        .to_dict()["len"]
-                    )
-
-                    stats["LengthStats"] = {
-                        "min": int(length_stats.get("min", 0)),
-                        "max": int(length_stats.get("max", 0)),
-                        "mean": float(length_stats.get("mean", 0)),
-                        "std": float(length_stats.get("stddev", 0)),
-                    }
-
-                    # Check if inner elements are numeric — if so, calculate value statistics
-                    def flatten_all(x):
-                        """Recursively flatten list to 1D"""
-                        if isinstance(x, list):
-                            for i in x:
-                                yield from flatten_all(i)
-                        else:
-                            yield x
-
-                    if row and isinstance(row[column], list):
-                        flat_sample = list(flatten_all(row[column]))
-                        if flat_sample and isinstance(flat_sample[0], (int, float)):
-                            # Only compute value-level stats if numeric
-                            # Use RDD for optimized distributed stat collection
-                            rdd = (
-                                df.select(column_expr)
-                                .rdd.filter(lambda row: row[column] is not None)
-                                .flatMap(
-                                    lambda row: (
-                                        flatten_all(row[column]) if row[column] else []
-                                    )
-                                )
-                            )
-
-                            try:
-                                num_samples = int(np.minimum(num_rows * 0.2, 100000))
-                                stats["sampleSize"] = (
-                                    f"{int(np.minimum(num_rows * 0.2, 100000))} samples"
-                                )
-                                sampled = rdd.take(num_samples)  # Safe sample
-
-                                if sampled:
-                                    arr_np = np.array(sampled)
-                                    stats["valueStats"] = {
-                                        "min": float(np.min(arr_np)),
-                                        "max": float(np.max(arr_np)),
-                                        "mean": float(np.mean(arr_np)),
-                                        "std": float(np.std(arr_np)),
-                                        "median": float(np.median(arr_np)),
-                                        "sparsity": float(
-                                            np.mean(arr_np == 0)
-                                        ),  # Fraction of zeros
-                                    }
-                            except Exception as e:
-                                stats["valueStats"] = None
-                        else:
-                            stats["valueStats"] = "Not numeric"
-                    else:
-                        stats["valueStats"] = "Not detected"
-
-                # Add the column stats to the list
-                column_stats.append(stats)
+                dataset_head = df.limit(5).toPandas().to_dict(orient="records")
+                # Serialize datetime objects to strings for JSON compatibility
+                dataset_head = serialize_for_json(dataset_head)
             except Exception as e:
-                print(f"Error processing column {column}: {e}")
-                continue
+                dataset_head = []
+
+            num_rows, column_stats = compute_column_stats(df, exact_distinct)
 
         # Dataset overview Dict
         overview = {
-            "numRows": df.count(),
+            "numRows": num_rows,
             "numColumns": len(df.columns),
             "columnStats": column_stats,
             "datasetHead": dataset_head,
+            "statsLevel": "full",
         }
 
         # Serialize the entire overview to ensure JSON compatibility
@@ -365,15 +339,110 @@ class SparkSessionManager:
                 f"Warning: Failed to delete {RECENTLY_UPLOADED_DATASETS_DIR}/{filename} from HDFS: {e}"
             )
 
-    async def create_new_dataset(self, filename, filetype):
+    @staticmethod
+    def _hdfs_size(path):
+        try:
+            return hdfs_client.get_content_size(path)
+        except Exception as e:
+            print(f"Size of {path} unknown: {e}")
+            return None
+
+    @staticmethod
+    def _uploaded_size(filename):
+        return SparkSessionManager._hdfs_size(
+            f"{RECENTLY_UPLOADED_DATASETS_DIR}/{filename}"
+        )
+
+    async def _create_new_dataset_locally(self, filename, filetype, progress=None):
+        """create_new_dataset on the local engine (utility.local_engine), without Spark."""
+        timings = {}
+        source_path = f"{RECENTLY_UPLOADED_DATASETS_DIR}/{filename}"
+        report_progress(progress, "read", 0.1)
+        t1 = time.time()
+        if filetype == "csv":
+            write_filename = filename.replace(".csv", ".parquet")
+            df = local_engine.read_csv(source_path)
+        elif filetype == "parquet":
+            write_filename = filename
+            df = local_engine.read_parquet(source_path)
+        else:
+            print("Unsupported file type for creating new dataset.")
+            return {"message": "Unsupported file type."}
+        timings["read"] = time.time() - t1
+
+        report_progress(progress, "write", 0.4)
+        t1 = time.time()
+        local_engine.write_parquet(df, f"{HDFS_RAW_DATASETS_DIR}/{write_filename}")
+        timings["write"] = time.time() - t1
+        print(
+            f"Successfully created new dataset in HDFS: {HDFS_RAW_DATASETS_DIR}/{write_filename}"
+        )
+
+        report_progress(progress, "overview", 0.7)
+        t1 = time.time()
+        overview = serialize_for_json(local_engine.compute_overview(df))
+        await self.delete_file_from_hdfs(filename)
+        timings["overview"] = time.time() - t1
+        log_phase_timings(f"create_new_dataset {filename} (local engine)", timings)
+        overview["filename"] = write_filename
+        return overview
+
+    async def _preprocess_data_locally(
+        self, directory, filename, operations, progress=None
+    ):
+        """preprocess_data on the local engine (utility.local_engine), without Spark."""
+        timings = {}
+        report_progress(progress, "read", 0.05)
+        t1 = time.time()
+        df = local_engine.read_parquet(f"{directory}/{filename}")
+        timings["read"] = time.time() - t1
+
+        report_progress(progress, "transform", 0.1)
+        t1 = time.time()
+        df = local_engine.run_operations(df, operations)
+        timings["transform"] = time.time() - t1
+
+        newfilename = f"{filename}_{uuid.uuid4().hex}.parquet"
+        report_progress(progress, "write", 0.4)
+        t1 = time.time()
+        local_engine.write_parquet(df, f"{HDFS_PROCESSED_DATASETS_DIR}/{newfilename}")
+        timings["write"] = time.time() - t1
+        print(
+            f"Preprocessed dataset saved to: {HDFS_PROCESSED_DATASETS_DIR}/{newfilename}"
+        )
+
+        report_progress(progress, "overview", 0.8)
+        t1 = time.time()
+        overview = serialize_for_json(local_engine.compute_overview(df))
+        timings["overview"] = time.time() - t1
+        log_phase_timings(f"preprocess_data {filename} (local engine)", timings)
+        overview["filename"] = newfilename
+        return overview
+
+    async def create_new_dataset(
+        self, filename, filetype, job_id=None, progress=None, on_written=None
+    ):
         """
         Move the newly uploaded dataset to the HDFS raw datasets directory.
+        job_id is used as Spark job group (see utility.dataset_jobs), progress(phase, fraction)
+        is called when a phase starts.
+        on_written: awaited with the Parquet footer overview (utility.parquet_footer) as soon
+        as the dataset is written, before the full overview is computed.
+        Small uploads (see utility.local_engine.use_local_engine) are handled without Spark.
         Notes:
         - ensure no same file name exists in the tmpuploads directory, or in uploads directory
         """
         try:
             print(f"in create_new_dataset {filename} is {filetype}")
-            with SparkSessionManager() as spark:
+            input_bytes = self._uploaded_size(filename)
+            if local_engine.use_local_engine(input_bytes):
+                return await self._create_new_dataset_locally(
+                    filename, filetype, progress
+                )
+            timings = {}
+            with SparkSessionManager() as spark, spark_job(
+                spark, "ingest", f"Create dataset {filename}", group_id=job_id
+            ):
                 # later create a switch case based on file type
 
                 print("reaching 1")
@@ -382,18 +451,18 @@ class SparkSessionManager:
                         # f"Reading CSV file: {HDFS_FILE_READ_URL}/{RECENTLY_UPLOADED_DATASETS_DIR}/{filename}"
                         f"Reading CSV file: {HDFS_FILE_READ_URL}/{RECENTLY_UPLOADED_DATASETS_DIR}/{filename}"
                     )
-                    df = spark.read.csv(
-                        f"{HDFS_FILE_READ_URL}/{RECENTLY_UPLOADED_DATASETS_DIR}/{filename}",
-                        header=True,
-                        inferSchema=True,
-                    )
-                    write_filename = write_filename = filename.replace(
-                        ".csv", ".parquet"
-                    )
+                    write_filename = filename.replace(".csv", ".parquet")
                     # if you write without parquet extension, it will create a directory with the filename and store the data in it
-                    df.write.mode("overwrite").parquet(
-                        f"{HDFS_FILE_READ_URL}/{HDFS_RAW_DATASETS_DIR}/{write_filename}"
+                    # one read of the CSV with a sampled / cached schema (see utility.dataset_ingest)
+                    report_progress(progress, "ingest", 0.1)
+                    t1 = time.time()
+                    ingest_csv(
+                        spark,
+                        f"{HDFS_FILE_READ_URL}/{RECENTLY_UPLOADED_DATASETS_DIR}/{filename}",
+                        f"{HDFS_FILE_READ_URL}/{HDFS_RAW_DATASETS_DIR}/{write_filename}",
+                        input_bytes,
                     )
+                    timings["ingest"] = time.time() - t1
                     print(
                         f"Successfully created new dataset in HDFS: {HDFS_RAW_DATASETS_DIR}/{write_filename}"
                     )
@@ -403,12 +472,21 @@ class SparkSessionManager:
                         f"Reading Parquet file: {HDFS_FILE_READ_URL}/{RECENTLY_UPLOADED_DATASETS_DIR}/{filename}"
                     )
                     # we don't need inferSchema=True with parquet (as parquet stores the schema as metadata)
+                    report_progress(progress, "read", 0.1)
+                    t1 = time.time()
                     df = spark.read.parquet(
                         f"{HDFS_FILE_READ_URL}/{RECENTLY_UPLOADED_DATASETS_DIR}/{filename}"
                     )
-                    df.write.mode("overwrite").parquet(
-                        f"{HDFS_FILE_READ_URL}/{HDFS_RAW_DATASETS_DIR}/{filename}"
+                    timings["read"] = time.time() - t1
+                    write_filename = filename
+                    report_progress(progress, "write", 0.3)
+                    t1 = time.time()
+                    write_parquet(
+                        df,
+                        f"{HDFS_FILE_READ_URL}/{HDFS_RAW_DATASETS_DIR}/{write_filename}",
+                        input_bytes,
                     )
+                    timings["write"] = time.time() - t1
                     print(
                         f"Successfully created new dataset in HDFS: {HDFS_RAW_DATASETS_DIR}/{filename}"
                     )
@@ -416,7 +494,31 @@ class SparkSessionManager:
                     print("Unsupported file type for creating new dataset.")
                     return {"message": "Unsupported file type."}
 
-                dataset_overview = await self._get_overview(df, filename)
+                if on_written is not None:
+                    report_progress(progress, "footer", 0.6)
+                    t1 = time.time()
+                    try:
+                        quick_overview = footer_overview(
+                            f"{HDFS_RAW_DATASETS_DIR}/{write_filename}"
+                        )
+                        if "error" in quick_overview:
+                            print(quick_overview["error"])
+                        else:
+                            quick_overview["filename"] = write_filename
+                            await on_written(quick_overview)
+                    except Exception as e:
+                        print(f"Footer overview of {write_filename} failed: {e}")
+                    timings["footer"] = time.time() - t1
+
+                # the overview scans the written parquet (columnar, no CSV reparsing)
+                report_progress(progress, "overview", 0.7)
+                t1 = time.time()
+                written_df = spark.read.parquet(
+                    f"{HDFS_FILE_READ_URL}/{HDFS_RAW_DATASETS_DIR}/{write_filename}"
+                )
+                dataset_overview = await self._get_overview(written_df, filename)
+                timings["overview"] = time.time() - t1
+                log_phase_timings(f"create_new_dataset {filename}", timings)
 
                 dataset_overview["filename"] = write_filename
                 return dataset_overview
@@ -425,9 +527,17 @@ class SparkSessionManager:
             print(f"Error creating new dataset: {e}")
             raise e
 
-    async def preprocess_data(self, directory: str, filename: str, operations: list):
+    async def preprocess_data(
+        self,
+        directory: str,
+        filename: str,
+        operations: list,
+        job_id=None,
+        progress=None,
+    ):
         """
         Preprocess a dataset using as per the options JSON received.
+        job_id / progress: Spark job group and phase callback, as for create_new_dataset
 
         Notes:
         i) If error occured at any step, the function will print the error and continue to the next step.
@@ -463,70 +573,80 @@ class SparkSessionManager:
         # don't put try except here, if any error occurs, it will be printed and counted as no error ..
         # so wherever this function is called next step will continue even after this error (put try except there instead)
         try:
-            with SparkSessionManager() as spark:
+            # small datasets with operations the local engine knows skip Spark
+            if local_engine.use_local_engine(
+                self._hdfs_size(f"{directory}/{filename}"), operations
+            ):
+                return await self._preprocess_data_locally(
+                    directory, filename, operations, progress
+                )
+            with SparkSessionManager() as spark, spark_job(
+                spark,
+                "preprocess",
+                f"Preprocess {directory}/{filename}",
+                group_id=job_id,
+            ):
                 # Load the dataset from HDFS
                 print(
                     f"Starting preprocessing for {HDFS_FILE_READ_URL}/{directory}/{filename}..."
                 )
+                timings = {}
+                report_progress(progress, "read", 0.05)
+                t1 = time.time()
                 df = spark.read.parquet(f"{HDFS_FILE_READ_URL}/{directory}/{filename}")
+                timings["read"] = time.time() - t1
 
-                # Record the time, and get the numeric columns
+                # Apply the preprocessing steps, statistics of independent steps are
+                # collected in shared passes (see utility.preprocessing_planner)
+                report_progress(progress, "transform", 0.1)
                 t1 = time.time()
-                All_Columns = df.columns
-                numericCols = [
-                    c
-                    for c in All_Columns
-                    if isinstance(df.schema[c].dataType, NumericType)
-                ]
-
-                # Apply the preprocessing steps
-                for step in operations:
-                    if step["operation"] == "Exclude from All Columns list":
-                        All_Columns.remove(step["column"])
-                        if step["column"] in numericCols:
-                            numericCols.remove(step["column"])
-
-                    elif step["column"] == "All Columns":
-                        try:
-                            df = All_Column_Operations(
-                                df, step, numericCols, All_Columns
-                            )
-                        except Exception as e:
-                            print(
-                                f"error: Error in {step['operation']} operation for {step['column']} column: {str(e)} \n"
-                            )
-                    else:
-                        try:
-                            df = Column_Operations(df, step)
-                        except Exception as e:
-                            print(
-                                f"error: Error in {step['operation']} operation for {step['column']} column: {str(e)} \n"
-                            )
+                df = run_operations(df, operations)
+
+                # eager statistics of the steps (means, quantiles, fitted encoders ...)
+                timings["transform"] = time.time() - t1
 
                 newfilename = f"{filename}_{uuid.uuid4().hex}.parquet"
-                df.write.mode("overwrite").parquet(
+                write_path = (
                     f"{HDFS_FILE_READ_URL}/{HDFS_PROCESSED_DATASETS_DIR}/{newfilename}"
                 )
+                report_progress(progress, "write", 0.4)
+                t1 = time.time()
+                write_parquet(df, write_path)
+                timings["write"] = time.time() - t1
+                print(f"Preprocessed dataset saved to: {write_path}")
 
-                print(
-                    f"Preprocessed dataset saved to: {HDFS_FILE_READ_URL}/{HDFS_PROCESSED_DATASETS_DIR}/{newfilename} and time taken: ",
-                    time.time() - t1,
+                # Overview of the written parquet instead of the lazy df, which would
+                # re-run the whole chain of imputers, scalers and encoders
+                report_progress(progress, "overview", 0.8)
+                t1 = time.time()
+                overview = await self._get_overview(
+                    spark.read.parquet(write_path), filename, tmp_deletion=False
                 )
-
-                overview = await self._get_overview(df, filename, tmp_deletion=False)
+                timings["overview"] = time.time() - t1
+                log_phase_timings(f"preprocess_data {filename}", timings)
                 overview["filename"] = newfilename
                 return overview
         except Exception as e:
             print(f"Error preprocessing dataset: {e}")
             raise e  # Raise the exception to be handled by the caller
 
-    async def create_qpd_dataset(self, filename: str, num_points: int):
+    async def create_qpd_dataset(
+        self,
+        filename: str,
+        num_points: int,
+        method=None,
+        seed=None,
+        strata_columns=None,
+    ):
         """
         Creating Dataset for QPD (Quality preserving Database) from the original dataset.
+        The rows are sampled without a global sort, see utility.qpd_sampling for the methods.
         """
 
         try:
-            with SparkSessionManager() as spark:
+            with SparkSessionManager() as spark, spark_job(
+                spark, "qpd", f"QPD dataset of {num_points} rows from {filename}"
+            ):
                 # Load the dataset from HDFS
                 print(
                     f"Starting creating qpd dataset from {HDFS_FILE_READ_URL}/{HDFS_PROCESSED_DATASETS_DIR}/{filename}..."
@@ -536,17 +656,39 @@ class SparkSessionManager:
                 )
 
                 # Create a new dataset with the specified number of points
-                df_subset = df.orderBy(rand()).limit(num_points)
-
-                # write the subset to S3 bucket
-                newfilename = f"{uuid.uuid4()}_{filename}"
-                write_path = f"s3a://{BUCKET_NAME}/{S3_PREFIX}/{newfilename}"
-                df_subset.write.parquet(
-                    write_path
-                )  # no overwrite since it will be unique path
-                print(f"Created QPD dataset saved to: {write_path}")
+                cached = []
+                df_subset = sample_rows(
+                    df,
+                    num_points,
+                    method,
+                    seed,
+                    strata_columns=strata_columns,
+                    cached=cached,
+                )
 
-                overview = await self._get_overview(df_subset, filename)
+                try:
+                    # write the subset to S3 bucket
+                    newfilename = f"{uuid.uuid4()}_{filename}"
+                    write_path = f"s3a://{BUCKET_NAME}/{S3_PREFIX}/{newfilename}"
+                    timings = {}
+                    t1 = time.time()
+                    df_subset.write.parquet(
+                        write_path
+                    )  # no overwrite since it will be unique path
+                    timings["write"] = time.time() - t1
+                    print(f"Created QPD dataset saved to: {write_path}")
+
+                    # the written subset, re-evaluating an unseeded sample would give other rows
+                    t1 = time.time()
+                    overview = await self._get_overview(
+                        spark.read.parquet(write_path), filename
+                    )
+                    timings["overview"] = time.time() - t1
+                finally:
+                    # the shared session outlives this request, its cached samples don't
+                    for sample in cached:
+                        sample.unpersist()
+                log_phase_timings(f"create_qpd_dataset {filename}", timings)
                 overview["datapath"] = write_path
                 return overview
         except Exception as e:
@@ -554,11 +696,32 @@ class SparkSessionManager:
             raise e
 
 
+def warmup_session():
+    """Start the shared session in the background (app startup), errors are only logged."""
+
+    def _warmup():
+        try:
+            SparkSessionManager().warmup()
+        except Exception as e:
+            print(f"Spark warmup failed: {e}")
+
+    if SPARK_WARMUP_ON_STARTUP:
+        threading.Thread(target=_warmup, name="spark-warmup", daemon=True).start()
+
+
+def shutdown():
+    """Stop the shared session (app shutdown)."""
+    if SparkSessionManager.session_exists():
+        SparkSessionManager().spark_session_cleanup()
+
+
 # the _get_overview  function will return something like this:
 # {
 #     "filename": "sample.parquet",
 #     "numRows": 1000,
 #     "numColumns": 5,
+#     "statsLevel": "full",  # "footer" for the metadata-only overview of utility.parquet_footer,
+#                            # "failed" when the full overview never replaced it
 #     "columnStats": [
 #         {
 #             "name": "age",
@@ -4,10 +4,21 @@ import os
 import numpy as np
 import math
 from .model_builder import model_instance_from_config
+from .global_parameter_cache import fetch_global_parameters, current_version
+from .feature_parsing import (
+    is_string_rows,
+    parse_delimited_rows,
+    reshape_to_input_shape,
+)
+from .session_config_cache import get_session_config
+from .chunked_upload import (
+    upload_parameters_chunked,
+    resume_pending_uploads,
+    discard_stale_uploads,
+)
+from .redis import redis_sync_client
+from .update_compression import get_compression_config, compress_update
 import argparse
-from .db import get_db
-from sqlalchemy.orm import Session
-from models.Trainings import CurrentTrainings
 from dotenv import load_dotenv
 import tensorflow as tf
 import traceback
@@ -70,50 +81,49 @@ def sanitize_history(history):
 
 
 def get_model_config(session_id: int, client_token: str):
-    db: Session = next(get_db())
-    try:
-        record = db.query(CurrentTrainings).filter_by(session_id=session_id).first()
-        response = requests.get(
-            f"{BASE_URL}/v2/get-federated-session/{session_id}",
-            headers={"Authorization": f"Bearer {client_token}"},
-        )
-        response.raise_for_status()
-        result = response.json()
-        federated_info = result.get("federated_info")
-        # record = type("Record", (), {"training_details": federated_info})()
-        if not federated_info:
-            raise ValueError(f"No training config found for session_id {session_id}")
-        return federated_info
-    finally:
-        db.close()
+    # shared redis cache, filled from current_trainings or the server on a miss
+    federated_info = get_session_config(session_id, client_token)
+    if not federated_info:
+        raise ValueError(f"No training config found for session_id {session_id}")
+    return federated_info
 
 
 def receive_global_parameters(url, session_id, client_token):
     try:
-        response = requests.get(url + "/" + session_id)
-        response.raise_for_status()  # Raise an HTTPError for bad responses
-        data = response.json()  # Assuming the response is in JSON format
+        # binary (npz) parameters are negotiated, unchanged globals come from the local cache
+        data = fetch_global_parameters(url + "/" + session_id, session_id)
         return data
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data from {url}: {e}")
         return None
 
 
-def send_updated_parameters(url, payload, client_token):
+def send_updated_parameters(url, payload, client_token, round_id=None, residuals=None):
+    """
+    True once the server accepted the update, the error-feedback residuals of a compressed
+    update are saved along with it (also when a restarted worker finishes the upload).
+    """
     try:
         headers = {
             "Authorization": f"Bearer {client_token}",  # Using Bearer token
-            "Content-Type": "application/json",  # Specify the payload format
         }
         # print("Payload : ", type(payload["client_parameter"]))
-        response = requests.post(url, json=payload, headers=headers)
-
-        response.raise_for_status()  # Raise an HTTPError for bad responses
+        # chunked + compressed, resumable; single request if the server can't take chunks
+        response = upload_parameters_chunked(
+            url,
+            payload,
+            headers=headers,
+            to_json=sanitize_parameters,
+            round_id=round_id,
+            residuals=residuals,
+        )
         print(
             "Response.json() - ", response.json()
         )  # Assuming the response is in JSON format
+        return True
     except requests.exceptions.RequestException as e:
         print(f"Error posting data to {url}: {e}")
+        return False
 
 
 def compare_parameters(before, after):
@@ -392,144 +402,250 @@ def temporary_evaluate_with_improvement(X, Y, test_metrics, session_id):
     return results
 
 
-def main(session_id, client_token):
-    try:
-        # ==== HARDCODED CONFIGURATION ====
-
-        print("Starting training script...")
-        get_url = f"{BASE_URL}/get-model-parameters"
-        post_url = f"{BASE_URL}/v2/send-weights"
-
-        model_config = get_model_config(session_id, client_token)
-        # print("Model Config : ", model_config)
-        test_metrics = model_config["model_info"]["test_metrics"]
-
-        # ==== Load model ====
-        model = model_instance_from_config(model_config)
-        if model is None:
-            raise ValueError("Model creation returned None")
-        print("Model built successfully")
-
-        # Save Model Config
-        # filename = "model_config.txt"
-        # print_model_config(model.model,filename)
-
-        X_path = os.path.join("data", f"X_{session_id}.npy")
-        Y_path = os.path.join("data", f"Y_{session_id}.npy")
-
-        # Load data
-        X = np.load(X_path, allow_pickle=True)
-        (
-            print("X : ", X.shape, X.dtype)
-            if isinstance(X, np.ndarray)
-            else print("X : ", len(X), type(X))
+def training_data_paths(session_id):
+    """Local paths of the X/Y arrays prepared for a session."""
+    X_path = os.path.join("data", f"X_{session_id}.npy")
+    Y_path = os.path.join("data", f"Y_{session_id}.npy")
+    return X_path, Y_path
+
+
+def training_metadata_path(session_id):
+    """Sidecar written next to the arrays (shape, dtype, columns)."""
+    return os.path.join("data", f"XY_{session_id}.json")
+
+
+def _load_array(path, info):
+    """Typed arrays are memory mapped read-only, object arrays (legacy / strings) unpickled."""
+    if info and info["dtype"] != np.dtype(object).str:
+        array = np.load(path, mmap_mode="r")
+        if list(array.shape) != info["shape"] or array.dtype.str != info["dtype"]:
+            raise ValueError(f"{path} does not match its metadata, prepare it again")
+        return array
+    return np.load(path, allow_pickle=True)
+
+
+def load_training_data(session_id, model_config):
+    """Load the prepared X/Y arrays of a session and normalise the X format."""
+    X_path, Y_path = training_data_paths(session_id)
+    metadata = {}
+    if os.path.exists(training_metadata_path(session_id)):
+        with open(training_metadata_path(session_id)) as f:
+            metadata = json.load(f)
+
+    # Load data
+    X = _load_array(X_path, metadata.get("X"))
+    (
+        print("X : ", X.shape, X.dtype)
+        if isinstance(X, np.ndarray)
+        else print("X : ", len(X), type(X))
+    )
+    # String rows are normally parsed at prep time, older prepared data is parsed here
+    if is_string_rows(X):
+        print("Parsing string rows into individual pixel values")
+        X = parse_delimited_rows(X, dtype=np.float32)
+
+    # Optional reshape of flat rows if input_shape is provided
+    model_info = (
+        model_config.get("model_info", {}) if isinstance(model_config, dict) else {}
+    )
+    if model_info.get("input_shape") is not None and X.dtype != object:
+        reshaped = reshape_to_input_shape(X, model_info["input_shape"])
+        if reshaped is not X:
+            print(f"X reshaped from {X.shape} to {reshaped.shape}")
+        X = reshaped
+
+    Y = _load_array(Y_path, metadata.get("Y"))
+    return X, Y
+
+
+def prepare_session(session_id, client_token):
+    """
+    Build everything a round needs that does not change during a session:
+    the federated config, the model instance and the training arrays.
+    The warm worker pool keeps the returned dict in memory between rounds.
+    """
+    model_config = get_model_config(session_id, client_token)
+    # print("Model Config : ", model_config)
+
+    # ==== Load model ====
+    model = model_instance_from_config(model_config)
+    if model is None:
+        raise ValueError("Model creation returned None")
+    print("Model built successfully")
+
+    # Save Model Config
+    # filename = "model_config.txt"
+    # print_model_config(model.model,filename)
+
+    X, Y = load_training_data(session_id, model_config)
+    return {"model_config": model_config, "model": model, "X": X, "Y": Y}
+
+
+def reset_optimizer_state(model):
+    """
+    Fresh optimizer for a warm Keras model, like the model built for every round before
+    the worker pool: no moments or step count carried over from the previous round.
+    """
+    keras_model = getattr(model, "model", None)
+    if not isinstance(keras_model, tf.keras.Model) or not getattr(
+        keras_model, "optimizer", None
+    ):
+        return
+    compile_config = None
+    if hasattr(keras_model, "get_compile_config"):
+        compile_config = keras_model.get_compile_config()
+    if compile_config:
+        keras_model.compile_from_config(compile_config)
+    else:
+        optimizer = keras_model.optimizer
+        keras_model.compile(
+            optimizer=type(optimizer).from_config(optimizer.get_config()),
+            loss=keras_model.loss,
         )
-        # Normalize dataset formats: allow object arrays of shape (n,1) with string rows
-        try:
-            first_elem = (
-                X[0]
-                if not (isinstance(X, np.ndarray) and X.ndim == 2 and X.shape[1] == 1)
-                else X[0, 0]
-            )
-        except Exception:
-            first_elem = None
 
-        if isinstance(first_elem, str):
-            print("Parsing string rows into individual pixel values")
-            if isinstance(X, np.ndarray) and X.ndim == 2 and X.shape[1] == 1:
-                strings = [row[0] for row in X]
-            else:
-                strings = list(X)
-            X = np.array(
-                [np.fromstring(s.strip(), sep=",", dtype=np.float32) for s in strings],
-                dtype=np.float32,
-            )
-            # Optional reshape if input_shape is provided
-            model_info = (
-                model_config.get("model_info", {})
-                if isinstance(model_config, dict)
-                else {}
-            )
-            input_shape = model_info.get("input_shape")
-            if input_shape is not None:
-                if isinstance(input_shape, str):
-                    # Handle string format like '(150,150,3)'
-                    import ast
-
-                    input_shape = ast.literal_eval(input_shape)
-                print(f"Parsed input_shape: {input_shape}")
-                try:
-                    X = X.reshape(-1, *input_shape)
-                except Exception as reshape_err:
-                    print(
-                        f"Reshape failed with error {reshape_err}. Keeping flat features."
-                    )
-
-        Y = np.load(Y_path, allow_pickle=True)
-
-        # ==== Load and update global parameters ====
-        global_parameters = receive_global_parameters(get_url, session_id, client_token)
-        # print("Checkpoint isFirst : ", global_parameters)
-        if global_parameters and global_parameters["is_first"] == 0:
-            print(
-                "Checkpint global_parameters: ",
-                len(global_parameters["global_parameters"]),
+
+def run_round(session_id, client_token, state=None):
+    """
+    Execute one federated round: pull global parameters, train locally,
+    evaluate and push the updated parameters. Raises on failure.
+
+    Args:
+        state: Optional output of prepare_session (reused by the worker pool)
+    """
+    # ==== HARDCODED CONFIGURATION ====
+
+    print("Starting training script...")
+    get_url = f"{BASE_URL}/get-model-parameters"
+    post_url = f"{BASE_URL}/v2/send-weights"
+
+    if state is None:
+        state = prepare_session(session_id, client_token)
+    model_config = state["model_config"]
+    model = state["model"]
+    X = state["X"]
+    Y = state["Y"]
+    test_metrics = model_config["model_info"]["test_metrics"]
+
+    # ==== Load and update global parameters ====
+    global_parameters = receive_global_parameters(
+        get_url, str(session_id), client_token
+    )
+    # a warm model holds the previous round's local weights, never train on from those
+    if state.get("trained"):
+        if global_parameters is None:
+            raise RuntimeError(
+                "Global parameters unavailable, not training the warm model on"
             )
-            model.update_parameters(global_parameters["global_parameters"])
-
-        # ==== Save current local parameters ====
-        # with open("local_parameters.txt", "a", encoding="utf-8") as f:
-        #     f.write("\n---\n")
-        #     f.write(json.dumps(model.get_parameters()))
-        #     f.write("\n")
-
-        # print("Local parameters saved to local_parameters.txt")
-        before_training = model.get_parameters()
-        # print("Before Training : ", before_training)
-
-        print(f"X dtype: {X.dtype}, Y dtype: {Y.dtype}")
-        print(f"X shape: {X.shape}, Y shape: {Y.shape}")
-
-        # Convert input_shape from string to tuple if needed
-
-        # Reshape X to the input shape of the model
-        # ==== Train ====
-        model.fit(X, Y)
-        print("Training completed")
-        after_training = model.get_parameters()
-        # print("After Training : ", after_training)
-        # TODO: Compare parameters for all model types
-        # compare_parameters(before_training, after_training)
-
-        # Save updated parameters after training
-        with open("updated_parameters.txt", "a", encoding="utf-8") as f:
-            f.write("\n--- Updated Parameters After Training ---\n")
-            f.write(json.dumps(model.get_parameters()))
-            f.write("\n")
-        # ==== Send updated parameters ====
-        updated_parameters = model.get_parameters()
-        # print("Updated Parameters : ", updated_parameters)
-        # Model Evaluation
-        print("yaha tak aagya")
-
-        # TODO: -------------------------------------------------------------------------------
-        # Temporary evaluate function with simulated improving metrics
-        # results = temporary_evaluate_with_improvement(X, Y, test_metrics, session_id)
-        # TODO: -------------------------------------------------------------------------------
-        results = model.evaluate(X, Y, test_metrics)
-
-        print("Results : ", results)
-        payload = {
-            "session_id": int(session_id),
-            "client_parameter": sanitize_parameters(updated_parameters),
-            "metrics_report": results,
-        }
-        print("Payload : ", len(payload["client_parameter"]))
+        if global_parameters.get("is_first") != 0:
+            print("No global parameters to apply, starting from a fresh model")
+            state["model"] = model = model_instance_from_config(model_config)
+    # the round is identified by the global parameters it starts from
+    round_id = current_version(session_id) if global_parameters else None
+    if round_id:
+        discard_stale_uploads(session_id, round_id)
+    applied_global_parameters = None
+    # print("Checkpoint isFirst : ", global_parameters)
+    if global_parameters and global_parameters["is_first"] == 0:
+        print(
+            "Checkpint global_parameters: ",
+            len(global_parameters["global_parameters"]),
+        )
+        applied_global_parameters = global_parameters["global_parameters"]
+        model.update_parameters(applied_global_parameters)
+
+    # ==== Save current local parameters ====
+    # with open("local_parameters.txt", "a", encoding="utf-8") as f:
+    #     f.write("\n---\n")
+    #     f.write(json.dumps(model.get_parameters()))
+    #     f.write("\n")
+
+    # print("Local parameters saved to local_parameters.txt")
+    before_training = model.get_parameters()
+    # print("Before Training : ", before_training)
+
+    print(f"X dtype: {X.dtype}, Y dtype: {Y.dtype}")
+    print(f"X shape: {X.shape}, Y shape: {Y.shape}")
+
+    # Convert input_shape from string to tuple if needed
+
+    # Reshape X to the input shape of the model
+    # ==== Train ====
+    model.fit(X, Y)
+    state["trained"] = True
+    print("Training completed")
+    after_training = model.get_parameters()
+    # print("After Training : ", after_training)
+    # TODO: Compare parameters for all model types
+    # compare_parameters(before_training, after_training)
+
+    # ==== Send updated parameters ====
+    updated_parameters = after_training
+    # print("Updated Parameters : ", updated_parameters)
+    # Model Evaluation
+    print("yaha tak aagya")
+
+    # TODO: -------------------------------------------------------------------------------
+    # Temporary evaluate function with simulated improving metrics
+    # results = temporary_evaluate_with_improvement(X, Y, test_metrics, session_id)
+    # TODO: -------------------------------------------------------------------------------
+    results = model.evaluate(X, Y, test_metrics)
+
+    print("Results : ", results)
+    payload = {
+        "session_id": int(session_id),
+        "client_parameter": updated_parameters,
+        "metrics_report": results,
+    }
+
+    # ==== Optional sparsified/quantized delta upload ====
+    compression_config = get_compression_config(model_config)
+    residuals = None
+    if compression_config and applied_global_parameters is not None:
+        payload["client_parameter"], compression_report, residuals = compress_update(
+            updated_parameters,
+            applied_global_parameters,
+            compression_config,
+            session_id,
+        )
+        payload["client_parameter_encoding"] = compression_report["encoding"]
+        payload["compression_report"] = compression_report
+        print("Compression report : ", compression_report)
 
-        print("metrics_report : ", payload["metrics_report"])
-        send_updated_parameters(post_url, payload, client_token)
-        print("Parameters sent to server")
+    print("Payload : ", len(payload["client_parameter"]))
 
+    print("metrics_report : ", payload["metrics_report"])
+    if not send_updated_parameters(
+        post_url, payload, client_token, round_id, residuals
+    ):
+        raise RuntimeError("The updated parameters could not be sent to the server")
+    print("Parameters sent to server")
+
+
+def resume_interrupted_uploads(owns_session=None):
+    """
+    Finish the update uploads a restart interrupted, once when a training worker starts.
+    An upload is only resumed while its round is still the current one on the server.
+    """
+    client_token = redis_sync_client.get("client_token")
+    if not client_token:
+        return 0
+    get_url = f"{BASE_URL}/get-model-parameters"
+
+    def current_round(session_id):
+        if receive_global_parameters(get_url, session_id, client_token) is None:
+            return None
+        return current_version(session_id)
+
+    return resume_pending_uploads(
+        current_round,
+        headers={"Authorization": f"Bearer {client_token}"},
+        owns_session=owns_session,
+    )
+
+
+def main(session_id, client_token):
+    try:
+        run_round(session_id, client_token)
     except Exception as e:
         print(f"Error from training_script: {e}")
         traceback.print_exc()
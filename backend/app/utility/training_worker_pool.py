@@ -0,0 +1,287 @@
+import os
+import io
+import zlib
+import queue
+import threading
+import traceback
+import multiprocessing as mp
+from collections import OrderedDict
+from contextlib import redirect_stdout, redirect_stderr
+from datetime import datetime
+from dotenv import load_dotenv
+from . import federated_client, dataset_cache
+
+load_dotenv()
+
+TRAINING_POOL_SIZE = int(os.getenv("TRAINING_POOL_SIZE", 2))
+TRAINING_SESSION_CACHE_SIZE = int(os.getenv("TRAINING_SESSION_CACHE_SIZE", 4))
+
+"""
+NOTE: Worker processes are started with the "spawn" method, TensorFlow is not fork safe and each
+worker has to own its own TF runtime. A session is always routed to the same worker so that its
+built model and loaded arrays stay warm between rounds.
+"""
+
+
+class SessionStateCache:
+    """
+    LRU cache of prepared sessions (model + training arrays) kept inside a worker.
+    An entry is rebuilt when the X/Y files on disk change (e.g. data re-prepared in round 1)
+    and after a failed round. A reused model gets a fresh optimizer every round.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(1, capacity)
+        self._entries = OrderedDict()
+
+    def get(self, session_id, version):
+        entry = self._entries.get(session_id)
+        if entry is None or entry["version"] != version:
+            return None
+        self._entries.move_to_end(session_id)
+        return entry["state"]
+
+    def discard(self, session_id):
+        self._entries.pop(session_id, None)
+
+    def put(self, session_id, version, state):
+        self._entries[session_id] = {"version": version, "state": state}
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.capacity:
+            evicted, _ = self._entries.popitem(last=False)
+            print(f"[TrainingWorker {os.getpid()}] evicted session {evicted}")
+
+
+def _data_version(paths):
+    try:
+        return tuple(os.stat(p).st_mtime_ns for p in paths)
+    except OSError:
+        return None
+
+
+def worker_for(session_id, pool_size):
+    """Index of the worker a session is routed to."""
+    return zlib.crc32(str(session_id).encode()) % pool_size
+
+
+def _worker_main(worker_index, pool_size, job_queue, result_queue, cache_size):
+    """Entry point of a worker process, imports the heavy modules once and serves jobs."""
+    os.environ.setdefault("TF_FORCE_GPU_ALLOW_GROWTH", "true")
+    try:
+        from utility import training_script  # preloads tensorflow, sklearn, xgboost
+
+        import_error = None
+    except Exception:
+        # keep serving so that queued rounds are reported as failed instead of hanging
+        import_error = traceback.format_exc()
+
+    if import_error is None:
+        # uploads of this worker's sessions interrupted by a restart, before any new round
+        try:
+            training_script.resume_interrupted_uploads(
+                lambda session_id: worker_for(session_id, pool_size) == worker_index
+            )
+        except Exception as e:
+            print(f"[TrainingWorker {worker_index}] could not resume uploads: {e}")
+
+    cache = SessionStateCache(cache_size)
+    print(f"[TrainingWorker {worker_index}] ready (pid {os.getpid()})")
+
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+
+        process_id = job["process_id"]
+        session_id = str(job["session_id"])
+        result_queue.put(("started", worker_index, process_id, datetime.now()))
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        return_code = 0
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                if import_error:
+                    raise RuntimeError(
+                        f"Training modules failed to load:\n{import_error}"
+                    )
+                version = _data_version(training_script.training_data_paths(session_id))
+                state = cache.get(session_id, version)
+                if state is None:
+                    print(f"Preparing session {session_id} (cold start)")
+                    state = training_script.prepare_session(
+                        session_id, job["client_token"]
+                    )
+                    cache.put(session_id, version, state)
+                else:
+                    print(f"Reusing warm state for session {session_id}")
+                    training_script.reset_optimizer_state(state["model"])
+                training_script.run_round(session_id, job["client_token"], state)
+                if job.get("last_round"):
+                    # the session is over, its model and dataset files can go
+                    cache.discard(session_id)
+                    dataset_cache.release_session(session_id)
+            except Exception as e:
+                print(f"Error from training_script: {e}")
+                traceback.print_exc()
+                # the model may be half trained, the next round starts cold
+                cache.discard(session_id)
+                return_code = 1
+
+        result_queue.put(
+            (
+                "finished",
+                worker_index,
+                process_id,
+                {
+                    "end_time": datetime.now(),
+                    "return_code": return_code,
+                    "http_metrics": federated_client.get_metrics(),
+                    "output": {
+                        "stdout": stdout.getvalue(),
+                        "stderr": stderr.getvalue(),
+                    },
+                },
+            )
+        )
+
+
+class TrainingWorkerPool:
+    """
+    Pool of long-lived training processes fed through per-worker job queues.
+    Results are written into the shared process_store, so /process-status keeps working unchanged.
+    """
+
+    def __init__(
+        self,
+        process_store,
+        size=TRAINING_POOL_SIZE,
+        cache_size=TRAINING_SESSION_CACHE_SIZE,
+    ):
+        self.process_store = process_store
+        self.size = max(1, size)
+        self.cache_size = cache_size
+        self._ctx = mp.get_context("spawn")
+        self._lock = threading.Lock()
+        self._workers = []
+        self._job_queues = []
+        self._in_flight = {}
+        # latest federated server latency metrics reported by each worker
+        self.worker_http_metrics = {}
+        self._result_queue = None
+        self._collector = None
+        self._running = False
+
+    def _spawn_worker(self, index):
+        worker = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                index,
+                self.size,
+                self._job_queues[index],
+                self._result_queue,
+                self.cache_size,
+            ),
+            name=f"training-worker-{index}",
+            daemon=True,
+        )
+        worker.start()
+        return worker
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._result_queue = self._ctx.Queue()
+            self._job_queues = [self._ctx.Queue() for _ in range(self.size)]
+            self._workers = [self._spawn_worker(i) for i in range(self.size)]
+            self._running = True
+            self._collector = threading.Thread(
+                target=self._collect_results,
+                name="training-pool-collector",
+                daemon=True,
+            )
+            self._collector.start()
+        print(f"Training worker pool started with {self.size} workers")
+
+    def shutdown(self, timeout=10):
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            for job_queue in self._job_queues:
+                job_queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+        self._collector.join(timeout)
+        print("Training worker pool stopped")
+
+    def submit(self, process_id, session_id, client_token, last_round=False):
+        """
+        Queue a round for a session, the status is tracked in process_store[process_id].
+        After a successful last_round the session's state and dataset files are released.
+        """
+        if not self._running:
+            self.start()
+        self.process_store[process_id] = {
+            "status": "queued",
+            "start_time": datetime.now(),
+            "session_id": session_id,
+            "output": {"stdout": "", "stderr": ""},
+        }
+        worker_index = worker_for(session_id, self.size)
+        self._job_queues[worker_index].put(
+            {
+                "process_id": process_id,
+                "session_id": session_id,
+                "client_token": client_token,
+                "last_round": last_round,
+            }
+        )
+
+    def _collect_results(self):
+        while self._running or any(w.is_alive() for w in self._workers):
+            try:
+                event, worker_index, process_id, data = self._result_queue.get(
+                    timeout=1
+                )
+            except queue.Empty:
+                self._respawn_dead_workers()
+                continue
+
+            if event == "started":
+                self._in_flight[worker_index] = process_id
+                self.process_store[process_id].update(
+                    {"status": "running", "start_time": data}
+                )
+            elif event == "finished":
+                self._in_flight.pop(worker_index, None)
+                self.worker_http_metrics[worker_index] = data.pop("http_metrics", {})
+                print("STDOUT:", data["output"]["stdout"])
+                print("STDERR:", data["output"]["stderr"])
+                if data["return_code"] != 0:
+                    print("Process failed with return code", data["return_code"])
+                data["status"] = "completed" if data["return_code"] == 0 else "failed"
+                self.process_store[process_id].update(data)
+
+    def _respawn_dead_workers(self):
+        if not self._running:
+            return
+        for index, worker in enumerate(self._workers):
+            if worker.is_alive():
+                continue
+            print(
+                f"Training worker {index} died with exit code {worker.exitcode}, restarting"
+            )
+            process_id = self._in_flight.pop(index, None)
+            if process_id is not None:
+                self.process_store[process_id].update(
+                    {
+                        "status": "failed",
+                        "end_time": datetime.now(),
+                        "return_code": worker.exitcode,
+                        "error": "Training worker exited unexpectedly",
+                    }
+                )
+            self._workers[index] = self._spawn_worker(index)
@@ -0,0 +1,186 @@
+import os
+import math
+import numpy as np
+from .parameter_exchange import as_tensor_leaf
+
+"""
+Opt-in compression of client updates (sparsified + quantized deltas).
+
+Enabled per session through the federated session config, e.g.
+    "update_compression": {
+        "mode": "topk",            # "topk" (keep a ratio of entries) or "threshold"
+        "ratio": 0.01,             # fraction of entries kept per tensor in topk mode
+        "threshold": 0.001,        # minimum |delta| kept in threshold mode
+        "quantization": "int8",    # "int8", "float16" or "none"
+        "error_feedback": true     # carry the dropped part over to the next round
+    }
+
+Every float tensor of client_parameter is replaced by
+    {"__delta__": {"shape", "indices", "values", "scale"}}
+where the server rebuilds the tensor as  global + scatter(indices, values * scale).
+Tensors that can't be compressed (no matching global tensor, non float) are sent as they are.
+"""
+
+DELTA_KEY = "__delta__"
+ENCODING_NAME = "sparse_delta"
+
+
+def get_compression_config(model_config):
+    config = (model_config or {}).get("update_compression")
+    if not config or config.get("mode", "none") == "none":
+        return None
+    return config
+
+
+def residual_path(session_id):
+    return os.path.join("data", f"residual_{session_id}.npz")
+
+
+def _load_residuals(path):
+    if not os.path.exists(path):
+        return {}
+    with np.load(path, allow_pickle=False) as archive:
+        return {key: archive[key] for key in archive.files}
+
+
+def _quantize(values, quantization):
+    if quantization == "int8":
+        max_abs = float(np.max(np.abs(values))) if values.size else 0.0
+        scale = max_abs / 127.0 if max_abs > 0 else 1.0
+        return np.clip(np.rint(values / scale), -127, 127).astype(np.int8), scale
+    if quantization == "float16":
+        return values.astype(np.float16), 1.0
+    return values.astype(np.float32), 1.0
+
+
+def _select(delta, config):
+    flat = np.abs(delta.ravel())
+    if config.get("mode") == "threshold":
+        return np.flatnonzero(flat >= float(config.get("threshold", 1e-3)))
+    k = max(1, math.ceil(float(config.get("ratio", 0.01)) * flat.size))
+    if k >= flat.size:
+        return np.arange(flat.size)
+    return np.sort(np.argpartition(flat, -k)[-k:])
+
+
+def save_residuals(session_id, residuals, path=None):
+    """
+    Keep the error-feedback residuals for the next round, once the upload succeeded.
+    path: where to write them instead (e.g. next to a pending upload)
+    """
+    path = path or residual_path(session_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "wb") as f:
+        np.savez(f, **residuals)
+    os.replace(f"{path}.tmp", path)
+
+
+def compress_update(updated_parameters, global_parameters, config, session_id):
+    """
+    Replace the float tensors of updated_parameters by sparse quantized deltas against
+    global_parameters. Returns (compressed_parameters, report, residuals), residuals is
+    None without error feedback. They are only saved (save_residuals) after the server
+    received the update, otherwise the next round would carry over mass never sent.
+    """
+    error_feedback = config.get("error_feedback", True)
+    quantization = config.get("quantization", "int8")
+    path = residual_path(session_id)
+    residuals = _load_residuals(path) if error_feedback else {}
+    new_residuals = {}
+    totals = {"dense_bytes": 0, "sent_bytes": 0, "error_sq": 0.0, "delta_sq": 0.0}
+    counter = [0]
+
+    def transform(after, before):
+        after_tensor = as_tensor_leaf(after)
+        before_tensor = as_tensor_leaf(before) if before is not None else None
+        if after_tensor is not None:
+            if (
+                before_tensor is None
+                or after_tensor.dtype.kind != "f"
+                or after_tensor.shape != before_tensor.shape
+                or after_tensor.size == 0
+            ):
+                return after
+            key = f"r{counter[0]}"
+            counter[0] += 1
+
+            delta = after_tensor - before_tensor
+            residual = residuals.get(key)
+            if residual is not None and residual.shape == delta.shape:
+                delta = delta + residual
+
+            indices = _select(delta, config)
+            values, scale = _quantize(delta.ravel()[indices], quantization)
+            indices = indices.astype(np.int32 if delta.size < 2**31 else np.int64)
+
+            reconstructed = np.zeros(delta.size, dtype=np.float32)
+            reconstructed[indices] = values.astype(np.float32) * scale
+            error = delta.ravel() - reconstructed
+            if error_feedback:
+                new_residuals[key] = error.reshape(delta.shape)
+
+            totals["dense_bytes"] += after_tensor.nbytes
+            totals["sent_bytes"] += indices.nbytes + values.nbytes
+            totals["error_sq"] += float(np.dot(error, error))
+            totals["delta_sq"] += float(np.dot(delta.ravel(), delta.ravel()))
+            return {
+                DELTA_KEY: {
+                    "shape": list(delta.shape),
+                    "indices": indices,
+                    "values": values,
+                    "scale": scale,
+                }
+            }
+        if isinstance(after, dict):
+            before = before if isinstance(before, dict) else {}
+            return {k: transform(v, before.get(k)) for k, v in after.items()}
+        if isinstance(after, (list, tuple)):
+            before = before if isinstance(before, (list, tuple, np.ndarray)) else []
+            return [
+                transform(v, before[i] if i < len(before) else None)
+                for i, v in enumerate(after)
+            ]
+        return after
+
+    compressed = transform(updated_parameters, global_parameters)
+
+    report = {
+        "encoding": ENCODING_NAME,
+        "dense_bytes": totals["dense_bytes"],
+        "sent_bytes": totals["sent_bytes"],
+        "compression_ratio": (
+            totals["dense_bytes"] / totals["sent_bytes"]
+            if totals["sent_bytes"]
+            else None
+        ),
+        "relative_reconstruction_error": (
+            math.sqrt(totals["error_sq"] / totals["delta_sq"])
+            if totals["delta_sq"]
+            else 0.0
+        ),
+    }
+    return compressed, report, new_residuals if error_feedback else None
+
+
+def decompress_update(compressed, global_parameters):
+    """Rebuild full tensors from a compressed update (what the server has to do)."""
+
+    def transform(node, before):
+        if isinstance(node, dict) and DELTA_KEY in node:
+            spec = node[DELTA_KEY]
+            base = np.array(before, dtype=np.float32).ravel()
+            values = np.asarray(spec["values"]).astype(np.float32) * spec["scale"]
+            base[np.asarray(spec["indices"], dtype=np.int64)] += values
+            return base.reshape(spec["shape"])
+        if isinstance(node, dict):
+            before = before if isinstance(before, dict) else {}
+            return {k: transform(v, before.get(k)) for k, v in node.items()}
+        if isinstance(node, (list, tuple)):
+            before = before if isinstance(before, (list, tuple, np.ndarray)) else []
+            return [
+                transform(v, before[i] if i < len(before) else None)
+                for i, v in enumerate(node)
+            ]
+        return node
+
+    return transform(compressed, global_parameters)